@@ -0,0 +1,159 @@
+# backend/admin.py
+
+import os
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import func, case
+
+from . import models, schemas
+from .database import get_db_session, get_read_session
+from .auth import get_current_user, Principal
+from .pagination import MAX_PAGE_SIZE
+from .matching import MATCH_HORIZON_HOURS, run_matching
+from .rollups import BOOKING_SEAT_KM, with_booking_stops
+
+# Tailpipe CO2 of the solo car trip each booked seat replaces
+CO2_GRAMS_PER_KM = float(os.getenv("CO2_GRAMS_PER_KM", "120"))
+
+
+def require_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
+    # Registration only accepts driver and passenger; the admin role is granted
+    # in the database (UPDATE users SET role = 'admin' WHERE ...)
+    if current_user.role.lower() != 'admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
+
+
+router = APIRouter(
+    prefix="/api/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin)]
+)
+
+
+def count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+def sum_where(condition, value):
+    return func.coalesce(func.sum(case((condition, value), else_=0)), 0)
+
+
+# --- Endpoint for the Admin Dashboard totals ---
+# Three aggregate queries (users, rides, bookings) whatever the table sizes;
+# nothing is loaded into Python row by row.
+@router.get("/metrics", response_model=schemas.AdminMetrics)
+async def get_metrics(db: AsyncSession = Depends(get_read_session)):
+    users = (await db.execute(select(
+        func.count(models.User.user_id).label("total"),
+        count_where(models.User.role == 'driver').label("drivers"),
+        count_where(models.User.role == 'passenger').label("passengers"),
+    ))).one()
+
+    rides = (await db.execute(select(
+        func.count(models.Ride.ride_id).label("total"),
+        count_where(models.Ride.date_time >= datetime.now()).label("active"),
+        func.coalesce(func.sum(models.Ride.seats_total), 0).label("seats_offered"),
+    ))).one()
+
+    confirmed = models.Booking.status == "confirmed"
+    bookings = (await db.execute(with_booking_stops(select(
+        func.count(models.Booking.booking_id).label("total"),
+        count_where(confirmed).label("confirmed"),
+        sum_where(confirmed, models.Booking.seats_booked).label("seats_booked"),
+        sum_where(confirmed, BOOKING_SEAT_KM).label("seat_km"),
+    ).join(models.Booking.ride)))).one()
+
+    return schemas.AdminMetrics(
+        total_users=users.total,
+        total_drivers=users.drivers,
+        total_passengers=users.passengers,
+        total_rides=rides.total,
+        active_rides=rides.active,
+        total_bookings=bookings.total,
+        confirmed_bookings=bookings.confirmed,
+        total_seats_offered=rides.seats_offered,
+        total_seats_booked=bookings.seats_booked,
+        total_co2_saved_kg=round(float(bookings.seat_km) * CO2_GRAMS_PER_KM / 1000, 2)
+    )
+
+
+# --- Dashboard series from daily_route_rollups (rows read: days x routes, not rides) ---
+def rollup_totals(row) -> dict:
+    return {
+        "rides_offered": row.rides_offered,
+        "seats_offered": row.seats_offered,
+        "bookings_confirmed": row.bookings_confirmed,
+        "seats_booked": row.seats_booked,
+        "occupancy": round(row.seats_booked / row.seats_offered, 4) if row.seats_offered else 0.0,
+        "co2_saved_kg": round(float(row.seat_km) * CO2_GRAMS_PER_KM / 1000, 2),
+    }
+
+def rollup_query(start: Optional[date], end: Optional[date], *group_by):
+    rollup = models.DailyRouteRollup
+    end = end or date.today()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must not be after end")
+    return select(
+        *group_by,
+        *[func.sum(getattr(rollup, name)).label(name) for name in
+          ("rides_offered", "seats_offered", "bookings_confirmed", "seats_booked", "seat_km")]
+    ).where(rollup.day >= start, rollup.day <= end).group_by(*group_by)
+
+@router.get("/rollups/daily", response_model=List[schemas.DailyRollupOut])
+async def get_daily_rollups(
+    start: Optional[date] = None,
+    end: Optional[date] = None, # Inclusive; the default window is the 30 days ending today
+    origin: Optional[str] = None,
+    destination: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_session)
+):
+    rollup = models.DailyRouteRollup
+    query = rollup_query(start, end, rollup.day).order_by(rollup.day)
+    # Same prefix semantics as ride search
+    if origin:
+        query = query.where(rollup.origin_key.startswith(models.normalize_location(origin), autoescape=True))
+    if destination:
+        query = query.where(rollup.destination_key.startswith(models.normalize_location(destination), autoescape=True))
+
+    result = await db.execute(query)
+    return [{"day": row.day, **rollup_totals(row)} for row in result]
+
+@router.get("/rollups/routes", response_model=List[schemas.RouteRollupOut])
+async def get_route_rollups(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_session)
+):
+    rollup = models.DailyRouteRollup
+    query = rollup_query(start, end, rollup.origin_key, rollup.destination_key).order_by(
+        func.sum(rollup.seats_booked).desc(), rollup.origin_key, rollup.destination_key
+    ).limit(limit)
+
+    result = await db.execute(query)
+    return [
+        {"origin_key": row.origin_key, "destination_key": row.destination_key, **rollup_totals(row)}
+        for row in result
+    ]
+
+
+# --- Endpoint to run batch commute matching now (normally scheduled: python -m backend.matching) ---
+@router.post("/matching/run", response_model=schemas.MatchRunOut)
+async def run_commute_matching(
+    start: Optional[datetime] = None, # Default: now
+    end: Optional[datetime] = None, # Default: start + MATCH_HORIZON_HOURS
+    db: AsyncSession = Depends(get_db_session)
+):
+    start = start or datetime.now()
+    end = end or start + timedelta(hours=MATCH_HORIZON_HOURS)
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must not be after end")
+    return await run_matching(db, start, end)
@@ -3,16 +3,28 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 import os
 
 from . import models, schemas
-from .database import get_db_session
+from .cache import TTLCache
+from .hashing import PasswordHasher
+from .database import get_db_session, get_read_session, ReadSessionLocal
 from .models import Vehicle
 
 # --- Configuration (Keep existing) ---
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt is slow on purpose; the async handlers hash through this pool instead
+# of blocking the event loop. PASSWORD_HASH_WORKERS=0 hashes inline.
+password_hasher = PasswordHasher(
+    pwd_context,
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
 JWT_SECRET = os.getenv("JWT_SECRET")
@@ -23,6 +35,70 @@ router = APIRouter(
     tags=["Authentication"]
 )
 
+# --- Authenticated Principal Cache ---
+# Resolved users keyed by user_id, so a valid token skips the users lookup.
+# The TTL bounds how stale another worker's view of a changed user can get.
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000")),
+    ttl=float(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+)
+
+@dataclass(frozen=True)
+class Principal:
+    """Detached snapshot of the authenticated user, safe to share across requests."""
+    user_id: int
+    name: str
+    email: str
+    phone: str
+    srn: str
+    role: str
+    user_type: str
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(
+            user_id=user.user_id,
+            name=user.name,
+            email=user.email,
+            phone=user.phone,
+            srn=user.srn,
+            role=user.role,
+            user_type=user.user_type
+        )
+
+def invalidate_principal(user_id: int):
+    principal_cache.pop(user_id)
+
+# A changed user is dropped at flush and again once the transaction commits: a
+# request that reads the user in between still sees the old row and may cache
+# it. A rollback needs nothing more, since a dropped entry is just a miss.
+def _drop_principal_now_and_on_commit(target):
+    invalidate_principal(target.user_id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("changed_principals", set()).add(target.user_id)
+
+@event.listens_for(models.User, "after_update")
+def _drop_updated_principal(mapper, connection, target):
+    # after_update also fires for users that were only touched through a
+    # relationship backref (e.g. a new ride's driver), so check the columns
+    state = inspect(target)
+    if any(state.attrs[attr.key].history.has_changes() for attr in mapper.column_attrs):
+        _drop_principal_now_and_on_commit(target)
+
+@event.listens_for(models.User, "after_delete")
+def _drop_deleted_principal(mapper, connection, target):
+    _drop_principal_now_and_on_commit(target)
+
+@event.listens_for(Session, "after_commit")
+def _drop_committed_principals(session):
+    for user_id in session.info.pop("changed_principals", ()):
+        invalidate_principal(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_principals(session):
+    session.info.pop("changed_principals", None)
+
 # --- Utility Functions (Keep existing) ---
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -35,11 +111,36 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=ALGORITHM)
     return encoded_jwt
 
-# --- Dependency to get the current user (Keep existing) ---
+# --- Scoped tokens: short-lived, good for one purpose only (e.g. live.py's stream) ---
+def create_scoped_token(principal: "Principal", scope: str, seconds: int) -> str:
+    expires = datetime.now(timezone.utc) + timedelta(seconds=seconds)
+    return create_access_token({"sub": principal.email, "uid": principal.user_id, "scope": scope, "exp": expires})
+
+def verify_scoped_token(token: str, scope: str) -> dict:
+    """The payload of an unexpired `scope` token, or a 401."""
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
+    except JWTError:
+        payload = {}
+    if payload.get("scope") != scope or payload.get("uid") is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials")
+    return payload
+
+async def _find_user(db: AsyncSession, query):
+    result = await db.execute(query)
+    user = result.scalars().first()
+    if user is None and db.info.get("route") == "replica":
+        # A brand-new account may not have reached the replica yet
+        async with ReadSessionLocal() as primary:
+            result = await primary.execute(query)
+            user = result.scalars().first()
+    return user
+
+# --- Dependency to get the current user (served from principal_cache when possible) ---
 async def get_current_user(
     token: str = Depends(oauth2_scheme), 
-    db: AsyncSession = Depends(get_db_session)
-):
+    db: AsyncSession = Depends(get_read_session)
+) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -48,19 +149,30 @@ async def get_current_user(
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        if email is None:
+        # Scoped tokens only open what they were issued for, never the API
+        if email is None or "scope" in payload:
             raise credentials_exception
-        token_data = schemas.TokenData(email=email)
+        token_data = schemas.TokenData(email=email, user_id=payload.get("uid"))
     except JWTError:
         raise credentials_exception
+
+    # Tokens issued before "uid" was added fall through to the email lookup
+    if token_data.user_id is not None:
+        principal = principal_cache.get(token_data.user_id)
+        if principal is not None and principal.email == token_data.email:
+            return principal
+        query = select(models.User).where(models.User.user_id == token_data.user_id)
+    else:
+        query = select(models.User).where(models.User.email == token_data.email)
+
+    user = await _find_user(db, query)
     
-    query = select(models.User).where(models.User.email == token_data.email)
-    result = await db.execute(query)
-    user = result.scalars().first()
-    
-    if user is None:
+    if user is None or user.email != token_data.email:
         raise credentials_exception
-    return user
+
+    principal = Principal.from_user(user)
+    principal_cache.set(principal.user_id, principal)
+    return principal
 
 
 # --- Registration Endpoint (FINAL FIXED VERSION) ---
@@ -82,7 +194,7 @@ async def register_user(
             detail="Email or SRN already registered"
         )
         
-    hashed_password = get_password_hash(user_in.password)
+    hashed_password = await password_hasher.hash(user_in.password)
     
     # 2. Create the new User
     new_user = models.User(
@@ -91,7 +203,7 @@ async def register_user(
         password=hashed_password,
         phone=user_in.phone,
         srn=user_in.srn,
-        role=user_in.role.lower(),
+        role=user_in.role,
         user_type=user_in.user_type.value 
     )
     db.add(new_user)
@@ -100,7 +212,7 @@ async def register_user(
     await db.flush() 
     
     # 3. Create Vehicle if role is 'driver'
-    if user_in.role.lower() == 'driver':
+    if user_in.role == 'driver':
         if not user_in.license_plate or not user_in.vehicle_model:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -130,26 +242,29 @@ async def register_user(
 @router.post("/token", response_model=schemas.Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), 
-    db: AsyncSession = Depends(get_db_session)
+    db: AsyncSession = Depends(get_read_session)
 ):
     query = select(models.User).where(models.User.email == form_data.username)
-    result = await db.execute(query)
-    user = result.scalars().first()
+    user = await _find_user(db, query)
+
+    # Hand the connection back to the pool before the slow bcrypt check
+    await db.close()
     
-    if not user or not verify_password(form_data.password, user.password):
+    if not user or not await password_hasher.verify(form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
         
+    # "uid" and "role" let get_current_user resolve the caller from principal_cache
     access_token = create_access_token(
-        data={"sub": user.email, "role": user.role}
+        data={"sub": user.email, "uid": user.user_id, "role": user.role}
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 # --- "Get Me" Endpoint (Keep existing) ---
 @router.get("/me", response_model=schemas.UserOut)
-async def read_users_me(current_user: models.User = Depends(get_current_user)):
+async def read_users_me(current_user: Principal = Depends(get_current_user)):
     return current_user
\ No newline at end of file
@@ -1,118 +1,307 @@
 # backend/bookings.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload, joinedload
-from typing import List
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import update, func
+from typing import List, Optional, Union
+from datetime import datetime, timedelta
+import os
 
 from . import models, schemas
-from .database import get_db_session
-from .auth import get_current_user # Import our dependency
+from .database import get_db_session, get_read_session, mark_user_write, on_commit
+from .auth import get_current_user, Principal # Import our dependency
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor
+from .search_cache import invalidate_ride_searches
+from .rollups import rollup_booking
+from .live import publish_seat_change
 
 router = APIRouter(
     prefix="/api/bookings",
     tags=["Bookings"],
+    default_response_class=ORJSONResponse,
     dependencies=[Depends(get_current_user)] # All booking routes are protected
 )
 
-# --- Endpoint to Create a Booking (Adjusted for new transaction pattern) ---
+# --- Seat Reservation ---
+async def reserve_seats(db: AsyncSession, ride_id: int, seats: int, passenger_id: int) -> bool:
+    """Take `seats` from a ride in one conditional UPDATE.
+
+    The row lock is held only for the UPDATE itself (until commit), and the
+    WHERE clause makes overbooking impossible. Returns False when the ride
+    does not exist, is the passenger's own, lacks the seats, or has waypoints
+    (those go through reserve_segment_seats).
+    """
+    stmt = update(models.Ride).where(
+        models.Ride.ride_id == ride_id,
+        models.Ride.seats_available >= seats,
+        models.Ride.driver_id != passenger_id,
+        models.Ride.stop_count.is_(None)
+    ).values(
+        seats_available=models.Ride.seats_available - seats,
+        version=models.Ride.version + 1
+    ).execution_options(synchronize_session=False)
+
+    result = await db.execute(stmt)
+    return result.rowcount == 1
+
+async def release_seats(db: AsyncSession, ride_id: int, seats: int) -> bool:
+    """Give `seats` back to a ride atomically; False if the ride is gone."""
+    stmt = update(models.Ride).where(
+        models.Ride.ride_id == ride_id
+    ).values(
+        seats_available=models.Ride.seats_available + seats,
+        version=models.Ride.version + 1
+    ).execution_options(synchronize_session=False)
+
+    result = await db.execute(stmt)
+    return result.rowcount == 1
+
+async def _sync_ride_seats(db: AsyncSession, ride_id: int):
+    """Mirror the tightest segment into rides.seats_available and bump the version."""
+    tightest = select(func.min(models.RideSegment.seats_available)).where(
+        models.RideSegment.ride_id == ride_id
+    ).scalar_subquery()
+    stmt = update(models.Ride).where(
+        models.Ride.ride_id == ride_id
+    ).values(
+        seats_available=tightest,
+        version=models.Ride.version + 1
+    ).execution_options(synchronize_session=False)
+    await db.execute(stmt)
+
+class _ShortRange(Exception):
+    """Rolls back reserve_segment_seats' savepoint when a segment lacked the seats."""
+
+async def reserve_segment_seats(db: AsyncSession, ride_id: int, from_stop: int, to_stop: int, seats: int) -> bool:
+    """Take `seats` on every segment from from_stop to to_stop, or on none.
+
+    One conditional UPDATE over the range; rows are locked in segment order, so
+    overlapping bookings queue instead of deadlocking. If any segment lacks the
+    seats fewer rows match, and the savepoint is rolled back: False means
+    nothing changed, and the caller's transaction can carry on.
+    """
+    stmt = update(models.RideSegment).where(
+        models.RideSegment.ride_id == ride_id,
+        models.RideSegment.segment_index >= from_stop,
+        models.RideSegment.segment_index < to_stop,
+        models.RideSegment.seats_available >= seats
+    ).values(
+        seats_available=models.RideSegment.seats_available - seats
+    ).execution_options(synchronize_session=False)
+
+    try:
+        async with db.begin_nested():
+            result = await db.execute(stmt)
+            if result.rowcount != to_stop - from_stop:
+                raise _ShortRange()
+    except _ShortRange:
+        return False
+    await _sync_ride_seats(db, ride_id)
+    return True
+
+async def release_segment_seats(db: AsyncSession, ride_id: int, from_stop: int, to_stop: int, seats: int) -> bool:
+    stmt = update(models.RideSegment).where(
+        models.RideSegment.ride_id == ride_id,
+        models.RideSegment.segment_index >= from_stop,
+        models.RideSegment.segment_index < to_stop
+    ).values(
+        seats_available=models.RideSegment.seats_available + seats
+    ).execution_options(synchronize_session=False)
+
+    result = await db.execute(stmt)
+    if result.rowcount != to_stop - from_stop:
+        return False
+    await _sync_ride_seats(db, ride_id)
+    return True
+
+async def load_stop_km(db: AsyncSession, ride_id: int, stops: Optional[tuple] = None) -> dict:
+    """km_from_origin by stop_index for a ride with waypoints (only `stops` when given)."""
+    query = select(models.RideStop.stop_index, models.RideStop.km_from_origin).where(models.RideStop.ride_id == ride_id)
+    if stops is not None:
+        query = query.where(models.RideStop.stop_index.in_(stops))
+    return dict((await db.execute(query)).all())
+
+def span_km(stop_km: dict, from_stop: int, to_stop: int):
+    start, end = stop_km.get(from_stop), stop_km.get(to_stop)
+    return 0 if start is None or end is None else end - start
+
+async def booking_seat_km(db: AsyncSession, ride, seats: int, from_stop: Optional[int], to_stop: Optional[int]):
+    """Seat-km for the rollups: `seats` over the whole ride, or between the stops on a ride with waypoints."""
+    if from_stop is None:
+        return seats * (ride.distance_km or 0)
+    return seats * span_km(await load_stop_km(db, ride.ride_id, (from_stop, to_stop)), from_stop, to_stop)
+
+def resolve_stop_range(ride, from_stop: Optional[int], to_stop: Optional[int]):
+    """The (from_stop, to_stop) a request covers on a ride with waypoints; defaults to the whole route."""
+    from_stop = 0 if from_stop is None else from_stop
+    to_stop = ride.stop_count - 1 if to_stop is None else to_stop
+    if not 0 <= from_stop < to_stop < ride.stop_count:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid stop range for this ride")
+    return from_stop, to_stop
+
+# --- Endpoint to Create a Booking (single-statement seat reservation) ---
 @router.post("/", response_model=schemas.BookingOut, status_code=status.HTTP_201_CREATED)
 async def create_booking(
     booking_in: schemas.BookingCreate,
     db: AsyncSession = Depends(get_db_session),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role.lower() != 'passenger':
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only passengers can book rides"
         )
-
-    # 1. Get the ride and lock it (without explicit begin/commit)
-    query_ride = select(models.Ride).where(
-        models.Ride.ride_id == booking_in.ride_id
-    ).with_for_update() 
-
-    result_ride = await db.execute(query_ride)
-    ride = result_ride.scalars().first()
-
-    # 2. Validation
-    if not ride:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ride not found")
-    if ride.driver_id == current_user.user_id:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You cannot book your own ride")
-    if ride.seats_available < booking_in.seats_booked:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Not enough seats. Only {ride.seats_available} available.")
     if booking_in.seats_booked <= 0:
          raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Must book at least 1 seat.")
 
-    # 3. Update ride seats
-    ride.seats_available -= booking_in.seats_booked
+    # 1. Reserve the seats; only a failed reservation pays for a read to explain why.
+    # Rides with waypoints always take that read, to resolve the stop range.
+    from_stop = to_stop = None
+    whole_route = booking_in.from_stop is None and booking_in.to_stop is None
+    if not (whole_route and await reserve_seats(db, booking_in.ride_id, booking_in.seats_booked, current_user.user_id)):
+        # Locked: every seat writer takes the ride row before any segment rows,
+        # so segment bookings, cancels and waitlist promotion can't deadlock
+        query_ride = select(models.Ride.driver_id, models.Ride.seats_available, models.Ride.stop_count).where(
+            models.Ride.ride_id == booking_in.ride_id
+        ).with_for_update()
+        ride = (await db.execute(query_ride)).first()
+        if not ride:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ride not found")
+        if ride.driver_id == current_user.user_id:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You cannot book your own ride")
+        if ride.stop_count is None:
+            if not whole_route:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="This ride has no intermediate stops")
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Not enough seats. Only {ride.seats_available} available.")
+
+        from_stop, to_stop = resolve_stop_range(ride, booking_in.from_stop, booking_in.to_stop)
+        if not await reserve_segment_seats(db, booking_in.ride_id, from_stop, to_stop, booking_in.seats_booked):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Not enough seats between those stops.")
 
-    # 4. Create the new booking
+    # 2. Create the new booking (Commit happens when get_db_session exits)
     new_booking = models.Booking(
         ride_id=booking_in.ride_id,
         passenger_id=current_user.user_id,
         seats_booked=booking_in.seats_booked,
-        status="confirmed"
+        status="confirmed",
+        from_stop=from_stop,
+        to_stop=to_stop
     )
     db.add(new_booking)
+    await db.flush()
 
-    # 5. Flush and Refresh (Commit happens when get_db_session exits)
-    await db.flush() 
-    await db.refresh(new_booking)
-
-    # 6. Query final data for response
-    final_booking_query = select(models.Booking).where(
-        models.Booking.booking_id == new_booking.booking_id
+    # 3. One read for the response: the ride (already decremented) with driver and vehicle
+    query_ride = select(models.Ride).where(
+        models.Ride.ride_id == booking_in.ride_id
     ).options(
-        joinedload(models.Booking.ride).joinedload(models.Ride.driver),
-        joinedload(models.Booking.ride).joinedload(models.Ride.vehicle)
+        joinedload(models.Ride.driver),
+        joinedload(models.Ride.vehicle)
     )
-    result = await db.execute(final_booking_query)
-    final_booking = result.scalars().first()
+    result = await db.execute(query_ride)
+    ride = result.scalars().first()
+    set_committed_value(new_booking, "ride", ride)
+    seat_km = None
+    if from_stop is not None:
+        seat_km = await booking_seat_km(db, ride, new_booking.seats_booked, from_stop, to_stop)
+    await rollup_booking(db, ride, new_booking.seats_booked, seat_km=seat_km)
+    mark_user_write(current_user.user_id)
+    on_commit(db, lambda: invalidate_ride_searches(ride))
+    on_commit(db, lambda: publish_seat_change(
+        ride, -new_booking.seats_booked, ride.seats_available, from_stop, to_stop
+    ))
 
-    if not final_booking: raise HTTPException(status_code=500, detail="Could not retrieve booking after creation.")
+    return new_booking
 
-    return final_booking
 
+# --- Lite projection: the columns BookingLite needs, joined in one query ---
+BOOKING_LITE_COLUMNS = (
+    models.Booking.booking_id, models.Booking.ride_id, models.Booking.seats_booked, models.Booking.status,
+    models.Ride.origin, models.Ride.destination, models.Ride.date_time, models.Ride.price,
+    models.User.name.label("driver_name"), models.User.phone.label("driver_phone"),
+)
 
-# --- Endpoint to get "My Bookings" (Kept for completeness) ---
-@router.get("/my-bookings", response_model=List[schemas.BookingOut])
+def booking_lite(row) -> dict:
+    return {
+        "booking_id": row.booking_id,
+        "ride_id": row.ride_id,
+        "seats_booked": row.seats_booked,
+        "status": row.status,
+        "ride": {
+            "ride_id": row.ride_id,
+            "origin": row.origin,
+            "destination": row.destination,
+            "date_time": row.date_time,
+            "price": float(row.price),
+            "driver": {"name": row.driver_name, "phone": row.driver_phone},
+        },
+    }
+
+# --- Endpoint to get "My Bookings" (keyset paginated, newest first) ---
+# Rendered with orjson directly, skipping the response_model pass.
+@router.get("/my-bookings", response_model=Union[schemas.BookingPage, schemas.BookingLitePage])
 async def get_my_bookings(
-    db: AsyncSession = Depends(get_db_session),
-    current_user: models.User = Depends(get_current_user)
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    view: schemas.ResponseView = "full",
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_user)
 ):
-    query = select(models.Booking).where(
+    if view == "lite":
+        query = select(*BOOKING_LITE_COLUMNS).join(models.Booking.ride).join(models.Ride.driver)
+    else:
+        query = select(models.Booking).options(
+            joinedload(models.Booking.ride).joinedload(models.Ride.driver),
+            joinedload(models.Booking.ride).joinedload(models.Ride.vehicle)
+        )
+    query = query.where(
         models.Booking.passenger_id == current_user.user_id
-    ).options(
-        joinedload(models.Booking.ride).joinedload(models.Ride.driver),
-        joinedload(models.Booking.ride).joinedload(models.Ride.vehicle)
-    ).order_by(models.Booking.booking_id.desc())
+    )
+
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1, types=(int,))
+        query = query.where(models.Booking.booking_id < last_id)
+
+    # Fetch one extra row to learn whether another page exists
+    query = query.order_by(models.Booking.booking_id.desc()).limit(limit + 1)
 
     result = await db.execute(query)
-    bookings = result.scalars().all()
+    bookings = result.all() if view == "lite" else result.scalars().all()
 
-    return bookings
+    next_cursor = None
+    if len(bookings) > limit:
+        bookings = bookings[:limit]
+        next_cursor = encode_cursor(bookings[-1].booking_id)
+
+    if view == "lite":
+        items = [booking_lite(row) for row in bookings]
+    else:
+        items = [schemas.BookingOut.model_validate(booking).model_dump() for booking in bookings]
+    return ORJSONResponse({"items": items, "limit": limit, "next_cursor": next_cursor})
 
 # --- Endpoint to Cancel a Booking (FINAL FIXED VERSION) ---
 @router.post("/{booking_id}/cancel", status_code=status.HTTP_200_OK)
 async def cancel_booking(
     booking_id: int,
     db: AsyncSession = Depends(get_db_session),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     try:
-        # 1. Find the booking and eagerly load the associated ride
-        query = select(models.Booking).where(
+        # 1. Find the booking, plus the ride's route, day and distance for the cache and rollups.
+        # The ride row is locked too, so nobody joins its waitlist between this read and the promotion below
+        query = select(
+            models.Booking, models.Ride.ride_id, models.Ride.origin_key, models.Ride.destination_key,
+            models.Ride.date_time, models.Ride.distance_km, models.Ride.stop_count, models.Ride.waitlist_count
+        ).join(models.Booking.ride).where(
             models.Booking.booking_id == booking_id
-        ).options(
-            selectinload(models.Booking.ride) # Load the ride object
-        ).with_for_update() # Lock the booking row
+        ).with_for_update(of=(models.Booking, models.Ride)) # Lock the booking and ride rows
 
         result = await db.execute(query)
-        booking = result.scalars().first()
+        row = result.first()
+        booking, ride = (row[0], row) if row else (None, None)
 
         # 2. Validation
         if not booking:
@@ -121,12 +310,38 @@ async def cancel_booking(
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You can only cancel your own bookings")
         if booking.status != "confirmed":
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Booking is not confirmed or already cancelled")
-        if not booking.ride:
-             raise HTTPException(status_code=500, detail="Associated ride data is missing.")
 
-        # 3. Update data
-        booking.ride.seats_available += booking.seats_booked # Return seats
-        booking.status = "cancelled" # Change status
+        # 3. Update data: flip the status only while it is still confirmed, so two
+        # racing cancels can't both return the seats, then return them atomically
+        flip_status = update(models.Booking).where(
+            models.Booking.booking_id == booking_id,
+            models.Booking.status == "confirmed"
+        ).values(status="cancelled").execution_options(synchronize_session=False)
+        if (await db.execute(flip_status)).rowcount != 1:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Booking is not confirmed or already cancelled")
+        if booking.from_stop is not None:
+            released = await release_segment_seats(db, booking.ride_id, booking.from_stop, booking.to_stop, booking.seats_booked)
+        else:
+            released = await release_seats(db, booking.ride_id, booking.seats_booked)
+        if not released:
+             raise HTTPException(status_code=500, detail="Associated ride data is missing.")
+        seat_km = await booking_seat_km(db, ride, booking.seats_booked, booking.from_stop, booking.to_stop)
+        await rollup_booking(db, ride, booking.seats_booked, sign=-1, seat_km=seat_km)
+        mark_user_write(current_user.user_id)
+        on_commit(db, lambda: invalidate_ride_searches(ride))
+        # Plain rides skip the read back and subscribers apply the delta; on a
+        # ride with waypoints the delta doesn't give the tightest segment
+        seats_left = None
+        if booking.from_stop is not None:
+            seats_left = (await db.execute(
+                select(models.Ride.seats_available).where(models.Ride.ride_id == booking.ride_id)
+            )).scalar()
+        on_commit(db, lambda: publish_seat_change(
+            ride, booking.seats_booked, seats_left, booking.from_stop, booking.to_stop
+        ))
+        # 4. Hand the freed seats to the waitlist before anyone else can book them
+        if ride.waitlist_count:
+            await promote_waitlist(db, ride)
 
         # Commit will happen automatically when the function exits successfully via get_db_session().
 
@@ -138,4 +353,311 @@ async def cancel_booking(
         print(f"DATABASE CANCELLATION FAILED: {e}")
         raise HTTPException(status_code=500, detail="Cancellation failed due to a database error.")
 
-    return {"detail": "Booking cancelled successfully"}
\ No newline at end of file
+    return {"detail": "Booking cancelled successfully"}
+
+
+# --- Waitlist: FIFO queue for full rides, promoted by cancel_booking ---
+# Waiting entries read per query while promoting
+WAITLIST_PROMOTE_BATCH = int(os.getenv("WAITLIST_PROMOTE_BATCH", "50"))
+
+async def promote_waitlist(db: AsyncSession, ride) -> List[models.Booking]:
+    """Turn waiting entries into confirmed bookings, in queue order, while the seats last.
+
+    Call with the ride row locked (cancel_booking holds it), so the seat counts
+    read here can't move before the reservations below. An entry that doesn't
+    fit is passed over rather than blocking the queue, so a request for three
+    seats doesn't keep a freed single seat from the passenger behind it. The
+    queue is read in batches of WAITLIST_PROMOTE_BATCH, skipping requests larger
+    than the most seats left anywhere, until the seats or the queue run out.
+    `ride` needs ride_id, stop_count and what rollup_booking/publish_seat_change read.
+    """
+    if ride.stop_count is None:
+        free = (await db.execute(
+            select(models.Ride.seats_available).where(models.Ride.ride_id == ride.ride_id)
+        )).scalar()
+        segments = None
+    else:
+        segments = list((await db.execute(
+            select(models.RideSegment.seats_available).where(
+                models.RideSegment.ride_id == ride.ride_id
+            ).order_by(models.RideSegment.segment_index)
+        )).scalars().all())
+
+    promoted = []
+    last_entry_id = 0
+    while True:
+        most_free = free if segments is None else max(segments)
+        if most_free <= 0:
+            break
+        query = select(models.WaitlistEntry).where(
+            models.WaitlistEntry.ride_id == ride.ride_id,
+            models.WaitlistEntry.status == "waiting",
+            models.WaitlistEntry.entry_id > last_entry_id,
+            models.WaitlistEntry.seats_requested <= most_free
+        ).order_by(models.WaitlistEntry.entry_id).limit(WAITLIST_PROMOTE_BATCH).with_for_update()
+        entries = (await db.execute(query)).scalars().all()
+
+        for entry in entries:
+            seats = entry.seats_requested
+            if segments is None:
+                if seats > free or not await reserve_seats(db, ride.ride_id, seats, entry.passenger_id):
+                    continue
+                free -= seats
+            else:
+                if min(segments[entry.from_stop:entry.to_stop]) < seats:
+                    continue
+                if not await reserve_segment_seats(db, ride.ride_id, entry.from_stop, entry.to_stop, seats):
+                    continue
+                for i in range(entry.from_stop, entry.to_stop):
+                    segments[i] -= seats
+            promoted.append(entry)
+
+        if len(entries) < WAITLIST_PROMOTE_BATCH:
+            break
+        last_entry_id = entries[-1].entry_id
+
+    if not promoted:
+        return []
+
+    bookings = [
+        models.Booking(
+            ride_id=ride.ride_id,
+            passenger_id=entry.passenger_id,
+            seats_booked=entry.seats_requested,
+            status="confirmed",
+            from_stop=entry.from_stop,
+            to_stop=entry.to_stop
+        )
+        for entry in promoted
+    ]
+    db.add_all(bookings)
+    await db.flush()
+    for entry, new_booking in zip(promoted, bookings):
+        entry.status = "promoted"
+        entry.booking_id = new_booking.booking_id
+        mark_user_write(entry.passenger_id)
+
+    await db.execute(update(models.Ride).where(
+        models.Ride.ride_id == ride.ride_id
+    ).values(
+        waitlist_count=models.Ride.waitlist_count - len(promoted)
+    ).execution_options(synchronize_session=False))
+    seat_km = None
+    if segments is not None:
+        stop_km = await load_stop_km(db, ride.ride_id)
+        seat_km = sum(b.seats_booked * span_km(stop_km, b.from_stop, b.to_stop) for b in bookings)
+    await rollup_booking(db, ride, sum(b.seats_booked for b in bookings), bookings=len(bookings), seat_km=seat_km)
+
+    # The counts tracked above are the ride's seats once every promotion is in
+    seats_left = free if segments is None else min(segments)
+    def publish():
+        for new_booking in bookings:
+            publish_seat_change(ride, -new_booking.seats_booked, seats_left, new_booking.from_stop, new_booking.to_stop)
+    on_commit(db, publish)
+    return bookings
+
+def waitlist_out(entry: models.WaitlistEntry, position: Optional[int] = None) -> schemas.WaitlistOut:
+    return schemas.WaitlistOut(
+        entry_id=entry.entry_id,
+        ride_id=entry.ride_id,
+        seats_requested=entry.seats_requested,
+        from_stop=entry.from_stop,
+        to_stop=entry.to_stop,
+        status=entry.status,
+        booking_id=entry.booking_id,
+        position=position
+    )
+
+# --- Endpoint to join a full ride's waitlist ---
+@router.post("/waitlist", response_model=schemas.WaitlistOut, status_code=status.HTTP_201_CREATED)
+async def join_waitlist(
+    entry_in: schemas.WaitlistCreate,
+    db: AsyncSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role.lower() != 'passenger':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only passengers can join a waitlist"
+        )
+    if entry_in.seats_requested <= 0:
+         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Must request at least 1 seat.")
+
+    # Locked like cancel_booking does, so the ride can't free seats between the
+    # "is it full" check and the entry being queued for promotion
+    query_ride = select(
+        models.Ride.driver_id, models.Ride.seats_available, models.Ride.seats_total,
+        models.Ride.stop_count, models.Ride.waitlist_count
+    ).where(
+        models.Ride.ride_id == entry_in.ride_id
+    ).with_for_update()
+    ride = (await db.execute(query_ride)).first()
+    if not ride:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ride not found")
+    if ride.driver_id == current_user.user_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You cannot book your own ride")
+    # Such an entry could never be promoted, and would sit in the queue for good
+    if entry_in.seats_requested > ride.seats_total:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"This ride only has {ride.seats_total} seats in total"
+        )
+
+    from_stop = to_stop = None
+    if ride.stop_count is None:
+        if entry_in.from_stop is not None or entry_in.to_stop is not None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="This ride has no intermediate stops")
+        free = ride.seats_available
+    else:
+        from_stop, to_stop = resolve_stop_range(ride, entry_in.from_stop, entry_in.to_stop)
+        free = (await db.execute(select(func.min(models.RideSegment.seats_available)).where(
+            models.RideSegment.ride_id == entry_in.ride_id,
+            models.RideSegment.segment_index >= from_stop,
+            models.RideSegment.segment_index < to_stop
+        ))).scalar()
+    if free >= entry_in.seats_requested:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Seats are available; book the ride directly")
+
+    query = select(models.WaitlistEntry.entry_id).where(
+        models.WaitlistEntry.ride_id == entry_in.ride_id,
+        models.WaitlistEntry.passenger_id == current_user.user_id,
+        models.WaitlistEntry.status == "waiting"
+    )
+    if (await db.execute(query)).first():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You are already on this ride's waitlist")
+
+    entry = models.WaitlistEntry(
+        ride_id=entry_in.ride_id,
+        passenger_id=current_user.user_id,
+        seats_requested=entry_in.seats_requested,
+        from_stop=from_stop,
+        to_stop=to_stop,
+        status="waiting"
+    )
+    db.add(entry)
+    await db.flush()
+    await db.execute(update(models.Ride).where(
+        models.Ride.ride_id == entry_in.ride_id
+    ).values(
+        waitlist_count=models.Ride.waitlist_count + 1
+    ).execution_options(synchronize_session=False))
+    mark_user_write(current_user.user_id)
+
+    # Everyone already waiting is ahead of this entry
+    return waitlist_out(entry, position=ride.waitlist_count + 1)
+
+# --- Endpoint to get the passenger's waiting entries, with their place in line ---
+@router.get("/waitlist/my-entries", response_model=List[schemas.WaitlistOut])
+async def get_my_waitlist(
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    ahead = models.WaitlistEntry.__table__.alias("ahead")
+    position = select(func.count()).where(
+        ahead.c.ride_id == models.WaitlistEntry.ride_id,
+        ahead.c.status == "waiting",
+        ahead.c.entry_id <= models.WaitlistEntry.entry_id
+    ).scalar_subquery()
+    query = select(models.WaitlistEntry, position.label("position")).where(
+        models.WaitlistEntry.passenger_id == current_user.user_id,
+        models.WaitlistEntry.status == "waiting"
+    ).order_by(models.WaitlistEntry.entry_id)
+
+    result = await db.execute(query)
+    return [waitlist_out(entry, position) for entry, position in result.all()]
+
+# --- Endpoint to leave a waitlist ---
+@router.delete("/waitlist/{entry_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def leave_waitlist(
+    entry_id: int,
+    db: AsyncSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    entry = await db.get(models.WaitlistEntry, entry_id)
+    if not entry or entry.passenger_id != current_user.user_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Waitlist entry not found")
+
+    # Ride row first, entry second: the same lock order as a promoting cancel.
+    # The entry flips only while still waiting, so a concurrent promotion wins
+    # cleanly (and the raise rolls the count back).
+    await db.execute(update(models.Ride).where(
+        models.Ride.ride_id == entry.ride_id
+    ).values(
+        waitlist_count=models.Ride.waitlist_count - 1
+    ).execution_options(synchronize_session=False))
+    leave = update(models.WaitlistEntry).where(
+        models.WaitlistEntry.entry_id == entry_id,
+        models.WaitlistEntry.status == "waiting"
+    ).values(status="left").execution_options(synchronize_session=False)
+    if (await db.execute(leave)).rowcount != 1:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Waitlist entry is no longer waiting")
+    mark_user_write(current_user.user_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+# --- Trip requests: commutes booked in batch by matching.run_matching ---
+@router.post("/trip-requests", response_model=schemas.TripRequestOut, status_code=status.HTTP_201_CREATED)
+async def create_trip_request(
+    request_in: schemas.TripRequestCreate,
+    db: AsyncSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role.lower() != 'passenger':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only passengers can request trips"
+        )
+    if request_in.seats_requested <= 0:
+         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Must request at least 1 seat.")
+    if request_in.latest_departure < request_in.earliest_departure:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="latest_departure cannot be before earliest_departure")
+    coordinates = (request_in.origin_lat, request_in.origin_lng, request_in.destination_lat, request_in.destination_lng)
+    if any(value is not None for value in coordinates) and None in coordinates:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Give all of origin_lat, origin_lng, destination_lat and destination_lng, or none"
+        )
+
+    trip_request = models.TripRequest(
+        **request_in.model_dump(),
+        passenger_id=current_user.user_id,
+        status="pending"
+    )
+    db.add(trip_request)
+    await db.flush()
+    mark_user_write(current_user.user_id)
+    return trip_request
+
+@router.get("/trip-requests/my-requests", response_model=List[schemas.TripRequestOut])
+async def get_my_trip_requests(
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    """The passenger's pending requests and those matched or cancelled in the last day."""
+    query = select(models.TripRequest).where(
+        models.TripRequest.passenger_id == current_user.user_id,
+        models.TripRequest.latest_departure >= datetime.now() - timedelta(days=1)
+    ).order_by(models.TripRequest.earliest_departure)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+@router.delete("/trip-requests/{trip_request_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_trip_request(
+    trip_request_id: int,
+    db: AsyncSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Withdraw a pending request. Once matched, cancel the booking instead."""
+    trip_request = await db.get(models.TripRequest, trip_request_id)
+    if not trip_request or trip_request.passenger_id != current_user.user_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Trip request not found")
+
+    # Flip only while still pending, so a concurrent matching run wins cleanly
+    withdraw = update(models.TripRequest).where(
+        models.TripRequest.trip_request_id == trip_request_id,
+        models.TripRequest.status == "pending"
+    ).values(status="cancelled").execution_options(synchronize_session=False)
+    if (await db.execute(withdraw)).rowcount != 1:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Trip request is no longer pending")
+    mark_user_write(current_user.user_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
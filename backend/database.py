@@ -1,9 +1,19 @@
 # backend/database.py
 
+import math
 import os
+import random
+import logging
+import time
+from contextvars import ContextVar
 from dotenv import load_dotenv
+from fastapi import Request
+from jose import JWTError, jwt
+from sqlalchemy import event, exc, insert, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from pathlib import Path
 
 # Path finding logic
@@ -15,7 +25,140 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("No DATABASE_URL set in environment variables. Check your .env file.")
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Optional read replica. Locally, point it at a copy of the primary SQLite file.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+
+# --- Engine Profiles ---
+# APP_ENV picks a baseline; any DB_* variable overrides that single setting.
+APP_ENV = os.getenv("APP_ENV", "development").lower()
+
+ENGINE_PROFILES = {
+    "development": {
+        "pool_size": 5, "max_overflow": 10, "pool_timeout": 30.0,
+        "pool_pre_ping": False, "pool_recycle": -1,
+        "echo": True, "sql_log_sample_rate": 0.0,
+    },
+    "test": {
+        "pool_size": 5, "max_overflow": 10, "pool_timeout": 30.0,
+        "pool_pre_ping": False, "pool_recycle": -1,
+        "echo": False, "sql_log_sample_rate": 0.0,
+    },
+    "production": {
+        # MySQL drops idle connections after wait_timeout; recycle well before that
+        "pool_size": 10, "max_overflow": 5, "pool_timeout": 10.0,
+        "pool_pre_ping": True, "pool_recycle": 1800,
+        "echo": False, "sql_log_sample_rate": 0.01,
+    },
+}
+
+def _parse_bool(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+def engine_settings(env: str = APP_ENV) -> dict:
+    """Resolve the engine profile for `env` with DB_* environment overrides applied."""
+    if env not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown APP_ENV '{env}'. Expected one of: {', '.join(ENGINE_PROFILES)}")
+    settings = dict(ENGINE_PROFILES[env])
+    for key, default in settings.items():
+        raw = os.getenv(f"DB_{key.upper()}")
+        if raw is None:
+            continue
+        settings[key] = _parse_bool(raw) if isinstance(default, bool) else type(default)(raw)
+    return settings
+
+# --- Pool Instrumentation ---
+class PoolMetrics:
+    """Counters for one engine's pool; read them through pool_stats()."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.overflow_events = 0
+        self.timeouts = 0
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that times every checkout and counts overflow opens and timeouts."""
+
+    def __init__(self, *args, metrics: PoolMetrics = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics or PoolMetrics()
+
+    def connect(self):
+        overflow_before = self.overflow()
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        waited = time.perf_counter() - started
+
+        metrics = self.metrics
+        metrics.checkouts += 1
+        metrics.wait_seconds_total += waited
+        metrics.wait_seconds_max = max(metrics.wait_seconds_max, waited)
+        if self.overflow() > max(overflow_before, 0):
+            metrics.overflow_events += 1
+        return connection
+
+    def recreate(self):
+        # engine.dispose() rebuilds the pool; keep the counters across it
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+def pool_stats(target=None) -> dict:
+    pool = (target or engine).pool
+    stats = {"pool_size": pool.size(), "checked_out": pool.checkedout(), "overflow": pool.overflow()}
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats.update(vars(metrics))
+    return stats
+
+# --- Sampled SQL Logging ---
+sql_logger = logging.getLogger("backend.sql")
+
+def _enable_sampled_sql_logging(target, rate: float):
+    """Log roughly `rate` of statements with their duration instead of echoing every one."""
+
+    @event.listens_for(target.sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if random.random() < rate:
+            context._sql_log_started = time.perf_counter()
+
+    @event.listens_for(target.sync_engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_sql_log_started", None)
+        if started is not None:
+            sql_logger.info("%.2fms %s", (time.perf_counter() - started) * 1000, statement)
+
+def build_engine(url: str, settings: dict, **engine_kwargs):
+    kwargs = {"echo": settings["echo"], "pool_pre_ping": settings["pool_pre_ping"], **engine_kwargs}
+    # In-memory SQLite needs its single static connection; everything else gets the tuned pool
+    if make_url(url).database not in (None, "", ":memory:"):
+        kwargs.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings["pool_size"],
+            max_overflow=settings["max_overflow"],
+            pool_timeout=settings["pool_timeout"],
+            pool_recycle=settings["pool_recycle"],
+        )
+    new_engine = create_async_engine(url, **kwargs)
+    if not settings["echo"] and settings["sql_log_sample_rate"] > 0:
+        _enable_sampled_sql_logging(new_engine, settings["sql_log_sample_rate"])
+    return new_engine
+
+engine = build_engine(DATABASE_URL, engine_settings())
+
+# Reads get their own pool of AUTOCOMMIT connections: every statement stands
+# alone, so a read-only request never sends COMMIT and there is no transaction
+# state to reset when a connection goes back to the pool.
+read_engine = build_engine(
+    DATABASE_URL, engine_settings(),
+    isolation_level="AUTOCOMMIT",
+    pool_reset_on_return=None
+)
 
 AsyncSessionLocal = sessionmaker(
     bind=engine,
@@ -23,6 +166,114 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False
 )
 
+class _ReplicaFallbackSession(Session):
+    """Read session that checks out its connection on the first statement.
+
+    A session routed to the replica (info["route"] == "replica") that can't get
+    a replica connection marks the replica down and carries on against the
+    primary's read pool instead, so the request doesn't fail.
+    """
+
+    def _connection_for_bind(self, engine, execution_options=None, **kw):
+        if self.info.get("route") == "replica":
+            try:
+                return super()._connection_for_bind(engine, execution_options, **kw)
+            except (exc.DBAPIError, OSError):
+                mark_replica_down()
+                self.info["route"] = "primary"
+                self.bind = engine = read_engine.sync_engine
+        return super()._connection_for_bind(engine, execution_options, **kw)
+
+ReadSessionLocal = sessionmaker(
+    bind=read_engine,
+    class_=AsyncSession,
+    sync_session_class=_ReplicaFallbackSession,
+    expire_on_commit=False
+)
+
+replica_engine = build_engine(
+    DATABASE_REPLICA_URL, engine_settings(),
+    isolation_level="AUTOCOMMIT",
+    pool_reset_on_return=None
+) if DATABASE_REPLICA_URL else None
+
+# --- Read Routing ---
+# A client that just wrote reads from the primary for this long, so nobody sees
+# their own booking or ride missing because the replica is lagging. The window
+# travels with the client in the READ_YOUR_WRITES_COOKIE (the time of its last
+# write), so it holds whichever worker serves the next request.
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+READ_YOUR_WRITES_COOKIE = "last_write"
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+_replica_down_until = 0.0
+
+# User ids marked by mark_user_write() during the current request
+_request_writes: ContextVar = ContextVar("request_writes", default=None)
+
+def mark_user_write(user_id: int):
+    """Send `user_id`'s reads to the primary for the next READ_YOUR_WRITES_SECONDS.
+
+    Only the caller of the current request can carry the window, so marking
+    anyone else (a promoted waitlist passenger, say) does nothing.
+    """
+    writes = _request_writes.get()
+    if writes is not None:
+        writes.add(user_id)
+
+def mark_replica_down():
+    global _replica_down_until
+    _replica_down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+
+def replica_available() -> bool:
+    return replica_engine is not None and time.monotonic() >= _replica_down_until
+
+def _request_user_id(request: Request):
+    """Best-effort caller id for routing only; auth.get_current_user does the real verification."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.get_unverified_claims(token).get("uid")
+    except JWTError:
+        return None
+
+def in_read_your_writes_window(request: Request) -> bool:
+    try:
+        last_write = float(request.cookies.get(READ_YOUR_WRITES_COOKIE, ""))
+    except ValueError:
+        return False
+    # A timestamp from the future is ignored rather than pinning the client to the primary
+    return 0 <= time.time() - last_write < READ_YOUR_WRITES_SECONDS
+
+class ReadYourWritesMiddleware:
+    """Sets the READ_YOUR_WRITES_COOKIE on successful responses to requests that marked their caller."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        writes = set()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and writes and message["status"] < 400:
+                if _request_user_id(Request(scope)) in writes:
+                    cookie = (
+                        f"{READ_YOUR_WRITES_COOKIE}={time.time():.3f}; Max-Age={math.ceil(READ_YOUR_WRITES_SECONDS)}; "
+                        "Path=/; HttpOnly; SameSite=Lax"
+                    )
+                    message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        token = _request_writes.set(writes)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_writes.reset(token)
+
 Base = declarative_base()
 
 # FINAL, CORRECT Dependency for Transaction Management
@@ -33,8 +284,9 @@ async def get_db_session():
         # 2. Provide the session to the route handler
         yield session
         
-        # 3. Explicitly commit the transaction for POST/PUT/DELETE routes.
-        await session.commit()
+        # 3. Explicitly commit the transaction for POST/PUT/DELETE routes,
+        # then run the on_commit callbacks: only now is the write visible
+        await commit(session)
         
     except Exception:
         # 4. Rollback all changes if any error occurs
@@ -43,4 +295,54 @@ async def get_db_session():
         
     finally:
         # 5. Always close the session
-        await session.close()
\ No newline at end of file
+        await session.close()
+
+def on_commit(session: AsyncSession, callback):
+    """Run `callback()` once `session` is committed through commit(); dropped on rollback."""
+    session.info.setdefault("on_commit", []).append(callback)
+
+async def commit(session: AsyncSession):
+    """Commit `session`, then run its on_commit callbacks. Jobs outside a request use this too."""
+    await session.commit()
+    for callback in session.info.pop("on_commit", []):
+        callback()
+
+# --- Multi-row INSERTs that report their ids ---
+async def insert_returning_ids(session: AsyncSession, model, rows: list) -> list:
+    """INSERT `rows` into `model`'s table in one statement; returns their primary keys in row order.
+
+    Uses RETURNING where the dialect has it. MySQL doesn't, but InnoDB gives a
+    single multi-row INSERT consecutive auto-increment values under every
+    innodb_autoinc_lock_mode, the first being lastrowid, so the ids are known
+    without reading the rows back by value.
+    """
+    pk = model.__mapper__.primary_key[0]
+    if session.bind.dialect.insert_returning:
+        result = await session.execute(insert(model).returning(pk, sort_by_parameter_order=True), rows)
+        return list(result.scalars().all())
+    result = await session.execute(insert(model).values(rows))
+    step = (await session.execute(text("SELECT @@auto_increment_increment"))).scalar()
+    return [result.lastrowid + i * step for i in range(len(rows))]
+
+# Dependency for GET routes and other pure reads: no transaction, no COMMIT.
+# Anything written through this session is silently lost, so never use it for writes.
+# Goes to the replica when one is configured and healthy, unless the caller is
+# inside their read-your-writes window; session.info["route"] records the choice.
+# No connection is taken until the first statement, so a request that never
+# queries (a cached principal on a write route, say) doesn't touch either pool.
+async def get_read_session(request: Request):
+    if replica_available() and not in_read_your_writes_window(request):
+        session = ReadSessionLocal(bind=replica_engine)
+        session.info["route"] = "replica"
+    else:
+        session = ReadSessionLocal()
+        session.info["route"] = "primary"
+
+    try:
+        yield session
+    except exc.DBAPIError as e:
+        if session.info["route"] == "replica" and e.connection_invalidated:
+            mark_replica_down()
+        raise
+    finally:
+        await session.close()
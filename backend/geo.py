@@ -0,0 +1,173 @@
+# backend/geo.py
+
+import asyncio
+import math
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime, time as dt_time
+from typing import Dict, List, NamedTuple, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from . import models
+
+KM_PER_DEGREE_LAT = 111.32
+
+
+class GeoRide(NamedTuple):
+    ride_id: int
+    day: date
+    origin_lat: float
+    origin_lng: float
+    destination_lat: float
+    destination_lng: float
+
+
+class GeoMatch(NamedTuple):
+    ride_id: int
+    pickup_km: float
+    drop_km: float
+
+    @property
+    def score(self) -> float:
+        return self.pickup_km + self.drop_km
+
+
+class RideGrid:
+    """In-memory grid over ride origins, bucketed by departure day.
+
+    Each ride sits in one cell of a fixed lat/lng grid keyed by (day, row, col).
+    A radius query visits only the cells overlapping the pickup's bounding box,
+    then checks the exact pickup and drop distances, so cost scales with the
+    rides near the pickup on that day, not with all active rides.
+
+    Only immutable ride geometry is held here. Seats and other live columns are
+    re-read from the database for the matched ids.
+    """
+
+    def __init__(self, cell_km: float):
+        self.cell_deg = cell_km / KM_PER_DEGREE_LAT
+        self._cells: Dict[Tuple[date, int, int], List[GeoRide]] = defaultdict(list)
+        self._rides: Dict[int, GeoRide] = {}
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)
+
+    def add(self, ride: GeoRide):
+        if ride.ride_id in self._rides:
+            return
+        self._rides[ride.ride_id] = ride
+        row, col = self._cell(ride.origin_lat, ride.origin_lng)
+        self._cells[(ride.day, row, col)].append(ride)
+
+    def drop_days_before(self, day: date):
+        for key in [key for key in self._cells if key[0] < day]:
+            for ride in self._cells.pop(key):
+                del self._rides[ride.ride_id]
+
+    def search(self, day: date, origin: Tuple[float, float], destination: Tuple[float, float], radius_km: float) -> List[GeoMatch]:
+        """Rides on `day` whose pickup and drop are both within radius_km, nearest (pickup + drop) first."""
+        lat, lng = origin
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        # A degree of longitude shrinks with latitude; widen the box to match
+        dlng = radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        row_lo, col_lo = self._cell(lat - dlat, lng - dlng)
+        row_hi, col_hi = self._cell(lat + dlat, lng + dlng)
+
+        # Equirectangular distances around the query points: within the <=50 km
+        # radii used here they agree with great-circle distance to well under 0.1%, at a
+        # fraction of the cost, and this loop runs once per candidate.
+        pickup_kx = KM_PER_DEGREE_LAT * math.cos(math.radians(lat))
+        drop_lat, drop_lng = destination
+        drop_kx = KM_PER_DEGREE_LAT * math.cos(math.radians(drop_lat))
+        radius_sq = radius_km * radius_km
+
+        matches = []
+        for row in range(row_lo, row_hi + 1):
+            for col in range(col_lo, col_hi + 1):
+                for ride in self._cells.get((day, row, col), ()):
+                    dx = (ride.origin_lng - lng) * pickup_kx
+                    dy = (ride.origin_lat - lat) * KM_PER_DEGREE_LAT
+                    pickup_sq = dx * dx + dy * dy
+                    if pickup_sq > radius_sq:
+                        continue
+                    dx = (ride.destination_lng - drop_lng) * drop_kx
+                    dy = (ride.destination_lat - drop_lat) * KM_PER_DEGREE_LAT
+                    drop_sq = dx * dx + dy * dy
+                    if drop_sq <= radius_sq:
+                        matches.append(GeoMatch(ride.ride_id, math.sqrt(pickup_sq), math.sqrt(drop_sq)))
+        matches.sort(key=lambda match: (match.score, match.ride_id))
+        return matches
+
+    def __len__(self):
+        return len(self._rides)
+
+
+class GeoIndex:
+    """A RideGrid of upcoming rides, kept current from the rides table.
+
+    Rides created in this process are added on commit. Rides created by other
+    workers are picked up by refresh(), which re-reads rides by id at most every
+    GEO_REFRESH_SECONDS. It re-reads a small overlap below the highest id seen,
+    because ids can commit out of order.
+    """
+
+    def __init__(self, cell_km: float, refresh_seconds: float, id_overlap: int):
+        self.grid = RideGrid(cell_km)
+        self.refresh_seconds = refresh_seconds
+        self.id_overlap = id_overlap
+        self._max_ride_id = 0
+        self._refreshed_at = None
+        self._today = None
+        self._lock = asyncio.Lock()
+
+    def add_ride(self, ride):
+        """Index a ride (ORM row or Row) if it has complete coordinates."""
+        if None in (ride.origin_lat, ride.origin_lng, ride.destination_lat, ride.destination_lng):
+            return
+        self.grid.add(GeoRide(
+            ride.ride_id, ride.date_time.date(),
+            ride.origin_lat, ride.origin_lng, ride.destination_lat, ride.destination_lng
+        ))
+        self._max_ride_id = max(self._max_ride_id, ride.ride_id)
+
+    async def refresh(self, db: AsyncSession, force: bool = False):
+        now = time.monotonic()
+        if not force and self._refreshed_at is not None and now - self._refreshed_at < self.refresh_seconds:
+            return
+        async with self._lock:
+            if not force and self._refreshed_at is not None and now - self._refreshed_at < self.refresh_seconds:
+                return # Another request refreshed while we waited
+            today = date.today()
+            if today != self._today:
+                self.grid.drop_days_before(today)
+                self._today = today
+
+            query = select(
+                models.Ride.ride_id, models.Ride.date_time,
+                models.Ride.origin_lat, models.Ride.origin_lng,
+                models.Ride.destination_lat, models.Ride.destination_lng
+            ).where(
+                models.Ride.ride_id > max(self._max_ride_id - self.id_overlap, 0),
+                models.Ride.date_time >= datetime.combine(today, dt_time.min),
+                models.Ride.origin_lat.is_not(None),
+                models.Ride.destination_lat.is_not(None)
+            )
+            for ride in await db.execute(query):
+                self.add_ride(ride)
+            self._refreshed_at = time.monotonic()
+
+    def search(self, day: date, origin, destination, radius_km: float) -> List[GeoMatch]:
+        return self.grid.search(day, origin, destination, radius_km)
+
+    def stats(self) -> dict:
+        return {"rides": len(self.grid), "max_ride_id": self._max_ride_id}
+
+
+geo_index = GeoIndex(
+    cell_km=float(os.getenv("GEO_CELL_KM", "2")),
+    refresh_seconds=float(os.getenv("GEO_REFRESH_SECONDS", "5")),
+    id_overlap=int(os.getenv("GEO_REFRESH_ID_OVERLAP", "200"))
+)
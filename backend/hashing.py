@@ -0,0 +1,78 @@
+# backend/hashing.py
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+
+class PasswordHasher:
+    """Runs passlib hash/verify on a bounded worker pool instead of the event loop.
+
+    bcrypt releases the GIL while it works, so a thread pool gives real
+    parallelism. At most `workers` calls run at once; the rest wait on a
+    semaphore, which is what `queued` reports. workers=0 runs the call inline
+    on the loop (the old behaviour, kept for benchmarking).
+    """
+
+    def __init__(self, context: CryptContext, workers: int):
+        self.context = context
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwhash") if workers > 0 else None
+        self._slots = None  # Created lazily so it binds to the running loop
+
+        self.queued = 0
+        self.in_flight = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.wait_seconds_total = 0.0
+        self.run_seconds_total = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(self.context.verify, password, hashed)
+
+    async def _run(self, fn, *args):
+        if self._executor is None:
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self.completed += 1
+                self.run_seconds_total += time.perf_counter() - started
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+        enqueued = time.perf_counter()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        started = time.perf_counter()
+        self.wait_seconds_total += started - enqueued
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.run_seconds_total += time.perf_counter() - started
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "wait_seconds_total": self.wait_seconds_total,
+            "run_seconds_total": self.run_seconds_total,
+        }
@@ -0,0 +1,224 @@
+# backend/live.py
+#
+# Live seat counts over Server-Sent Events. Clients subscribe to ride ids,
+# or to a route and day, and get a small event whenever a booking or a
+# cancellation commits, instead of polling GET /api/rides/{ride_id}. A route
+# subscription matches like search does: origin and destination are prefixes.
+#
+# The broker is in-process: each worker fans out the changes it commits.
+# Running several workers needs a shared channel (e.g. Redis pub/sub)
+# feeding each worker's broker.publish.
+
+import asyncio
+import os
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Optional, Set
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+
+from . import models, schemas
+from .auth import Principal, create_scoped_token, get_current_user, verify_scoped_token
+
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "64"))
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", "15"))
+MAX_LIVE_RIDES = 50
+# Stream tokens only need to outlive the gap between fetching one and connecting
+LIVE_TOKEN_SECONDS = int(os.getenv("LIVE_TOKEN_SECONDS", "60"))
+LIVE_TOKEN_SCOPE = "live"
+
+RESYNC_FRAME = b"event: resync\ndata: {}\n\n"
+HEARTBEAT_FRAME = b": ping\n\n"
+
+
+def ride_topic(ride_id: int) -> tuple:
+    return ("ride", ride_id)
+
+def route_topic(origin_prefix: str, destination_prefix: str, day: date) -> tuple:
+    return ("route", origin_prefix, destination_prefix, day)
+
+
+class Subscriber:
+    """One stream's bounded queue of encoded frames.
+
+    An idle subscriber is just this queue and a suspended generator. A client
+    that falls LIVE_QUEUE_SIZE frames behind has its backlog dropped and is told
+    to resync (re-fetch), so a slow reader never holds memory or blocks publish.
+    """
+
+    def __init__(self, topics: List[tuple], queue_size: int):
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def push(self, frame: bytes) -> bool:
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_FRAME)
+            return False
+
+
+class SeatBroker:
+    """Topic -> subscribers fan-out. publish() encodes an event once and never awaits."""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._topics: Dict[tuple, Set[Subscriber]] = defaultdict(set)
+        # Day -> route topics with subscribers, for prefix matching in route_topics()
+        self._routes: Dict[date, Set[tuple]] = defaultdict(set)
+        self._subscribers = 0
+        self._published = 0
+        self._delivered = 0
+        self._resyncs = 0
+
+    def subscribe(self, topics: List[tuple]) -> Subscriber:
+        subscriber = Subscriber(topics, self.queue_size)
+        for topic in topics:
+            self._topics[topic].add(subscriber)
+            if topic[0] == "route":
+                self._routes[topic[3]].add(topic)
+        self._subscribers += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        for topic in subscriber.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._topics[topic]
+                    if topic[0] == "route":
+                        self._drop_route(topic)
+        self._subscribers -= 1
+
+    def _drop_route(self, topic: tuple):
+        routes = self._routes[topic[3]]
+        routes.discard(topic)
+        if not routes:
+            del self._routes[topic[3]]
+
+    def route_topics(self, origin_key: str, destination_key: str, day: date) -> List[tuple]:
+        """The subscribed route topics a ride on this route and day matches; one check per distinct prefix pair."""
+        return [
+            topic for topic in self._routes.get(day, ())
+            if origin_key.startswith(topic[1]) and destination_key.startswith(topic[2])
+        ]
+
+    def publish(self, topics: List[tuple], event: str, data: dict):
+        # A stream subscribed to both the ride and its route gets the event once
+        targets = set()
+        for topic in topics:
+            targets.update(self._topics.get(topic, ()))
+        self._published += 1
+        if not targets:
+            return
+        frame = b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+        for subscriber in targets:
+            if subscriber.push(frame):
+                self._delivered += 1
+            else:
+                self._resyncs += 1
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self._subscribers,
+            "topics": len(self._topics),
+            "published": self._published,
+            "delivered": self._delivered,
+            "resyncs": self._resyncs,
+        }
+
+
+seat_broker = SeatBroker(LIVE_QUEUE_SIZE)
+
+
+def publish_seat_change(ride, delta: int, seats_available: Optional[int] = None,
+                        from_stop: Optional[int] = None, to_stop: Optional[int] = None):
+    """Announce a committed seat change. `ride` needs ride_id, origin_key, destination_key and date_time.
+
+    `delta` is the seats taken (negative) or returned (positive) on the booked
+    stretch. seats_available is the ride's new count when the caller has it;
+    it is required with a stop range, since there the delta says nothing about
+    the ride's tightest segment.
+    """
+    data = {"ride_id": ride.ride_id, "delta": delta, "seats_available": seats_available}
+    if from_stop is not None:
+        data["from_stop"] = from_stop
+        data["to_stop"] = to_stop
+    topics = [ride_topic(ride.ride_id)]
+    topics += seat_broker.route_topics(ride.origin_key, ride.destination_key, ride.date_time.date())
+    seat_broker.publish(topics, "seats", data)
+
+
+router = APIRouter(
+    prefix="/api/live",
+    tags=["Live"]
+)
+
+# --- Endpoint: a token for opening one seat stream ---
+# EventSource can't send an Authorization header, so the stream takes a token
+# in its query string, where proxies and access logs can record it. This one
+# is only good for /api/live/seats, and only for LIVE_TOKEN_SECONDS.
+@router.post("/token", response_model=schemas.LiveTokenOut)
+async def issue_stream_token(current_user: Principal = Depends(get_current_user)):
+    return {
+        "token": create_scoped_token(current_user, LIVE_TOKEN_SCOPE, LIVE_TOKEN_SECONDS),
+        "expires_in": LIVE_TOKEN_SECONDS,
+    }
+
+# --- Endpoint: stream seat changes for rides and/or one route and day ---
+# The token comes from POST /api/live/token and is checked once, up front, with
+# no database read; the open stream outlives it.
+@router.get("/seats")
+async def stream_seats(
+    token: str,
+    ride_id: List[int] = Query(default=[]),
+    origin: Optional[str] = None,
+    destination: Optional[str] = None,
+    ride_date: Optional[date] = None
+):
+    verify_scoped_token(token, LIVE_TOKEN_SCOPE)
+
+    topics = [ride_topic(rid) for rid in dict.fromkeys(ride_id)]
+    if len(topics) > MAX_LIVE_RIDES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Subscribe to at most {MAX_LIVE_RIDES} rides per stream"
+        )
+    route = (origin, destination, ride_date)
+    if any(value is not None for value in route):
+        if None in route:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Give origin, destination and ride_date together"
+            )
+        topics.append(route_topic(models.normalize_location(origin), models.normalize_location(destination), ride_date))
+    if not topics:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Subscribe to at least one ride_id or a route"
+        )
+
+    async def frames():
+        # Subscribed only once streaming starts, so the finally always runs
+        subscriber = seat_broker.subscribe(topics)
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), LIVE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT_FRAME # Keeps proxies from closing an idle stream
+        finally:
+            seat_broker.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -2,11 +2,18 @@
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware  # <-- 1. IMPORT THIS
+from fastapi.responses import PlainTextResponse
 
-from .database import engine, Base
+from .database import engine, read_engine, replica_engine, pool_stats, Base, ReadYourWritesMiddleware
+from .metrics import MetricsMiddleware, http_metrics, metric_family
+from .querystats import QueryStatsMiddleware
+from .search_cache import search_cache
+from .geo import geo_index
 from . import auth
 from . import rides
 from . import bookings
+from . import admin
+from . import live
 
 app = FastAPI(
     title="PES Carpool API",
@@ -31,6 +38,74 @@ app.add_middleware(
 )
 # ------------------------------------
 
+# The middleware added last runs outermost: MetricsMiddleware wraps
+# QueryStatsMiddleware, which wraps ReadYourWritesMiddleware and CORS, so the
+# timings include CORS handling
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+# --- Runtime stats exposed next to the HTTP metrics ---
+def _pool_metrics():
+    engines = {"primary": engine, "read": read_engine}
+    if replica_engine is not None:
+        engines["replica"] = replica_engine
+    stats = {name: pool_stats(target) for name, target in engines.items()}
+    lines = []
+    for key, kind, help_text in (
+        ("checked_out", "gauge", "Connections currently checked out."),
+        ("overflow", "gauge", "Connections open beyond pool_size (negative while the pool is filling)."),
+        ("checkouts", "counter", "Connection checkouts."),
+        ("wait_seconds_total", "counter", "Time spent waiting for a connection."),
+        ("wait_seconds_max", "gauge", "Longest single wait for a connection."),
+        ("overflow_events", "counter", "Overflow connections opened."),
+        ("timeouts", "counter", "Checkouts that gave up after pool_timeout."),
+    ):
+        lines += metric_family(
+            f"db_pool_{key}", kind, help_text,
+            [({"engine": name}, values[key]) for name, values in stats.items() if key in values]
+        )
+    return lines
+
+def _auth_metrics():
+    hasher = auth.password_hasher.stats()
+    cache = auth.principal_cache.stats()
+    lines = []
+    for key, kind in (("queued", "gauge"), ("in_flight", "gauge"), ("completed", "counter"),
+                      ("wait_seconds_total", "counter"), ("run_seconds_total", "counter")):
+        lines += metric_family(f"password_hash_{key}", kind, f"Password hasher {key.replace('_', ' ')}.", [({}, hasher[key])])
+    for key in ("hits", "misses", "evictions"):
+        lines += metric_family(f"principal_cache_{key}_total", "counter", f"Principal cache {key}.", [({}, cache[key])])
+    lines += metric_family("principal_cache_size", "gauge", "Cached principals.", [({}, cache["size"])])
+    return lines
+
+def _cache_metrics():
+    stats = search_cache.stats()
+    lines = metric_family("search_cache_size", "gauge", "Cached search pages.", [({}, stats["size"])])
+    for key in ("hits", "misses", "evictions", "invalidations"):
+        lines += metric_family(f"search_cache_{key}_total", "counter", f"Search cache {key}.", [({}, stats[key])])
+    lines += metric_family("geo_index_rides", "gauge", "Upcoming rides in the radius search grid.", [({}, geo_index.stats()["rides"])])
+    flights = rides.ride_reads.stats()
+    lines += metric_family("ride_reads_in_flight", "gauge", "Distinct ride reads currently executing.", [({}, flights["in_flight"])])
+    lines += metric_family("ride_reads_total", "counter", "Ride reads by whether they ran the query or shared one.", [
+        ({"outcome": "executed"}, flights["leaders"]),
+        ({"outcome": "shared"}, flights["shared"]),
+    ])
+    return lines
+
+def _live_metrics():
+    stats = live.seat_broker.stats()
+    lines = metric_family("live_subscribers", "gauge", "Open live seat streams.", [({}, stats["subscribers"])])
+    lines += metric_family("live_topics", "gauge", "Rides and routes with at least one live subscriber.", [({}, stats["topics"])])
+    for key in ("published", "delivered", "resyncs"):
+        lines += metric_family(f"live_{key}_total", "counter", f"Live seat events {key}.", [({}, stats[key])])
+    return lines
+
+http_metrics.register_collector(_pool_metrics)
+http_metrics.register_collector(_cache_metrics)
+http_metrics.register_collector(_auth_metrics)
+http_metrics.register_collector(_live_metrics)
+
 @app.on_event("startup")
 async def on_startup():
     async with engine.begin() as conn:
@@ -40,6 +115,13 @@ async def on_startup():
 app.include_router(auth.router)
 app.include_router(rides.router)
 app.include_router(bookings.router)
+app.include_router(admin.router)
+app.include_router(live.router)
+
+# --- Prometheus Metrics ---
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(http_metrics.render(), media_type="text/plain; version=0.0.4")
 
 # --- Root Endpoint ---
 @app.get("/api")
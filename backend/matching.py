@@ -0,0 +1,258 @@
+# backend/matching.py
+#
+# Batch commute matching. Passengers file TripRequests (a route and a
+# departure window); run_matching assigns the pending ones to rides with free
+# seats and books them all in one transaction. Schedule it ahead of the
+# morning peak, or trigger it with POST /api/admin/matching/run:
+#
+#   python -m backend.matching [--start 2026-10-19T07:00] [--end 2026-10-19T10:00]
+
+import argparse
+import asyncio
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from . import models
+from .database import commit, mark_user_write, on_commit
+from .geo import KM_PER_DEGREE_LAT
+from .live import publish_seat_change
+from .rollups import rollup_bookings_made
+from .search_cache import invalidate_ride_searches
+
+# Farthest a pickup (or drop) may be from the ride's origin (or destination)
+MATCH_RADIUS_KM = float(os.getenv("MATCH_RADIUS_KM", "3"))
+# Cost of one km of pickup + drop distance, and of one minute away from the middle of the window
+MATCH_KM_COST = float(os.getenv("MATCH_KM_COST", "1"))
+MATCH_MINUTE_COST = float(os.getenv("MATCH_MINUTE_COST", "0.1"))
+# Default run window for the CLI: requests departing within this many hours
+MATCH_HORIZON_HOURS = float(os.getenv("MATCH_HORIZON_HOURS", "12"))
+
+
+def _minutes(values) -> np.ndarray:
+    return np.array([value.timestamp() / 60 for value in values], dtype=float)
+
+def _coords(rows, lat: str, lng: str) -> Tuple[np.ndarray, np.ndarray]:
+    # Missing coordinates become NaN, which fails every distance comparison
+    lats = np.array([getattr(row, lat) if getattr(row, lat) is not None else np.nan for row in rows], dtype=float)
+    lngs = np.array([getattr(row, lng) if getattr(row, lng) is not None else np.nan for row in rows], dtype=float)
+    return lats, lngs
+
+def _distance_km(lat, lng, ride_lat, ride_lng) -> np.ndarray:
+    """Requests x rides equirectangular distance, as in geo.RideGrid."""
+    kx = KM_PER_DEGREE_LAT * np.cos(np.radians(lat))[:, None]
+    dx = (ride_lng[None, :] - lng[:, None]) * kx
+    dy = (ride_lat[None, :] - lat[:, None]) * KM_PER_DEGREE_LAT
+    return np.hypot(dx, dy)
+
+def cost_matrix(requests, rides) -> np.ndarray:
+    """Cost of serving request i with ride j, np.inf where ride j can't serve it.
+
+    A ride can serve a request when it departs inside the request's window, has
+    the seats, isn't the passenger's own, and runs the same way: within
+    MATCH_RADIUS_KM at both ends when both sides have coordinates, otherwise
+    the same normalized origin and destination. The cost adds the pickup and
+    drop distances to the minutes between departure and the window's middle.
+    Everything is computed on whole requests x rides arrays; a few thousand
+    requests against a few hundred rides is a few million cells.
+    """
+    earliest = _minutes([r.earliest_departure for r in requests])[:, None]
+    latest = _minutes([r.latest_departure for r in requests])[:, None]
+    departure = _minutes([ride.date_time for ride in rides])[None, :]
+
+    keys = {}
+    def codes(values):
+        return np.array([keys.setdefault(value, len(keys)) for value in values])
+    same_route = (
+        (codes([r.origin_key for r in requests])[:, None] == codes([ride.origin_key for ride in rides])[None, :])
+        & (codes([r.destination_key for r in requests])[:, None] == codes([ride.destination_key for ride in rides])[None, :])
+    )
+
+    with np.errstate(invalid="ignore"):
+        pickup = _distance_km(*_coords(requests, "origin_lat", "origin_lng"), *_coords(rides, "origin_lat", "origin_lng"))
+        drop = _distance_km(*_coords(requests, "destination_lat", "destination_lng"), *_coords(rides, "destination_lat", "destination_lng"))
+        located = ~np.isnan(pickup) & ~np.isnan(drop)
+        nearby = (pickup <= MATCH_RADIUS_KM) & (drop <= MATCH_RADIUS_KM)
+
+    feasible = (
+        (departure >= earliest) & (departure <= latest)
+        & np.where(located, nearby, same_route)
+        & (np.array([r.seats_requested for r in requests])[:, None] <= np.array([ride.seats_available for ride in rides])[None, :])
+        & (np.array([r.passenger_id for r in requests])[:, None] != np.array([ride.driver_id for ride in rides])[None, :])
+    )
+    detour = np.where(located, pickup + drop, 0.0)
+    cost = detour * MATCH_KM_COST + np.abs(departure - (earliest + latest) / 2) * MATCH_MINUTE_COST
+    return np.where(feasible, cost, np.inf)
+
+def assign(cost: np.ndarray, seats_requested: List[int], seats_available: List[int]) -> List[Tuple[int, int]]:
+    """Greedy (request, ride) pairs from cost_matrix output.
+
+    Requests with the fewest feasible rides go first, so flexible requests
+    don't take the only seats a constrained one could use; each takes its
+    cheapest ride that still has the seats. That fills far more seats than
+    first-come order, at sort cost rather than an optimal assignment solve.
+    """
+    request_idx, ride_idx = np.nonzero(np.isfinite(cost))
+    options = np.isfinite(cost).sum(axis=1)
+    order = np.lexsort((cost[request_idx, ride_idx], options[request_idx]))
+
+    free = list(seats_available)
+    matched = [False] * len(seats_requested)
+    pairs = []
+    for i, j in zip(request_idx[order].tolist(), ride_idx[order].tolist()):
+        if matched[i] or free[j] < seats_requested[i]:
+            continue
+        matched[i] = True
+        free[j] -= seats_requested[i]
+        pairs.append((i, j))
+    return pairs
+
+
+async def drop_busy_requests(db: AsyncSession, requests: list) -> list:
+    """The requests whose passenger is free for the whole window.
+
+    A passenger already on a confirmed booking departing inside a request's
+    window (the same ride included) is left alone, and of one passenger's
+    requests with overlapping windows only the first is matched in a run.
+    """
+    if not requests:
+        return []
+    busy = defaultdict(list)
+    query = select(models.Booking.passenger_id, models.Ride.date_time).join(models.Booking.ride).where(
+        models.Booking.passenger_id.in_(list({r.passenger_id for r in requests})),
+        models.Booking.status == "confirmed",
+        models.Ride.date_time >= min(r.earliest_departure for r in requests),
+        models.Ride.date_time <= max(r.latest_departure for r in requests)
+    )
+    for passenger_id, departure in await db.execute(query):
+        busy[passenger_id].append((departure, departure))
+
+    free = []
+    for r in requests:
+        windows = busy[r.passenger_id]
+        if any(start <= r.latest_departure and r.earliest_departure <= end for start, end in windows):
+            continue
+        windows.append((r.earliest_departure, r.latest_departure))
+        free.append(r)
+    return free
+
+
+RIDE_COLUMNS = (
+    models.Ride.ride_id, models.Ride.driver_id, models.Ride.origin_key, models.Ride.destination_key,
+    models.Ride.origin_lat, models.Ride.origin_lng, models.Ride.destination_lat, models.Ride.destination_lng,
+    models.Ride.date_time, models.Ride.seats_available, models.Ride.distance_km,
+)
+
+async def run_matching(db: AsyncSession, start: datetime, end: datetime, now: Optional[datetime] = None) -> dict:
+    """Match pending requests whose window overlaps [start, end]; the caller commits.
+
+    Seats are taken with one conditional UPDATE per ride. If a ride lost seats
+    since it was read, its requests stay pending for the next run instead of
+    failing the batch. Rides with waypoints are left to regular booking, and
+    rides with a waitlist to promotion, which is first in line for their seats.
+    Requests dropped by drop_busy_requests stay pending.
+    """
+    started = time.perf_counter()
+    now = now or datetime.now()
+    query = select(models.TripRequest).where(
+        models.TripRequest.status == "pending",
+        models.TripRequest.earliest_departure <= end,
+        models.TripRequest.latest_departure >= max(start, now)
+    ).order_by(models.TripRequest.trip_request_id).with_for_update()
+    requests = (await db.execute(query)).scalars().all()
+    candidates = await drop_busy_requests(db, requests)
+
+    rides = []
+    if candidates:
+        query = select(*RIDE_COLUMNS).where(
+            models.Ride.date_time >= max(min(r.earliest_departure for r in candidates), now),
+            models.Ride.date_time <= max(r.latest_departure for r in candidates),
+            models.Ride.seats_available > 0,
+            models.Ride.stop_count.is_(None),
+            models.Ride.waitlist_count == 0
+        ).order_by(models.Ride.ride_id)
+        rides = (await db.execute(query)).all()
+
+    pairs = []
+    if rides:
+        cost = cost_matrix(candidates, rides)
+        pairs = assign(cost, [r.seats_requested for r in candidates], [ride.seats_available for ride in rides])
+    match_ms = (time.perf_counter() - started) * 1000
+
+    by_ride = defaultdict(list)
+    for i, j in pairs:
+        by_ride[j].append(candidates[i])
+
+    booked = []
+    for j, ride_requests in by_ride.items():
+        ride = rides[j]
+        seats = sum(r.seats_requested for r in ride_requests)
+        take = update(models.Ride).where(
+            models.Ride.ride_id == ride.ride_id,
+            models.Ride.seats_available >= seats,
+            models.Ride.waitlist_count == 0
+        ).values(
+            seats_available=models.Ride.seats_available - seats,
+            version=models.Ride.version + 1
+        ).execution_options(synchronize_session=False)
+        if (await db.execute(take)).rowcount == 1:
+            booked.append((ride, ride_requests, seats))
+
+    bookings = [
+        models.Booking(ride_id=ride.ride_id, passenger_id=r.passenger_id, seats_booked=r.seats_requested, status="confirmed")
+        for ride, ride_requests, _ in booked for r in ride_requests
+    ]
+    if bookings:
+        db.add_all(bookings)
+        await db.flush()
+        matched = [r for _, ride_requests, _ in booked for r in ride_requests]
+        for trip_request, booking in zip(matched, bookings):
+            trip_request.status = "matched"
+            trip_request.booking_id = booking.booking_id
+            mark_user_write(trip_request.passenger_id)
+        await rollup_bookings_made(db, [(ride, seats, len(ride_requests)) for ride, ride_requests, seats in booked])
+
+        def publish():
+            for ride, _, seats in booked:
+                invalidate_ride_searches(ride)
+                publish_seat_change(ride, -seats)
+        on_commit(db, publish)
+
+    return {
+        "requests": len(requests),
+        "rides": len(rides),
+        "matched": len(bookings),
+        "seats_filled": sum(seats for _, _, seats in booked),
+        "unmatched": len(requests) - len(bookings),
+        "match_ms": round(match_ms, 1),
+    }
+
+
+async def _main(start: datetime, end: datetime):
+    from .database import AsyncSessionLocal, engine, Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        result = await run_matching(db, start, end)
+        await commit(db)
+    await engine.dispose()
+    print(
+        f"Matched {result['matched']} of {result['requests']} trip requests to {result['rides']} rides "
+        f"({result['seats_filled']} seats) in {result['match_ms']} ms"
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assign pending trip requests to rides and book them.")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="Window start (default: now)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help=f"Window end (default: start + {MATCH_HORIZON_HOURS:g}h)")
+    args = parser.parse_args()
+    start = args.start or datetime.now()
+    asyncio.run(_main(start, args.end or start + timedelta(hours=MATCH_HORIZON_HOURS)))
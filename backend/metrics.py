@@ -0,0 +1,141 @@
+# backend/metrics.py
+
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+# Upper bounds; Prometheus adds the implicit +Inf bucket
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+
+
+class Histogram:
+    """Per-label-set bucket counts; cumulative sums are only built when rendering."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = defaultdict(lambda: [0] * (len(buckets) + 1))
+        self.sums = defaultdict(float)
+
+    def observe(self, labels: tuple, value: float):
+        self.counts[labels][bisect_left(self.buckets, value)] += 1
+        self.sums[labels] += value
+
+    def render(self, name: str, label_names: tuple) -> list:
+        lines = []
+        for labels, counts in self.counts.items():
+            base = _labels(label_names, labels)
+            running = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                running += count
+                lines.append(f'{name}_bucket{{{base},le="{bound}"}} {running}')
+            lines.append(f"{name}_sum{{{base}}} {self.sums[labels]}")
+            lines.append(f"{name}_count{{{base}}} {running}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def metric_family(name: str, kind: str, help_text: str, samples) -> list:
+    """Render one metric family from (labels dict, value) samples."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        if labels:
+            lines.append(f"{name}{{{_labels(tuple(labels), tuple(labels.values()))}}} {value}")
+        else:
+            lines.append(f"{name} {value}")
+    return lines
+
+
+class HttpMetrics:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.db_queries = Histogram(QUERY_COUNT_BUCKETS)  # Fed by querystats.QueryStatsMiddleware
+        self.db_time = Histogram(LATENCY_BUCKETS)
+        self.requests = defaultdict(int)  # (method, route, status) -> count
+        self.in_flight = defaultdict(int)  # method -> gauge
+        self._collectors = []
+
+    def register_collector(self, collector):
+        """Add a callable returning extra exposition lines (pool, cache, hasher stats...)."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = ["# HELP http_request_duration_seconds Request latency by route template.",
+                 "# TYPE http_request_duration_seconds histogram"]
+        lines += self.latency.render("http_request_duration_seconds", ("method", "route"))
+        lines += ["# HELP http_response_size_bytes Response body size by route template.",
+                  "# TYPE http_response_size_bytes histogram"]
+        lines += self.response_size.render("http_response_size_bytes", ("method", "route"))
+        lines += ["# HELP http_request_db_queries SQL statements executed per request.",
+                  "# TYPE http_request_db_queries histogram"]
+        lines += self.db_queries.render("http_request_db_queries", ("method", "route"))
+        lines += ["# HELP http_request_db_seconds Time spent in SQL per request.",
+                  "# TYPE http_request_db_seconds histogram"]
+        lines += self.db_time.render("http_request_db_seconds", ("method", "route"))
+        lines += metric_family(
+            "http_requests_total", "counter", "Requests by route template and status code.",
+            [({"method": m, "route": r, "status": s}, n) for (m, r, s), n in self.requests.items()]
+        )
+        lines += metric_family(
+            "http_requests_in_flight", "gauge", "Requests currently being served.",
+            [({"method": m}, n) for m, n in self.in_flight.items()]
+        )
+        for collector in self._collectors:
+            lines += collector()
+        return "\n".join(lines) + "\n"
+
+
+http_metrics = HttpMetrics()
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware (no BaseHTTPMiddleware task overhead) feeding http_metrics.
+
+    Requests are labelled with the matched route template, e.g. /api/rides/{ride_id},
+    so label cardinality stays bounded; anything unrouted is labelled "unmatched".
+    """
+
+    def __init__(self, app, metrics: HttpMetrics = http_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        method = scope["method"]
+        status_code = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        # The route is only known once the router has run, so in-flight is per method
+        metrics.in_flight[method] += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.in_flight[method] -= 1
+            route = scope.get("route")
+            labels = (method, route.path if route is not None else "unmatched")
+            metrics.latency.observe(labels, elapsed)
+            metrics.response_size.observe(labels, size)
+            metrics.requests[labels + (status_code,)] += 1
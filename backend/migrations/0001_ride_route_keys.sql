@@ -0,0 +1,12 @@
+-- Normalized route keys for ride search (models.Ride.origin_key / destination_key)
+
+ALTER TABLE rides
+    ADD COLUMN origin_key VARCHAR(255) NULL,
+    ADD COLUMN destination_key VARCHAR(255) NULL;
+
+-- Same as models.normalize_location: lower-case, whitespace runs collapsed, trimmed
+UPDATE rides SET
+    origin_key = LOWER(TRIM(REGEXP_REPLACE(origin, '[[:space:]]+', ' '))),
+    destination_key = LOWER(TRIM(REGEXP_REPLACE(destination, '[[:space:]]+', ' ')));
+
+CREATE INDEX ix_rides_route_departure ON rides (origin_key, destination_key, date_time);
@@ -0,0 +1,3 @@
+-- Booking history is keyset paginated per passenger (bookings.get_my_bookings)
+
+CREATE INDEX ix_bookings_passenger_id ON bookings (passenger_id);
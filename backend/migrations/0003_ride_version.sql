@@ -0,0 +1,3 @@
+-- Ride version for ETags (rides.get_ride_details); bumped on every seat change
+
+ALTER TABLE rides ADD COLUMN version INT NOT NULL DEFAULT 1;
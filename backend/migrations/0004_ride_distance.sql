@@ -0,0 +1,3 @@
+-- Optional ride distance, used for the CO2 savings metrics (admin.py, rollups.py)
+
+ALTER TABLE rides ADD COLUMN distance_km DECIMAL(8, 2) NULL;
@@ -0,0 +1,5 @@
+-- The driver manifest reads one driver's rides in departure order, then the
+-- confirmed bookings of those rides (rides.get_driver_manifest)
+
+CREATE INDEX ix_rides_driver_departure ON rides (driver_id, date_time);
+CREATE INDEX ix_bookings_ride_id ON bookings (ride_id);
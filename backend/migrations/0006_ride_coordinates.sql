@@ -0,0 +1,7 @@
+-- Optional WGS84 coordinates for radius search (geo.py)
+
+ALTER TABLE rides
+    ADD COLUMN origin_lat FLOAT NULL,
+    ADD COLUMN origin_lng FLOAT NULL,
+    ADD COLUMN destination_lat FLOAT NULL,
+    ADD COLUMN destination_lng FLOAT NULL;
@@ -0,0 +1,8 @@
+-- Waypoints: stop counts on rides, stop ranges on bookings. The ride_stops
+-- and ride_segments tables are new and created by create_all at startup.
+
+ALTER TABLE rides ADD COLUMN stop_count INT NULL;
+
+ALTER TABLE bookings
+    ADD COLUMN from_stop INT NULL,
+    ADD COLUMN to_stop INT NULL;
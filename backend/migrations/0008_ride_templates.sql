@@ -0,0 +1,33 @@
+-- Recurring ride templates (recurring.py). create_all would create the table
+-- at startup, but the foreign key below needs it first, so it is created here.
+
+CREATE TABLE IF NOT EXISTS ride_templates (
+    template_id INT NOT NULL AUTO_INCREMENT,
+    driver_id INT NULL,
+    vehicle_id INT NULL,
+    origin VARCHAR(255) NULL,
+    destination VARCHAR(255) NULL,
+    origin_lat FLOAT NULL,
+    origin_lng FLOAT NULL,
+    destination_lat FLOAT NULL,
+    destination_lng FLOAT NULL,
+    weekdays INT NOT NULL,
+    departure_time TIME NOT NULL,
+    seats_available INT NULL,
+    price DECIMAL(10, 2) NULL,
+    distance_km DECIMAL(8, 2) NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NULL,
+    active BOOL NOT NULL DEFAULT 1,
+    generated_until DATE NULL,
+    PRIMARY KEY (template_id),
+    INDEX ix_ride_templates_template_id (template_id),
+    INDEX ix_ride_templates_driver_id (driver_id),
+    FOREIGN KEY (driver_id) REFERENCES users (user_id),
+    FOREIGN KEY (vehicle_id) REFERENCES vehicles (vehicle_id)
+);
+
+ALTER TABLE rides
+    ADD COLUMN template_id INT NULL,
+    ADD FOREIGN KEY (template_id) REFERENCES ride_templates (template_id),
+    ADD CONSTRAINT uq_rides_template_departure UNIQUE (template_id, date_time);
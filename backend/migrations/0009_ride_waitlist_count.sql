@@ -0,0 +1,4 @@
+-- Waiting passengers per ride; cancel_booking only promotes when > 0. The
+-- waitlist_entries table is new and created by create_all at startup.
+
+ALTER TABLE rides ADD COLUMN waitlist_count INT NOT NULL DEFAULT 0;
@@ -0,0 +1,16 @@
+-- Product rule change: a driver can no longer have two rides departing at the
+-- same time. Before this script a driver could post any number of rides with
+-- one departure time, for example one per vehicle. create_ride now answers 409
+-- on a clash; create_rides_bulk and recurring.py report or skip the clashing
+-- departure. Times are compared as stored, to the second.
+--
+-- The unique key replaces the manifest index from 0005 and still serves the
+-- manifest. Find any existing clashes first and resolve them with the drivers
+-- (cancel or move one ride of each pair), or the ALTER fails:
+--
+--   SELECT driver_id, date_time, COUNT(*) FROM rides
+--   GROUP BY driver_id, date_time HAVING COUNT(*) > 1;
+
+ALTER TABLE rides
+    DROP INDEX ix_rides_driver_departure,
+    ADD CONSTRAINT uq_rides_driver_departure UNIQUE (driver_id, date_time);
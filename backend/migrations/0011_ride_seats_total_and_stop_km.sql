@@ -0,0 +1,30 @@
+-- rides.seats_total: the seats offered when a ride was posted, so offered
+-- capacity no longer depends on bookings (admin metrics, rollups, manifest).
+-- Backfilled as what is left plus what is booked; on rides with waypoints every
+-- segment starts full, so segment 0 and the bookings that board at stop 0 give it.
+
+ALTER TABLE rides ADD COLUMN seats_total INT NULL;
+
+UPDATE rides r SET seats_total = r.seats_available + (
+    SELECT COALESCE(SUM(b.seats_booked), 0) FROM bookings b
+    WHERE b.ride_id = r.ride_id AND b.status = 'confirmed'
+) WHERE r.stop_count IS NULL;
+
+UPDATE rides r SET seats_total = (
+    SELECT s.seats_available FROM ride_segments s
+    WHERE s.ride_id = r.ride_id AND s.segment_index = 0
+) + (
+    SELECT COALESCE(SUM(b.seats_booked), 0) FROM bookings b
+    WHERE b.ride_id = r.ride_id AND b.status = 'confirmed' AND b.from_stop = 0
+) WHERE r.stop_count IS NOT NULL;
+
+ALTER TABLE rides MODIFY seats_total INT NOT NULL;
+
+-- ride_stops.km_from_origin: seat-km of a booking between stops. Existing stops
+-- are spaced evenly along the ride's distance, as create_ride does by default.
+
+ALTER TABLE ride_stops ADD COLUMN km_from_origin DECIMAL(8, 2) NULL;
+
+UPDATE ride_stops s JOIN rides r ON r.ride_id = s.ride_id
+SET s.km_from_origin = ROUND(r.distance_km * s.stop_index / (r.stop_count - 1), 2)
+WHERE r.distance_km IS NOT NULL;
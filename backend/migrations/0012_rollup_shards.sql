@@ -0,0 +1,9 @@
+-- daily_route_rollups.shard: each day/route total is split over ROLLUP_SHARDS
+-- counter rows (default 8) that readers sum. Writers still update the rollups
+-- in their own transaction, but concurrent bookings on one route now mostly
+-- lock different rows. Existing rows become shard 0.
+
+ALTER TABLE daily_route_rollups
+    ADD COLUMN shard SMALLINT NOT NULL DEFAULT 0 AFTER destination_key,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (day, origin_key, destination_key, shard);
@@ -1,8 +1,15 @@
 # backend/models.py
-from sqlalchemy import Column, Integer, String, DECIMAL, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, SmallInteger, String, Boolean, DECIMAL, Date, DateTime, Time, Float, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import relationship, validates
 from .database import Base
 
+
+def normalize_location(value):
+    """Lower-case and collapse whitespace so location lookups can use a plain index."""
+    if value is None:
+        return None
+    return " ".join(value.lower().split())
+
 # --- User Model (Updated) ---
 class User(Base):
     __tablename__ = "users"
@@ -44,25 +51,178 @@ class Ride(Base):
     vehicle_id = Column(Integer, ForeignKey("vehicles.vehicle_id"))
     origin = Column(String(255))
     destination = Column(String(255))
+    # Normalized copies of origin/destination, kept in sync by the validator below
+    origin_key = Column(String(255))
+    destination_key = Column(String(255))
+    # Optional WGS84 coordinates; rides that have them are served by radius search (geo.py)
+    origin_lat = Column(Float, nullable=True)
+    origin_lng = Column(Float, nullable=True)
+    destination_lat = Column(Float, nullable=True)
+    destination_lng = Column(Float, nullable=True)
     date_time = Column(DateTime)
     seats_available = Column(Integer)
+    # Seats offered when the ride was posted; seats_available counts down from it
+    seats_total = Column(Integer, nullable=False)
     price = Column(DECIMAL(10, 2))
+    distance_km = Column(DECIMAL(8, 2), nullable=True) # Optional; feeds the CO2 savings metrics
+    # Set only for rides with waypoints: the number of stops, origin and destination
+    # included. Such rides keep their seats per segment in ride_segments, and
+    # seats_available mirrors the tightest segment (what a full-route booking can get).
+    stop_count = Column(Integer, nullable=True)
+    # Set when generated from a recurring RideTemplate (recurring.py)
+    template_id = Column(Integer, ForeignKey("ride_templates.template_id"), nullable=True)
+    # Bumped on every seat change; get_ride_details derives its ETag from it
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Passengers waiting in waitlist_entries; cancel_booking only promotes when > 0
+    waitlist_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # Serves search_rides: prefix match on the route keys, range on date_time
+    __table_args__ = (
+        Index("ix_rides_route_departure", "origin_key", "destination_key", "date_time"),
+        # A driver can't be in two places at once; also serves the driver
+        # manifest (one driver's rides in departure order)
+        UniqueConstraint("driver_id", "date_time", name="uq_rides_driver_departure"),
+        # At most one ride per template occurrence, so generation is safe to re-run
+        UniqueConstraint("template_id", "date_time", name="uq_rides_template_departure"),
+    )
 
     # Relationships
     driver = relationship("User", back_populates="rides_driven")
     vehicle = relationship("Vehicle", back_populates="rides")
     bookings = relationship("Booking", back_populates="ride")
+    stops = relationship("RideStop", order_by="RideStop.stop_index")
+    segments = relationship("RideSegment", order_by="RideSegment.segment_index")
+
+    @validates("origin", "destination")
+    def _sync_location_key(self, key, value):
+        setattr(self, f"{key}_key", normalize_location(value))
+        return value
 
 # --- Booking Model (Fixed Relationships) ---
 class Booking(Base):
     __tablename__ = "bookings"
 
     booking_id = Column(Integer, primary_key=True, index=True)
-    ride_id = Column(Integer, ForeignKey("rides.ride_id"))
-    passenger_id = Column(Integer, ForeignKey("users.user_id"))
+    ride_id = Column(Integer, ForeignKey("rides.ride_id"), index=True)
+    passenger_id = Column(Integer, ForeignKey("users.user_id"), index=True)
     seats_booked = Column(Integer)
     status = Column(String(50))
+    # Stop range [from_stop, to_stop] travelled, set only on rides with waypoints
+    from_stop = Column(Integer, nullable=True)
+    to_stop = Column(Integer, nullable=True)
 
     # Relationships
     ride = relationship("Ride", back_populates="bookings")
-    passenger = relationship("User", back_populates="bookings_made")
\ No newline at end of file
+    passenger = relationship("User", back_populates="bookings_made")
+
+# --- Waitlist: passengers queued for a full ride, promoted in entry_id order ---
+class WaitlistEntry(Base):
+    __tablename__ = "waitlist_entries"
+
+    entry_id = Column(Integer, primary_key=True, index=True) # Ascending = queue order
+    ride_id = Column(Integer, ForeignKey("rides.ride_id"))
+    passenger_id = Column(Integer, ForeignKey("users.user_id"), index=True)
+    seats_requested = Column(Integer)
+    from_stop = Column(Integer, nullable=True)
+    to_stop = Column(Integer, nullable=True)
+    status = Column(String(50)) # waiting, promoted or left
+    booking_id = Column(Integer, ForeignKey("bookings.booking_id"), nullable=True) # Set on promotion
+
+    # Serves promotion: a ride's waiting entries in queue order
+    __table_args__ = (
+        Index("ix_waitlist_ride_status_entry", "ride_id", "status", "entry_id"),
+    )
+
+# --- Trip Request: a passenger's commute, assigned to a ride by matching.py ---
+class TripRequest(Base):
+    __tablename__ = "trip_requests"
+
+    trip_request_id = Column(Integer, primary_key=True, index=True)
+    passenger_id = Column(Integer, ForeignKey("users.user_id"), index=True)
+    origin = Column(String(255))
+    destination = Column(String(255))
+    origin_key = Column(String(255))
+    destination_key = Column(String(255))
+    origin_lat = Column(Float, nullable=True)
+    origin_lng = Column(Float, nullable=True)
+    destination_lat = Column(Float, nullable=True)
+    destination_lng = Column(Float, nullable=True)
+    # Acceptable departure window, inclusive
+    earliest_departure = Column(DateTime, nullable=False)
+    latest_departure = Column(DateTime, nullable=False)
+    seats_requested = Column(Integer)
+    status = Column(String(50)) # pending, matched or cancelled
+    booking_id = Column(Integer, ForeignKey("bookings.booking_id"), nullable=True) # Set when matched
+
+    # Serves the matching job: pending requests by window start
+    __table_args__ = (
+        Index("ix_trip_requests_status_earliest", "status", "earliest_departure"),
+    )
+
+    @validates("origin", "destination")
+    def _sync_location_key(self, key, value):
+        setattr(self, f"{key}_key", normalize_location(value))
+        return value
+
+# --- Recurring Ride Template (rides generated by recurring.py) ---
+class RideTemplate(Base):
+    __tablename__ = "ride_templates"
+
+    template_id = Column(Integer, primary_key=True, index=True)
+    driver_id = Column(Integer, ForeignKey("users.user_id"), index=True)
+    vehicle_id = Column(Integer, ForeignKey("vehicles.vehicle_id"))
+    origin = Column(String(255))
+    destination = Column(String(255))
+    origin_lat = Column(Float, nullable=True)
+    origin_lng = Column(Float, nullable=True)
+    destination_lat = Column(Float, nullable=True)
+    destination_lng = Column(Float, nullable=True)
+    weekdays = Column(Integer, nullable=False) # Bit d set = runs on date.weekday() d (0 = Monday)
+    departure_time = Column(Time, nullable=False)
+    seats_available = Column(Integer)
+    price = Column(DECIMAL(10, 2))
+    distance_km = Column(DECIMAL(8, 2), nullable=True)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=True) # Inclusive; None = until deactivated
+    active = Column(Boolean, nullable=False, default=True, server_default="1")
+    # Rides exist for every occurrence up to and including this day
+    generated_until = Column(Date, nullable=True)
+
+# --- Ride Stops and Segments (rides with waypoints) ---
+class RideStop(Base):
+    __tablename__ = "ride_stops"
+
+    ride_id = Column(Integer, ForeignKey("rides.ride_id"), primary_key=True)
+    stop_index = Column(Integer, primary_key=True) # 0 = origin, stop_count - 1 = destination
+    name = Column(String(255))
+    name_key = Column(String(255))
+    # Road distance from the origin; set when the ride has distance_km, so a
+    # booking's seat-km covers only the stops it travels between
+    km_from_origin = Column(DECIMAL(8, 2), nullable=True)
+
+    @validates("name")
+    def _sync_name_key(self, key, value):
+        self.name_key = normalize_location(value)
+        return value
+
+# One row per leg: seats left between stop segment_index and the next stop
+class RideSegment(Base):
+    __tablename__ = "ride_segments"
+
+    ride_id = Column(Integer, ForeignKey("rides.ride_id"), primary_key=True)
+    segment_index = Column(Integer, primary_key=True)
+    seats_available = Column(Integer, nullable=False)
+
+# --- Daily Route Rollup (per day and route totals, maintained by rollups.py) ---
+class DailyRouteRollup(Base):
+    __tablename__ = "daily_route_rollups"
+
+    day = Column(Date, primary_key=True)
+    origin_key = Column(String(255), primary_key=True)
+    destination_key = Column(String(255), primary_key=True)
+    shard = Column(SmallInteger, primary_key=True, default=0) # One of rollups.ROLLUP_SHARDS rows summed on read
+    rides_offered = Column(Integer, nullable=False, default=0)
+    seats_offered = Column(Integer, nullable=False, default=0)
+    bookings_confirmed = Column(Integer, nullable=False, default=0)
+    seats_booked = Column(Integer, nullable=False, default=0)
+    seat_km = Column(DECIMAL(14, 2), nullable=False, default=0) # Confirmed seats x ride distance
@@ -0,0 +1,49 @@
+# backend/pagination.py
+
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, status
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(*values) -> str:
+    """Pack the sort key of the last row on a page into an opaque cursor string."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int, types: tuple = None) -> list:
+    """Unpack a cursor produced by encode_cursor, rejecting anything malformed with a 400.
+
+    `types`, if given, holds one type (or tuple of types) per value to check.
+    `datetime` expects the ISO string encode_cursor wrote and returns it parsed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError(cursor)
+        if types:
+            values = [_check_value(value, expected) for value, expected in zip(values, types)]
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+    return values
+
+
+def _check_value(value, expected):
+    if expected is datetime:
+        if not isinstance(value, str):
+            raise TypeError(value)
+        return datetime.fromisoformat(value)
+    # JSON true/false would pass as the ints 1/0
+    if isinstance(value, bool) or not isinstance(value, expected):
+        raise TypeError(value)
+    return value
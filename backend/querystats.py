@@ -0,0 +1,93 @@
+# backend/querystats.py
+
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .metrics import http_metrics
+
+logger = logging.getLogger("backend.sql")
+
+# The same statement running this many times in one request is logged as a likely N+1
+REPEAT_WARNING_THRESHOLD = int(os.getenv("QUERY_REPEAT_WARNING", "5"))
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def repeated(self, threshold: int = REPEAT_WARNING_THRESHOLD) -> dict:
+        return {sql: n for sql, n in self.statements.items() if n >= threshold}
+
+
+_current_stats: ContextVar = ContextVar("query_stats", default=None)
+
+
+# Registered on the Engine class, so every engine (primary, read, replica) reports.
+# SQLAlchemy's async greenlets inherit the caller's contextvars, so these hooks
+# see the stats object of the request that issued the statement.
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        context._query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    started = getattr(context, "_query_started", None)
+    if stats is None or started is None:
+        return
+    stats.count += 1
+    stats.seconds += time.perf_counter() - started
+    stats.statements[statement] += 1
+
+
+@contextmanager
+def count_queries():
+    """Collect QueryStats for everything executed inside the block (scripts, jobs, tests)."""
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+class QueryStatsMiddleware:
+    """Counts SQL per request; adds X-DB-Query-Count / X-DB-Time-Ms headers and feeds /metrics."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-query-count", str(stats.count).encode()))
+                headers.append((b"x-db-time-ms", f"{stats.seconds * 1000:.2f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        with count_queries() as stats:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                labels = (scope["method"], route.path if route is not None else "unmatched")
+                http_metrics.db_queries.observe(labels, stats.count)
+                http_metrics.db_time.observe(labels, stats.seconds)
+                for sql, n in stats.repeated().items():
+                    logger.warning("Possible N+1 on %s %s: statement ran %d times: %s", *labels, n, sql)
@@ -0,0 +1,167 @@
+# backend/recurring.py
+#
+# Concrete rides for recurring RideTemplates. Only a rolling window of
+# RECURRING_WINDOW_DAYS ahead is materialised; run the top-up daily (cron) to
+# keep it rolling:
+#
+#   python -m backend.recurring
+
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from . import models
+from .database import commit, insert_returning_ids, on_commit
+from .geo import geo_index
+from .rollups import rollup_rides_created
+from .search_cache import invalidate_ride_searches
+
+RECURRING_WINDOW_DAYS = int(os.getenv("RECURRING_WINDOW_DAYS", "14"))
+GENERATE_BATCH_SIZE = int(os.getenv("RECURRING_BATCH_SIZE", "200"))
+
+logger = logging.getLogger("backend.recurring")
+
+
+def weekday_mask(weekdays: List[int]) -> int:
+    return sum(1 << day for day in set(weekdays))
+
+def weekday_list(mask: int) -> List[int]:
+    return [day for day in range(7) if mask & (1 << day)]
+
+
+def _ride_row(template: models.RideTemplate, departure: datetime) -> dict:
+    # Core INSERT skips the ORM validators, so fill the normalized keys here
+    return {
+        "driver_id": template.driver_id,
+        "vehicle_id": template.vehicle_id,
+        "template_id": template.template_id,
+        "origin": template.origin,
+        "destination": template.destination,
+        "origin_key": models.normalize_location(template.origin),
+        "destination_key": models.normalize_location(template.destination),
+        "origin_lat": template.origin_lat,
+        "origin_lng": template.origin_lng,
+        "destination_lat": template.destination_lat,
+        "destination_lng": template.destination_lng,
+        "date_time": departure,
+        "seats_available": template.seats_available,
+        "seats_total": template.seats_available,
+        "price": template.price,
+        "distance_km": template.distance_km,
+    }
+
+async def generate_template_rides(db: AsyncSession, template_id: int, today: Optional[date] = None) -> int:
+    """Create the template's missing rides up to today + RECURRING_WINDOW_DAYS; returns how many.
+
+    Safe to run any number of times, concurrently included: the template row is
+    locked and generated_until advances in the same transaction, so a re-run
+    only covers days it has not seen, and uq_rides_template_departure rejects
+    any duplicate that slips past. Occurrences where the driver already has a
+    ride are skipped. Rows go in as multi-row INSERTs of GENERATE_BATCH_SIZE,
+    then are read back by id in one query for the caches.
+    """
+    query = select(models.RideTemplate).where(
+        models.RideTemplate.template_id == template_id
+    ).with_for_update()
+    template = (await db.execute(query)).scalars().first()
+    if not template or not template.active:
+        return 0
+
+    today = today or date.today()
+    first = max(today, template.start_date)
+    if template.generated_until is not None:
+        first = max(first, template.generated_until + timedelta(days=1))
+    last = today + timedelta(days=RECURRING_WINDOW_DAYS)
+    if template.end_date is not None:
+        last = min(last, template.end_date)
+    if first > last:
+        return 0
+
+    now = datetime.now()
+    rows = []
+    for offset in range((last - first).days + 1):
+        day = first + timedelta(days=offset)
+        departure = datetime.combine(day, template.departure_time)
+        if template.weekdays & (1 << day.weekday()) and departure > now:
+            rows.append(_ride_row(template, departure))
+
+    if rows:
+        # A one-off ride the driver posted for the same time wins (uq_rides_driver_departure)
+        taken = set((await db.execute(select(models.Ride.date_time).where(
+            models.Ride.driver_id == template.driver_id,
+            models.Ride.date_time.in_([row["date_time"] for row in rows])
+        ))).scalars().all())
+        rows = [row for row in rows if row["date_time"] not in taken]
+
+    ride_ids = []
+    for i in range(0, len(rows), GENERATE_BATCH_SIZE):
+        ride_ids += await insert_returning_ids(db, models.Ride, rows[i:i + GENERATE_BATCH_SIZE])
+    template.generated_until = last
+
+    if ride_ids:
+        created = (await db.execute(select(models.Ride).where(
+            models.Ride.ride_id.in_(ride_ids)
+        ))).scalars().all()
+        await rollup_rides_created(db, created)
+
+        def publish():
+            for ride in created:
+                invalidate_ride_searches(ride)
+                geo_index.add_ride(ride)
+        on_commit(db, publish)
+
+    return len(rows)
+
+
+async def top_up_all(session_factory, today: Optional[date] = None) -> Tuple[int, int]:
+    """Extend every active template's window, one short transaction per template.
+
+    A template that fails (e.g. a constraint its rides hit) is rolled back,
+    logged and left for the next run; the others still go ahead. Returns
+    (rides created, templates that failed).
+    """
+    today = today or date.today()
+    horizon = today + timedelta(days=RECURRING_WINDOW_DAYS)
+    total = failed = 0
+    last_id = 0
+    while True:
+        async with session_factory() as db:
+            query = select(models.RideTemplate.template_id).where(
+                models.RideTemplate.template_id > last_id,
+                models.RideTemplate.active.is_(True),
+                (models.RideTemplate.generated_until.is_(None)) | (models.RideTemplate.generated_until < horizon)
+            ).order_by(models.RideTemplate.template_id).limit(GENERATE_BATCH_SIZE)
+            template_ids = (await db.execute(query)).scalars().all()
+        if not template_ids:
+            return total, failed
+        for template_id in template_ids:
+            async with session_factory() as db:
+                try:
+                    created = await generate_template_rides(db, template_id, today)
+                    await commit(db)
+                except Exception:
+                    await db.rollback()
+                    logger.exception("Generating rides for template %s failed", template_id)
+                    failed += 1
+                else:
+                    total += created
+        last_id = template_ids[-1]
+
+
+async def _main():
+    from .database import AsyncSessionLocal, engine, Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    created, failed = await top_up_all(AsyncSessionLocal)
+    await engine.dispose()
+    print(f"Generated {created} rides from recurring templates ({failed} templates failed)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(_main()))
@@ -1,21 +1,40 @@
 # backend/rides.py
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
-from sqlalchemy import func
-from typing import List, Optional # <-- Added Optional
-from datetime import datetime, date
+from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy import and_, or_, func
+from sqlalchemy.exc import IntegrityError
+from typing import List, Optional, Union # <-- Added Optional
+from datetime import datetime, date, time, timedelta
 
 from . import models, schemas
-from .database import get_db_session
-from .auth import get_current_user
+from .database import get_db_session, get_read_session, insert_returning_ids, mark_user_write, on_commit
+from .auth import get_current_user, Principal
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor
+from .search_cache import search_cache, invalidate_ride_searches
+from .singleflight import SingleFlight
+from .rollups import rollup_ride_created, rollup_rides_created
+from .geo import geo_index
+from .segments import SegmentTree
+from .recurring import generate_template_rides, weekday_mask, weekday_list
+
+# Origin and destination included
+MAX_RIDE_STOPS = 12
+# Rides per bulk request; each request is a single multi-row INSERT
+MAX_BULK_RIDES = 200
+
+# Identical concurrent reads share one query. Keys include the session route so
+# a read-your-writes caller on the primary never gets a lagging replica result.
+ride_reads = SingleFlight()
 
 # NOTE: The prefix remains the same.
 router = APIRouter(
     prefix="/api/rides",
     tags=["Rides"],
+    default_response_class=ORJSONResponse,
     dependencies=[Depends(get_current_user)] # Protects all ride endpoints
 )
 
@@ -24,7 +43,7 @@ router = APIRouter(
 async def create_vehicle(
     vehicle_in: schemas.VehicleCreate,
     db: AsyncSession = Depends(get_db_session),
-    current_user: models.User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role.lower() != 'driver':
         raise HTTPException(
@@ -47,16 +66,16 @@ async def create_vehicle(
         user_id=current_user.user_id
     )
     db.add(new_vehicle)
-    await db.commit()
-    await db.refresh(new_vehicle)
+    await db.flush() # Assigns vehicle_id; commit happens when get_db_session exits
+    mark_user_write(current_user.user_id)
 
     return new_vehicle
 
 # --- Endpoint to Get ALL Vehicles for the Current Driver (NEW) ---
 @router.get("/vehicles/my-vehicles", response_model=List[schemas.VehicleOut])
 async def get_my_vehicles(
-    db: AsyncSession = Depends(get_db_session),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role.lower() != 'driver':
         raise HTTPException(
@@ -71,106 +90,702 @@ async def get_my_vehicles(
     return vehicles
 
 
-# --- Endpoint to create a new Ride (FINAL FIX: Routing) ---
-# NOTE: We define the endpoint at the prefix root using the empty string "".
-# This is the correct way to map to /api/rides.
-@router.post("", response_model=schemas.RideOut, status_code=status.HTTP_201_CREATED) 
-async def create_ride(
-    ride_in: schemas.RideCreate,
-    db: AsyncSession = Depends(get_db_session),
-    current_user: models.User = Depends(get_current_user)
+# --- Endpoint for the Driver's Manifest: upcoming rides with who booked them ---
+# Two queries per page: the rides (vehicle joined, booked seats summed in SQL),
+# then the confirmed bookings and passenger contacts for just those rides.
+@router.get("/driver/my-rides", response_model=schemas.ManifestPage)
+async def get_driver_manifest(
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_user)
 ):
     if current_user.role.lower() != 'driver':
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only drivers can post rides"
+            detail="Access denied."
         )
 
-    # Check if vehicle exists and belongs to the driver
-    query = select(models.Vehicle).where(models.Vehicle.vehicle_id == ride_in.vehicle_id)
-    result = await db.execute(query)
-    vehicle = result.scalars().first()
+    seats_booked = select(
+        func.coalesce(func.sum(models.Booking.seats_booked), 0)
+    ).where(
+        models.Booking.ride_id == models.Ride.ride_id,
+        models.Booking.status == "confirmed"
+    ).correlate(models.Ride).scalar_subquery()
+
+    query = select(models.Ride, seats_booked.label("seats_booked")).where(
+        models.Ride.driver_id == current_user.user_id,
+        models.Ride.date_time >= datetime.now()
+    )
+
+    if cursor:
+        last_time, last_id = decode_cursor(cursor, 2, types=(datetime, int))
+        query = query.where(or_(
+            models.Ride.date_time > last_time,
+            and_(models.Ride.date_time == last_time, models.Ride.ride_id > last_id)
+        ))
+
+    # Fetch one extra row to learn whether another page exists
+    query = query.options(
+        joinedload(models.Ride.vehicle)
+    ).order_by(models.Ride.date_time, models.Ride.ride_id).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].Ride.date_time, rows[-1].Ride.ride_id)
+
+    manifest = {}
+    for ride, booked in rows:
+        offered = ride.seats_total
+        manifest[ride.ride_id] = {
+            "ride_id": ride.ride_id,
+            "origin": ride.origin,
+            "destination": ride.destination,
+            "date_time": ride.date_time,
+            "price": float(ride.price),
+            "distance_km": float(ride.distance_km) if ride.distance_km is not None else None,
+            "seats_available": ride.seats_available,
+            "seats_booked": booked,
+            "seats_offered": offered,
+            "occupancy": round(booked / offered, 4) if offered else 0.0,
+            "vehicle": schemas.VehicleOut.model_validate(ride.vehicle).model_dump(),
+            "bookings": [],
+        }
+
+    if manifest:
+        query = select(
+            models.Booking.booking_id, models.Booking.ride_id, models.Booking.seats_booked,
+            models.User.user_id, models.User.name, models.User.phone, models.User.email
+        ).join(models.Booking.passenger).where(
+            models.Booking.ride_id.in_(list(manifest)),
+            models.Booking.status == "confirmed"
+        ).order_by(models.Booking.booking_id)
 
-    if not vehicle or vehicle.user_id != current_user.user_id:
+        for booking in await db.execute(query):
+            manifest[booking.ride_id]["bookings"].append({
+                "booking_id": booking.booking_id,
+                "seats_booked": booking.seats_booked,
+                "passenger": {
+                    "user_id": booking.user_id,
+                    "name": booking.name,
+                    "phone": booking.phone,
+                    "email": booking.email,
+                },
+            })
+
+    return ORJSONResponse({"items": list(manifest.values()), "limit": limit, "next_cursor": next_cursor})
+
+
+# --- Shared checks for a ride offer (one-off ride, recurring template or bulk item) ---
+def validate_ride_offer(offer, vehicle: Optional[models.Vehicle], driver_id: int):
+    """Validate vehicle ownership, seats and coordinates, raising the HTTPException to return."""
+    if not vehicle or vehicle.user_id != driver_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Vehicle not found or does not belong to this driver"
         )
 
     # Validate seats available against vehicle capacity
-    if ride_in.seats_available > vehicle.seat_capacity:
+    if offer.seats_available > vehicle.seat_capacity:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Seats available ({ride_in.seats_available}) cannot exceed vehicle capacity ({vehicle.seat_capacity})"
+            detail=f"Seats available ({offer.seats_available}) cannot exceed vehicle capacity ({vehicle.seat_capacity})"
         )
-    if ride_in.seats_available <= 0:
+    if offer.seats_available <= 0:
          raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Seats available must be at least 1"
         )
+    coordinates = (offer.origin_lat, offer.origin_lng, offer.destination_lat, offer.destination_lng)
+    if any(value is not None for value in coordinates) and None in coordinates:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Give all of origin_lat, origin_lng, destination_lat and destination_lng, or none"
+        )
+
+def departure_key(value: datetime) -> datetime:
+    """A departure as the DATETIME column stores it (naive, whole seconds), for uq_rides_driver_departure."""
+    return value.replace(microsecond=0, tzinfo=None)
+
+def waypoint_distances(ride_in, waypoint_count: int) -> list:
+    """km_from_origin for every stop of a ride with waypoints, origin and destination included.
+
+    None throughout when the ride has no distance_km; the driver's waypoint_km
+    when given, otherwise the waypoints spaced evenly along the route.
+    """
+    km = ride_in.waypoint_km
+    if km is not None and len(km) != waypoint_count:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Give one waypoint_km per waypoint"
+        )
+    if ride_in.distance_km is None:
+        if km is not None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="waypoint_km needs distance_km")
+        return [None] * (waypoint_count + 2)
+    total = ride_in.distance_km
+    if km is None:
+        km = [total * (i + 1) / (waypoint_count + 1) for i in range(waypoint_count)]
+    stop_km = [0, *km, total]
+    if any(a >= b for a, b in zip(stop_km, stop_km[1:])):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="waypoint_km must increase along the route and stay below distance_km"
+        )
+    return [round(value, 2) for value in stop_km]
+
+async def check_ride_offer(db: AsyncSession, offer, driver_id: int) -> models.Vehicle:
+    """validate_ride_offer for one offer; returns the vehicle (owner loaded)."""
+    # Check if vehicle exists and belongs to the driver (owner doubles as the response's driver)
+    query = select(models.Vehicle).where(
+        models.Vehicle.vehicle_id == offer.vehicle_id
+    ).options(joinedload(models.Vehicle.owner))
+    result = await db.execute(query)
+    vehicle = result.scalars().first()
+    validate_ride_offer(offer, vehicle, driver_id)
+    return vehicle
+
+
+# --- Endpoint to create a new Ride (FINAL FIX: Routing) ---
+# NOTE: We define the endpoint at the prefix root using the empty string "".
+# This is the correct way to map to /api/rides.
+@router.post("", response_model=schemas.RideOut, status_code=status.HTTP_201_CREATED) 
+async def create_ride(
+    ride_in: schemas.RideCreate,
+    db: AsyncSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role.lower() != 'driver':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only drivers can post rides"
+        )
+
+    vehicle = await check_ride_offer(db, ride_in, current_user.user_id)
+
+    waypoints = [name.strip() for name in ride_in.waypoints or []]
+    if any(not name for name in waypoints) or len(waypoints) + 2 > MAX_RIDE_STOPS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Waypoints must be non-empty, at most {MAX_RIDE_STOPS - 2} of them"
+        )
+
+    stop_km = waypoint_distances(ride_in, len(waypoints))
 
     new_ride = models.Ride(
-        **ride_in.dict(),
+        **ride_in.model_dump(exclude={"waypoints", "waypoint_km", "date_time"}),
+        date_time=departure_key(ride_in.date_time),
+        seats_total=ride_in.seats_available,
         driver_id=current_user.user_id
     )
+    # The response needs driver and vehicle; both are already in hand, so no re-select
+    new_ride.vehicle = vehicle
+    new_ride.driver = vehicle.owner
 
     db.add(new_ride)
-    await db.commit()
-    await db.refresh(new_ride) 
+    if waypoints:
+        # Every leg starts with the full seat count; bookings then draw down the legs they use
+        names = [ride_in.origin, *waypoints, ride_in.destination]
+        new_ride.stop_count = len(names)
+        new_ride.stops = [
+            models.RideStop(stop_index=i, name=name, km_from_origin=km)
+            for i, (name, km) in enumerate(zip(names, stop_km))
+        ]
+        new_ride.segments = [
+            models.RideSegment(segment_index=i, seats_available=ride_in.seats_available)
+            for i in range(len(names) - 1)
+        ]
+    try:
+        await db.flush() # Assigns ride_id; commit happens when get_db_session exits
+    except IntegrityError:
+        # uq_rides_driver_departure: the only constraint a validated offer can hit
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="You already have a ride departing at this time"
+        )
+    await rollup_ride_created(db, new_ride)
+    mark_user_write(current_user.user_id)
+    on_commit(db, lambda: invalidate_ride_searches(new_ride))
+    on_commit(db, lambda: geo_index.add_ride(new_ride))
+
+    return new_ride
+
+
+# --- Endpoint to post many rides at once (a week or a term of commutes) ---
+# Vehicles are loaded in one query and every ride goes in one multi-row INSERT.
+# Items that fail validation are reported by index; the rest are still created.
+# A driver posts their own rides. Admin tooling names a driver on every item
+# and the ride is posted on their behalf, if they drive and own the vehicle.
+@router.post("/bulk", response_model=schemas.RideBulkResult)
+async def create_rides_bulk(
+    bulk_in: schemas.RideBulkCreate,
+    db: AsyncSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    role = current_user.role.lower()
+    if role not in ('driver', 'admin'):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only drivers can post rides"
+        )
+    if len(bulk_in.rides) > MAX_BULK_RIDES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BULK_RIDES} rides per request"
+        )
+
+    vehicle_ids = {ride_in.vehicle_id for ride_in in bulk_in.rides}
+    result = await db.execute(select(models.Vehicle).where(models.Vehicle.vehicle_id.in_(vehicle_ids)))
+    vehicles = {vehicle.vehicle_id: vehicle for vehicle in result.scalars().all()}
+
+    if role == 'admin':
+        driver_ids = [ride_in.driver_id for ride_in in bulk_in.rides]
+        result = await db.execute(select(models.User.user_id).where(
+            models.User.user_id.in_({driver_id for driver_id in driver_ids if driver_id is not None}),
+            models.User.role == 'driver'
+        ))
+        drivers = set(result.scalars().all())
+    else:
+        driver_ids = [current_user.user_id] * len(bulk_in.rides)
+        drivers = {current_user.user_id}
+
+    # Clashes are reported per item up front; uq_rides_driver_departure catches
+    # any that commit concurrently
+    departures = [departure_key(ride_in.date_time) for ride_in in bulk_in.rides]
+    result = await db.execute(select(models.Ride.driver_id, models.Ride.date_time).where(
+        models.Ride.driver_id.in_(drivers),
+        models.Ride.date_time.in_(set(departures))
+    ))
+    taken = set(result.all())
+
+    results = [schemas.RideBulkItem(index=index) for index in range(len(bulk_in.rides))]
+    rows = {}
+    for item, ride_in, driver_id, departure in zip(results, bulk_in.rides, driver_ids, departures):
+        if role == 'driver' and ride_in.driver_id not in (None, driver_id):
+            item.error = "Only admins can post rides for another driver"
+            continue
+        if driver_id not in drivers:
+            # Admins only: driver_id is missing or isn't a driver's
+            item.error = "driver_id must name a driver"
+            continue
+        try:
+            # The vehicle must belong to the driver the ride is posted for
+            validate_ride_offer(ride_in, vehicles.get(ride_in.vehicle_id), driver_id)
+        except HTTPException as exc:
+            item.error = exc.detail
+            continue
+        if ride_in.waypoints or ride_in.waypoint_km:
+            item.error = "Rides with waypoints must be posted one at a time"
+        elif (driver_id, departure) in taken or (driver_id, departure) in rows:
+            item.error = "Driver already has a ride departing at this time"
+        else:
+            # Core INSERT skips the ORM validators, so fill the normalized keys here
+            rows[(driver_id, departure)] = (item, {
+                **ride_in.model_dump(exclude={"waypoints", "waypoint_km", "driver_id"}),
+                "date_time": departure,
+                "seats_total": ride_in.seats_available,
+                "driver_id": driver_id,
+                "origin_key": models.normalize_location(ride_in.origin),
+                "destination_key": models.normalize_location(ride_in.destination),
+            })
+
+    if rows:
+        try:
+            ride_ids = await insert_returning_ids(db, models.Ride, [values for _, values in rows.values()])
+        except IntegrityError:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Rides at some of these times were posted while this request ran; retry to see which"
+            )
+        for (item, _), ride_id in zip(rows.values(), ride_ids):
+            item.ride_id = ride_id
+        result = await db.execute(select(models.Ride).where(models.Ride.ride_id.in_(ride_ids)))
+        created = result.scalars().all()
+        await rollup_rides_created(db, created)
+        for driver_id in {driver_id for driver_id, _ in rows}:
+            mark_user_write(driver_id)
+
+        def publish():
+            for ride in created:
+                invalidate_ride_searches(ride)
+                geo_index.add_ride(ride)
+        on_commit(db, publish)
+
+    created_count = len(rows)
+    return schemas.RideBulkResult(created=created_count, failed=len(results) - created_count, results=results)
+
+
+# --- Recurring commutes: templates that generate concrete rides ---
+def template_out(template: models.RideTemplate, rides_created: Optional[int] = None) -> schemas.RideTemplateOut:
+    return schemas.RideTemplateOut(
+        template_id=template.template_id,
+        vehicle_id=template.vehicle_id,
+        origin=template.origin,
+        destination=template.destination,
+        weekdays=weekday_list(template.weekdays),
+        departure_time=template.departure_time,
+        seats_available=template.seats_available,
+        price=template.price,
+        distance_km=template.distance_km,
+        start_date=template.start_date,
+        end_date=template.end_date,
+        active=template.active,
+        generated_until=template.generated_until,
+        rides_created=rides_created
+    )
+
+@router.post("/templates", response_model=schemas.RideTemplateOut, status_code=status.HTTP_201_CREATED)
+async def create_ride_template(
+    template_in: schemas.RideTemplateCreate,
+    db: AsyncSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Save a recurring ride and create its rides for the upcoming window right away."""
+    if current_user.role.lower() != 'driver':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only drivers can post rides"
+        )
+    await check_ride_offer(db, template_in, current_user.user_id)
+
+    if any(day < 0 or day > 6 for day in template_in.weekdays):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Weekdays must be between 0 (Monday) and 6 (Sunday)"
+        )
+    start_date = template_in.start_date or date.today()
+    if template_in.end_date is not None and template_in.end_date < start_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end_date cannot be before start_date"
+        )
+
+    template = models.RideTemplate(
+        **template_in.model_dump(exclude={"weekdays", "start_date"}),
+        weekdays=weekday_mask(template_in.weekdays),
+        start_date=start_date,
+        driver_id=current_user.user_id,
+        active=True
+    )
+    db.add(template)
+    await db.flush() # Assigns template_id for the generated rides
+    rides_created = await generate_template_rides(db, template.template_id)
+    mark_user_write(current_user.user_id)
+
+    return template_out(template, rides_created)
+
+@router.get("/templates/my-templates", response_model=List[schemas.RideTemplateOut])
+async def get_my_ride_templates(
+    db: AsyncSession = Depends(get_read_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    if current_user.role.lower() != 'driver':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only drivers have ride templates"
+        )
+    query = select(models.RideTemplate).where(
+        models.RideTemplate.driver_id == current_user.user_id
+    ).order_by(models.RideTemplate.template_id)
+    result = await db.execute(query)
+    return [template_out(template) for template in result.scalars().all()]
+
+@router.delete("/templates/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def deactivate_ride_template(
+    template_id: int,
+    db: AsyncSession = Depends(get_db_session),
+    current_user: Principal = Depends(get_current_user)
+):
+    """Stop generating rides from a template. Rides already generated stay bookable."""
+    if current_user.role.lower() != 'driver':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only drivers have ride templates"
+        )
+    template = await db.get(models.RideTemplate, template_id)
+    if not template or template.driver_id != current_user.user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ride template not found"
+        )
+    template.active = False
+    mark_user_write(current_user.user_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
-    # Query back the ride to load relationships for the response model
-    query = select(models.Ride).where(models.Ride.ride_id == new_ride.ride_id).options(
+
+# --- Lite projection: the columns RideLite needs, joined in one query ---
+RIDE_LITE_COLUMNS = (
+    models.Ride.ride_id, models.Ride.origin, models.Ride.destination,
+    models.Ride.date_time, models.Ride.seats_available, models.Ride.price,
+    models.User.user_id.label("driver_id"), models.User.name.label("driver_name"),
+    models.Vehicle.model.label("vehicle_model"),
+)
+
+def ride_lite(row) -> dict:
+    return {
+        "ride_id": row.ride_id,
+        "origin": row.origin,
+        "destination": row.destination,
+        "date_time": row.date_time,
+        "seats_available": row.seats_available,
+        "price": float(row.price),
+        "driver": {"user_id": row.driver_id, "name": row.driver_name},
+        "vehicle": {"model": row.vehicle_model},
+    }
+
+def ride_select(view: str):
+    """SELECT for ride list items: lite columns in one joined query, or full ORM rows."""
+    if view == "lite":
+        return select(*RIDE_LITE_COLUMNS).join(models.Ride.driver).join(models.Ride.vehicle)
+    return select(models.Ride).options(
         selectinload(models.Ride.driver),
         selectinload(models.Ride.vehicle)
     )
-    result = await db.execute(query)
-    final_ride = result.scalars().first()
 
-    if not final_ride: 
-        raise HTTPException(status_code=500, detail="Could not retrieve ride after creation.")
+def ride_item(ride, view: str) -> dict:
+    if view == "lite":
+        return ride_lite(ride)
+    return schemas.RideOut.model_validate(ride).model_dump()
 
-    return final_ride
+# --- Radius search: candidates from the in-memory grid, live columns from the DB ---
+async def search_nearby(
+    db: AsyncSession, ride_date: date, pickup, drop, radius_km: float,
+    min_seats: int, limit: int, cursor: Optional[str], view: str
+) -> dict:
+    await geo_index.refresh(db)
+    matches = geo_index.search(ride_date, pickup, drop, radius_km)
 
+    # Keyset on the ranking itself: (pickup + drop distance, ride_id)
+    if cursor:
+        last_score, last_id = decode_cursor(cursor, 2, types=((int, float), int))
+        matches = [match for match in matches if (match.score, match.ride_id) > (last_score, last_id)]
 
-# --- Endpoint to Search for Rides ---
-@router.get("/", response_model=List[schemas.RideOut])
+    # Seats change constantly, so they are checked in SQL for the candidates in
+    # rank order; one query per chunk, and usually the first chunk is enough.
+    found = []
+    for start in range(0, len(matches), limit + 1):
+        if len(found) > limit:
+            break
+        chunk = matches[start:start + limit + 1]
+        query = ride_select(view).where(
+            models.Ride.ride_id.in_([match.ride_id for match in chunk]),
+            models.Ride.seats_available >= min_seats
+        )
+        result = await db.execute(query)
+        rows = {row.ride_id: row for row in (result.all() if view == "lite" else result.scalars().all())}
+        found += [(match, rows[match.ride_id]) for match in chunk if match.ride_id in rows]
+
+    next_cursor = None
+    if len(found) > limit:
+        found = found[:limit]
+        next_cursor = encode_cursor(found[-1][0].score, found[-1][0].ride_id)
+
+    items = [
+        {**ride_item(ride, view), "pickup_distance_km": round(match.pickup_km, 3), "drop_distance_km": round(match.drop_km, 3)}
+        for match, ride in found
+    ]
+    return {"items": items, "limit": limit, "next_cursor": next_cursor}
+
+# --- Endpoint to Search for Rides (keyset paginated on date_time, ride_id) ---
+# Text mode matches origin/destination prefixes; when no ride on the day
+# matches, it falls back to substrings, so "University" still finds
+# "PES University". Cursors remember which of the two a search is paging
+# through. Radius mode (all four
+# coordinates given) matches rides whose pickup and drop are both within
+# radius_km, nearest first, and ignores origin/destination.
+# Pages are built as plain dicts and rendered with orjson directly, skipping the
+# response_model pass; the declared models still document the shapes.
+@router.get("/", response_model=Union[
+    schemas.RidePage, schemas.RideLitePage, schemas.RideNearbyPage, schemas.RideLiteNearbyPage
+])
 async def search_rides(
-    origin: str,
-    destination: str,
     ride_date: date,
+    origin: Optional[str] = None,
+    destination: Optional[str] = None,
+    origin_lat: Optional[float] = Query(default=None, ge=-90, le=90),
+    origin_lng: Optional[float] = Query(default=None, ge=-180, le=180),
+    destination_lat: Optional[float] = Query(default=None, ge=-90, le=90),
+    destination_lng: Optional[float] = Query(default=None, ge=-180, le=180),
+    radius_km: float = Query(default=3.0, gt=0, le=50),
     min_seats: Optional[int] = Query(default=1, ge=1),
-    db: AsyncSession = Depends(get_db_session)
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    view: schemas.ResponseView = "full",
+    db: AsyncSession = Depends(get_read_session)
 ):
-    query = select(models.Ride).where(
-        models.Ride.origin.ilike(f"%{origin}%"),
-        models.Ride.destination.ilike(f"%{destination}%"),
-        func.date(models.Ride.date_time) == ride_date,
-        models.Ride.seats_available >= min_seats
-    ).options(
-        selectinload(models.Ride.driver),
-        selectinload(models.Ride.vehicle)
-    ).order_by(models.Ride.date_time)
+    coordinates = (origin_lat, origin_lng, destination_lat, destination_lng)
+    if None not in coordinates:
+        page = await search_nearby(
+            db, ride_date, (origin_lat, origin_lng), (destination_lat, destination_lng),
+            radius_km, min_seats, limit, cursor, view
+        )
+        return ORJSONResponse(page)
+    if any(value is not None for value in coordinates) or origin is None or destination is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Search by origin and destination, or by all four coordinates"
+        )
 
-    result = await db.execute(query)
-    rides = result.scalars().all()
+    origin_key = models.normalize_location(origin)
+    destination_key = models.normalize_location(destination)
 
-    return rides
+    # Served from memory until a ride on a matching route and day changes
+    cache_key = (origin_key, destination_key, ride_date, min_seats, limit, cursor, view)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return ORJSONResponse(cached)
 
-# --- Endpoint to Get a Single Ride by ID ---
-@router.get("/{ride_id}", response_model=schemas.RideOut)
-async def get_ride_details(
+    if cursor:
+        last_time, last_id, match = decode_cursor(cursor, 3, types=(datetime, int, str))
+        if match not in ("prefix", "contains"):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+    else:
+        match = "prefix"
+
+    async def find_rides(match: str) -> list:
+        # A prefix match on the normalized keys and a half-open range on date_time
+        # can seek on ix_rides_route_departure; the substring fallback scans the day.
+        day_start = datetime.combine(ride_date, time.min)
+        if match == "prefix":
+            route = (
+                models.Ride.origin_key.startswith(origin_key, autoescape=True),
+                models.Ride.destination_key.startswith(destination_key, autoescape=True),
+            )
+        else:
+            route = (
+                models.Ride.origin_key.contains(origin_key, autoescape=True),
+                models.Ride.destination_key.contains(destination_key, autoescape=True),
+            )
+        query = ride_select(view).where(
+            *route,
+            models.Ride.date_time >= day_start,
+            models.Ride.date_time < day_start + timedelta(days=1),
+            models.Ride.seats_available >= min_seats
+        )
+
+        if cursor:
+            query = query.where(or_(
+                models.Ride.date_time > last_time,
+                and_(models.Ride.date_time == last_time, models.Ride.ride_id > last_id)
+            ))
+
+        # Fetch one extra row to learn whether another page exists
+        query = query.order_by(models.Ride.date_time, models.Ride.ride_id).limit(limit + 1)
+
+        result = await db.execute(query)
+        return result.all() if view == "lite" else result.scalars().all()
+
+    async def load_page():
+        epoch = search_cache.epoch
+        rides = await find_rides(match)
+        page_match = match
+        if not rides and not cursor:
+            page_match = "contains"
+            rides = await find_rides(page_match)
+
+        next_cursor = None
+        if len(rides) > limit:
+            rides = rides[:limit]
+            next_cursor = encode_cursor(rides[-1].date_time, rides[-1].ride_id, page_match)
+
+        # Session-independent dicts, so the page can be cached and shared
+        page = {"items": [ride_item(ride, view) for ride in rides], "limit": limit, "next_cursor": next_cursor}
+        search_cache.set(cache_key, page, epoch)
+        return page
+
+    return ORJSONResponse(await ride_reads.do(("search", db.info["route"], cache_key), load_page))
+
+# --- Endpoint for a Ride's Stops and per-Segment Seats (rides with waypoints) ---
+@router.get("/{ride_id}/stops", response_model=schemas.RideStopsOut)
+async def get_ride_stops(
     ride_id: int,
-    db: AsyncSession = Depends(get_db_session),
+    seats: int = Query(default=1, ge=1),
+    from_stop: Optional[int] = Query(default=None, ge=0),
+    to_stop: Optional[int] = Query(default=None, ge=1),
+    db: AsyncSession = Depends(get_read_session)
 ):
     query = select(models.Ride).where(
         models.Ride.ride_id == ride_id
     ).options(
-        selectinload(models.Ride.driver),
-        selectinload(models.Ride.vehicle)
+        selectinload(models.Ride.stops),
+        selectinload(models.Ride.segments)
     )
+    ride = (await db.execute(query)).scalars().first()
 
-    result = await db.execute(query)
-    ride = result.scalars().first()
+    if not ride:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Ride with ID {ride_id} not found"
+        )
+    if ride.stop_count is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This ride has no intermediate stops"
+        )
+
+    tree = SegmentTree([segment.seats_available for segment in ride.segments])
+    seats_between = None
+    if from_stop is not None or to_stop is not None:
+        lo = 0 if from_stop is None else from_stop
+        hi = ride.stop_count - 1 if to_stop is None else to_stop
+        if not lo < hi < ride.stop_count:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid stop range for this ride")
+        seats_between = tree.min(lo, hi)
+
+    return {
+        "ride_id": ride.ride_id,
+        "seats": seats,
+        "stops": [
+            {"stop_index": stop.stop_index, "name": stop.name, "reachable_to": tree.reachable_to(stop.stop_index, seats)}
+            for stop in ride.stops
+        ],
+        "segments": [
+            {"segment_index": segment.segment_index, "seats_available": segment.seats_available}
+            for segment in ride.segments
+        ],
+        "seats_available": seats_between,
+    }
+
+# --- Endpoint to Get a Single Ride by ID (conditional GET via ETag) ---
+def ride_etag(ride_id: int, version: int) -> str:
+    # Weak: a driver/vehicle detail change does not bump the ride version
+    return f'W/"ride-{ride_id}-v{version}"'
+
+@router.get("/{ride_id}", response_model=schemas.RideOut)
+async def get_ride_details(
+    ride_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_read_session),
+):
+    # Revalidation costs one primary-key lookup of the version and no body
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        query = select(models.Ride.version).where(models.Ride.ride_id == ride_id)
+        version = (await db.execute(query)).scalar()
+        if version is not None:
+            etag = ride_etag(ride_id, version)
+            if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+    async def load_ride():
+        query = select(models.Ride).where(
+            models.Ride.ride_id == ride_id
+        ).options(
+            selectinload(models.Ride.driver),
+            selectinload(models.Ride.vehicle)
+        )
+
+        result = await db.execute(query)
+        ride = result.scalars().first()
+        if not ride:
+            return None, None
+        # Shared with other requests, so hand out a plain dict, not the ORM row
+        return schemas.RideOut.model_validate(ride).model_dump(), ride.version
+
+    ride, version = await ride_reads.do(("ride", db.info["route"], ride_id), load_ride)
 
     if not ride:
         raise HTTPException(
@@ -178,4 +793,5 @@ async def get_ride_details(
             detail=f"Ride with ID {ride_id} not found"
         )
 
-    return ride
\ No newline at end of file
+    # no-cache: browsers keep the body but revalidate with If-None-Match every time
+    return ORJSONResponse(ride, headers={"ETag": ride_etag(ride_id, version), "Cache-Control": "private, no-cache"})
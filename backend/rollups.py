@@ -0,0 +1,207 @@
+# backend/rollups.py
+#
+# Daily per-route totals kept in daily_route_rollups. Writers add their deltas
+# in the same transaction as the ride/booking change, so the table is always
+# consistent with the raw rows; rebuild_rollups() recomputes it from scratch.
+#
+# Each day/route total is split over ROLLUP_SHARDS counter rows, told apart by
+# the shard column, and readers sum them. A transaction adds to one shard
+# picked at random, so bookings on a busy route mostly update different rows
+# instead of queueing on one row lock until commit.
+#
+#   python -m backend.rollups [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+
+import argparse
+import asyncio
+import os
+import random
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import and_, delete, func, insert
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
+
+from . import models
+from .database import AsyncSessionLocal
+
+KEY_COLUMNS = ("day", "origin_key", "destination_key")
+COUNTER_COLUMNS = ("rides_offered", "seats_offered", "bookings_confirmed", "seats_booked", "seat_km")
+REBUILD_BATCH_SIZE = 1000
+ROLLUP_SHARDS = int(os.getenv("ROLLUP_SHARDS", "8"))
+
+# Seat-km of a confirmed booking in SQL: seats x the distance between its stops
+# on rides with waypoints, x the ride's distance otherwise. Queries using it
+# must go through with_booking_stops().
+_board = aliased(models.RideStop)
+_alight = aliased(models.RideStop)
+BOOKING_SEAT_KM = models.Booking.seats_booked * func.coalesce(
+    _alight.km_from_origin - _board.km_from_origin, models.Ride.distance_km, 0
+)
+
+def with_booking_stops(query):
+    """Outer-join each booking's boarding and alighting stops, for BOOKING_SEAT_KM."""
+    return query.outerjoin(_board, and_(
+        _board.ride_id == models.Booking.ride_id, _board.stop_index == models.Booking.from_stop
+    )).outerjoin(_alight, and_(
+        _alight.ride_id == models.Booking.ride_id, _alight.stop_index == models.Booking.to_stop
+    ))
+
+
+def _upsert(dialect_name: str, rows: list):
+    """INSERT the rows, or add their counters to existing ones, in one statement. Keys must be distinct."""
+    table = models.DailyRouteRollup.__table__
+    counters = [name for name in rows[0] if name in COUNTER_COLUMNS]
+    if dialect_name in ("mysql", "mariadb"):
+        stmt = mysql.insert(table).values(rows)
+        return stmt.on_duplicate_key_update({name: table.c[name] + stmt.inserted[name] for name in counters})
+    dialect = postgresql if dialect_name == "postgresql" else sqlite
+    stmt = dialect.insert(table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[*KEY_COLUMNS, "shard"],
+        set_={name: table.c[name] + stmt.excluded[name] for name in counters}
+    )
+
+def _rollup_key(ride) -> tuple:
+    return (ride.date_time.date(), ride.origin_key, ride.destination_key)
+
+async def _add(db: AsyncSession, totals: Dict[tuple, dict]):
+    """Upsert `totals` into this transaction's shard, keys in sorted order.
+
+    The shard is picked once per session, so a transaction that writes one
+    route twice (a cancel and the promotion it triggers) locks one row, and
+    sorting keeps two transactions from locking the same rows in opposite order.
+    """
+    if not totals:
+        return
+    shard = db.info.setdefault("rollup_shard", random.randrange(ROLLUP_SHARDS))
+    rows = [
+        {**dict(zip(KEY_COLUMNS, key)), "shard": shard, **dict.fromkeys(COUNTER_COLUMNS, 0), **deltas}
+        for key, deltas in sorted(totals.items(), key=lambda item: str(item[0]))
+    ]
+    for i in range(0, len(rows), REBUILD_BATCH_SIZE):
+        await db.execute(_upsert(db.bind.dialect.name, rows[i:i + REBUILD_BATCH_SIZE]))
+
+async def add_to_rollup(db: AsyncSession, ride, **deltas):
+    """Add `deltas` to the rollup of `ride`'s day and route (anything with date_time/origin_key/destination_key)."""
+    await _add(db, {_rollup_key(ride): deltas})
+
+async def rollup_ride_created(db: AsyncSession, ride):
+    await add_to_rollup(db, ride, rides_offered=1, seats_offered=ride.seats_total)
+
+async def rollup_rides_created(db: AsyncSession, rides):
+    """rollup_ride_created for many rides, summed per day/route."""
+    totals = {}
+    for ride in rides:
+        row = totals.setdefault(_rollup_key(ride), {"rides_offered": 0, "seats_offered": 0})
+        row["rides_offered"] += 1
+        row["seats_offered"] += ride.seats_total
+    await _add(db, totals)
+
+async def rollup_booking(db: AsyncSession, ride, seats: int, sign: int = 1, bookings: int = 1, seat_km=None):
+    """Count confirmed bookings (sign=1) or take cancelled ones back out (sign=-1); `seats` is their total.
+
+    `seat_km` defaults to `seats` over the ride's whole distance; pass it for
+    bookings between stops (bookings.booking_seat_km).
+    """
+    if seat_km is None:
+        seat_km = seats * (ride.distance_km or 0)
+    await add_to_rollup(
+        db, ride,
+        bookings_confirmed=sign * bookings,
+        seats_booked=sign * seats,
+        seat_km=sign * seat_km
+    )
+
+async def rollup_bookings_made(db: AsyncSession, items):
+    """rollup_booking for bookings on many rides, summed per day/route. `items` are (ride, seats, bookings)."""
+    totals = {}
+    for ride, seats, bookings in items:
+        row = totals.setdefault(_rollup_key(ride), {"bookings_confirmed": 0, "seats_booked": 0, "seat_km": 0})
+        row["bookings_confirmed"] += bookings
+        row["seats_booked"] += seats
+        row["seat_km"] += seats * (ride.distance_km or 0)
+    await _add(db, totals)
+
+
+def _as_date(value) -> date:
+    # func.date() comes back as a string on SQLite
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+async def rebuild_rollups(db: AsyncSession, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """Recompute the rollup rows for rides departing in [start, end] from the raw tables.
+
+    Runs as one transaction in the caller's session and folds every shard of a
+    day/route into shard 0. Rides or bookings written for the same days while
+    it runs can be counted twice or not at all, so run it for past days or in
+    a quiet period. Returns the number of rows written.
+    """
+    day = func.date(models.Ride.date_time)
+    in_range = []
+    if start:
+        in_range.append(models.Ride.date_time >= datetime.combine(start, time.min))
+    if end:
+        in_range.append(models.Ride.date_time < datetime.combine(end + timedelta(days=1), time.min))
+
+    rows = {}
+    ride_totals = await db.execute(
+        select(
+            day, models.Ride.origin_key, models.Ride.destination_key,
+            func.count(models.Ride.ride_id), func.coalesce(func.sum(models.Ride.seats_total), 0)
+        ).where(*in_range).group_by(day, models.Ride.origin_key, models.Ride.destination_key)
+    )
+    for ride_day, origin_key, destination_key, rides, seats_offered in ride_totals:
+        rows[(_as_date(ride_day), origin_key, destination_key)] = {
+            "rides_offered": rides, "seats_offered": seats_offered,
+            "bookings_confirmed": 0, "seats_booked": 0, "seat_km": 0,
+        }
+
+    booking_totals = await db.execute(
+        with_booking_stops(select(
+            day, models.Ride.origin_key, models.Ride.destination_key,
+            func.count(models.Booking.booking_id),
+            func.coalesce(func.sum(models.Booking.seats_booked), 0),
+            func.coalesce(func.sum(BOOKING_SEAT_KM), 0)
+        ).join(models.Booking.ride)).where(
+            models.Booking.status == "confirmed", *in_range
+        ).group_by(day, models.Ride.origin_key, models.Ride.destination_key)
+    )
+    for ride_day, origin_key, destination_key, bookings, seats, seat_km in booking_totals:
+        row = rows[(_as_date(ride_day), origin_key, destination_key)]
+        row["bookings_confirmed"] = bookings
+        row["seats_booked"] = seats
+        row["seat_km"] = seat_km
+
+    rollup = models.DailyRouteRollup
+    clear = delete(rollup)
+    if start:
+        clear = clear.where(rollup.day >= start)
+    if end:
+        clear = clear.where(rollup.day <= end)
+    await db.execute(clear)
+
+    values = [dict(zip(KEY_COLUMNS, key), shard=0, **counters) for key, counters in rows.items()]
+    for i in range(0, len(values), REBUILD_BATCH_SIZE):
+        await db.execute(insert(rollup), values[i:i + REBUILD_BATCH_SIZE])
+    return len(values)
+
+
+async def _main(start: Optional[date], end: Optional[date]):
+    from .database import engine, Base
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        written = await rebuild_rollups(db, start, end)
+        await db.commit()
+    await engine.dispose()
+    print(f"Rebuilt {written} daily route rollup rows")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild daily_route_rollups from rides and bookings.")
+    parser.add_argument("--start", type=date.fromisoformat, help="First ride day to rebuild (default: all)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last ride day to rebuild, inclusive (default: all)")
+    args = parser.parse_args()
+    asyncio.run(_main(args.start, args.end))
@@ -1,6 +1,6 @@
 # backend/schemas.py
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import List, Literal, Optional
 from enum import Enum
 from datetime import datetime, date, time
 
@@ -16,7 +16,7 @@ class UserCreate(BaseModel):
     password: str
     phone: str
     srn: str
-    role: str # 'driver' or 'passenger'
+    role: Literal["driver", "passenger"] # Admins are promoted in the database, never self-registered
     user_type: UserType
 
     # Removed vehicle fields: they are now optional/handled by separate endpoint
@@ -56,6 +56,7 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    user_id: Optional[int] = None
 
 # --- Vehicle Schemas ---
 class VehicleCreate(BaseModel):
@@ -80,6 +81,14 @@ class RideCreate(BaseModel):
     date_time: datetime
     seats_available: int
     price: float
+    distance_km: Optional[float] = None
+    origin_lat: Optional[float] = Field(default=None, ge=-90, le=90)
+    origin_lng: Optional[float] = Field(default=None, ge=-180, le=180)
+    destination_lat: Optional[float] = Field(default=None, ge=-90, le=90)
+    destination_lng: Optional[float] = Field(default=None, ge=-180, le=180)
+    waypoints: Optional[List[str]] = None # Intermediate stops, in driving order
+    # km from the origin to each waypoint; spread evenly over distance_km when omitted
+    waypoint_km: Optional[List[float]] = None
 
 class RideOut(BaseModel):
     ride_id: int
@@ -88,6 +97,13 @@ class RideOut(BaseModel):
     date_time: datetime
     seats_available: int
     price: float
+    distance_km: Optional[float] = None
+    origin_lat: Optional[float] = None
+    origin_lng: Optional[float] = None
+    destination_lat: Optional[float] = None
+    destination_lng: Optional[float] = None
+    stop_count: Optional[int] = None # Set when the ride has waypoints; see /api/rides/{id}/stops
+    template_id: Optional[int] = None # Set when generated from a recurring template
     
     driver: UserOut
     vehicle: VehicleOut
@@ -95,10 +111,103 @@ class RideOut(BaseModel):
     class Config:
         from_attributes = True
 
+# --- Recurring Ride Template Schemas ---
+class RideTemplateCreate(BaseModel):
+    vehicle_id: int
+    origin: str
+    destination: str
+    weekdays: List[int] = Field(min_length=1) # 0 = Monday ... 6 = Sunday
+    departure_time: time
+    seats_available: int
+    price: float
+    distance_km: Optional[float] = None
+    origin_lat: Optional[float] = Field(default=None, ge=-90, le=90)
+    origin_lng: Optional[float] = Field(default=None, ge=-180, le=180)
+    destination_lat: Optional[float] = Field(default=None, ge=-90, le=90)
+    destination_lng: Optional[float] = Field(default=None, ge=-180, le=180)
+    start_date: Optional[date] = None # Defaults to today
+    end_date: Optional[date] = None # Inclusive; open-ended when omitted
+
+class RideTemplateOut(BaseModel):
+    template_id: int
+    vehicle_id: int
+    origin: str
+    destination: str
+    weekdays: List[int]
+    departure_time: time
+    seats_available: int
+    price: float
+    distance_km: Optional[float] = None
+    start_date: date
+    end_date: Optional[date] = None
+    active: bool
+    generated_until: Optional[date] = None
+    rides_created: Optional[int] = None # Rides generated by this request
+
+class RideBulkOffer(RideCreate):
+    # Admins only, and then required: the driver to post for, who must own vehicle_id
+    driver_id: Optional[int] = None
+
+class RideBulkCreate(BaseModel):
+    rides: List[RideBulkOffer] = Field(min_length=1)
+
+class RideBulkItem(BaseModel):
+    index: int # Position in the request's rides list
+    ride_id: Optional[int] = None
+    error: Optional[str] = None
+
+class RideBulkResult(BaseModel):
+    created: int
+    failed: int
+    results: List[RideBulkItem]
+
 # --- Booking Schemas ---
 class BookingCreate(BaseModel):
     ride_id: int
     seats_booked: int
+    # Rides with waypoints only; default to the whole route
+    from_stop: Optional[int] = None
+    to_stop: Optional[int] = None
+
+class WaitlistCreate(BaseModel):
+    ride_id: int
+    seats_requested: int
+    from_stop: Optional[int] = None
+    to_stop: Optional[int] = None
+
+class WaitlistOut(BaseModel):
+    entry_id: int
+    ride_id: int
+    seats_requested: int
+    from_stop: Optional[int] = None
+    to_stop: Optional[int] = None
+    status: str
+    booking_id: Optional[int] = None # The confirmed booking, once promoted
+    position: Optional[int] = None # 1 = next in line; waiting entries only
+
+class TripRequestCreate(BaseModel):
+    origin: str
+    destination: str
+    earliest_departure: datetime
+    latest_departure: datetime
+    seats_requested: int = 1
+    origin_lat: Optional[float] = Field(default=None, ge=-90, le=90)
+    origin_lng: Optional[float] = Field(default=None, ge=-180, le=180)
+    destination_lat: Optional[float] = Field(default=None, ge=-90, le=90)
+    destination_lng: Optional[float] = Field(default=None, ge=-180, le=180)
+
+class TripRequestOut(BaseModel):
+    trip_request_id: int
+    origin: str
+    destination: str
+    earliest_departure: datetime
+    latest_departure: datetime
+    seats_requested: int
+    status: str
+    booking_id: Optional[int] = None # The booking made for it, once matched
+
+    class Config:
+        from_attributes = True
 
 class BookingOut(BaseModel):
     booking_id: int
@@ -106,8 +215,184 @@ class BookingOut(BaseModel):
     passenger_id: int
     seats_booked: int
     status: str
+    from_stop: Optional[int] = None
+    to_stop: Optional[int] = None
     
     ride: RideOut # Nested ride details
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# --- Pagination Schemas ---
+class RidePage(BaseModel):
+    items: List[RideOut]
+    limit: int
+    next_cursor: Optional[str] = None # Pass back as ?cursor= to get the next page
+
+class BookingPage(BaseModel):
+    items: List[BookingOut]
+    limit: int
+    next_cursor: Optional[str] = None
+
+# --- Ride Stop Schemas (rides with waypoints) ---
+class StopOut(BaseModel):
+    stop_index: int
+    name: str
+    # Farthest stop reachable from here with the requested seats, None if even the next leg is full
+    reachable_to: Optional[int] = None
+
+class SegmentOut(BaseModel):
+    segment_index: int # From stop segment_index to segment_index + 1
+    seats_available: int
+
+class RideStopsOut(BaseModel):
+    ride_id: int
+    seats: int
+    stops: List[StopOut]
+    segments: List[SegmentOut]
+    seats_available: Optional[int] = None # Between from_stop and to_stop, when both are given
+
+# --- Driver Manifest Schemas ---
+class PassengerContact(BaseModel):
+    user_id: int
+    name: str
+    phone: str
+    email: EmailStr
+
+class ManifestBooking(BaseModel):
+    booking_id: int
+    seats_booked: int
+    passenger: PassengerContact
+
+class ManifestRide(BaseModel):
+    ride_id: int
+    origin: str
+    destination: str
+    date_time: datetime
+    price: float
+    distance_km: Optional[float] = None
+    seats_available: int
+    seats_booked: int # Confirmed bookings only
+    seats_offered: int
+    occupancy: float # seats_booked / seats_offered
+
+    vehicle: VehicleOut
+    bookings: List[ManifestBooking]
+
+class ManifestPage(BaseModel):
+    items: List[ManifestRide]
+    limit: int
+    next_cursor: Optional[str] = None
+
+# --- Admin Schemas ---
+class AdminMetrics(BaseModel):
+    total_users: int
+    total_drivers: int
+    total_passengers: int
+    total_rides: int
+    active_rides: int # Departing now or later
+    total_bookings: int
+    confirmed_bookings: int
+    total_seats_offered: int
+    total_seats_booked: int
+    total_co2_saved_kg: float
+
+class RollupTotals(BaseModel):
+    rides_offered: int
+    seats_offered: int
+    bookings_confirmed: int
+    seats_booked: int
+    occupancy: float # seats_booked / seats_offered, 0 when nothing was offered
+    co2_saved_kg: float
+
+class DailyRollupOut(RollupTotals):
+    day: date
+
+class RouteRollupOut(RollupTotals):
+    origin_key: str
+    destination_key: str
+
+# --- Lite Projections (?view=lite) ---
+# Only what list screens render; built straight from selected columns, no ORM rows.
+ResponseView = Literal["full", "lite"]
+
+class DriverLite(BaseModel):
+    user_id: int
+    name: str
+
+class VehicleLite(BaseModel):
+    model: str
+
+class RideLite(BaseModel):
+    ride_id: int
+    origin: str
+    destination: str
+    date_time: datetime
+    seats_available: int
+    price: float
+
+    driver: DriverLite
+    vehicle: VehicleLite
+
+class DriverContact(BaseModel):
+    name: str
+    phone: str
+
+class BookedRideLite(BaseModel):
+    ride_id: int
+    origin: str
+    destination: str
+    date_time: datetime
+    price: float
+
+    driver: DriverContact
+
+class BookingLite(BaseModel):
+    booking_id: int
+    ride_id: int
+    seats_booked: int
+    status: str
+
+    ride: BookedRideLite
+
+class RideLitePage(BaseModel):
+    items: List[RideLite]
+    limit: int
+    next_cursor: Optional[str] = None
+
+# --- Radius Search Results (origin_lat/lng + destination_lat/lng on search_rides) ---
+class RideNearby(RideOut):
+    pickup_distance_km: float
+    drop_distance_km: float
+
+class RideLiteNearby(RideLite):
+    pickup_distance_km: float
+    drop_distance_km: float
+
+class RideNearbyPage(BaseModel):
+    items: List[RideNearby]
+    limit: int
+    next_cursor: Optional[str] = None
+
+class RideLiteNearbyPage(BaseModel):
+    items: List[RideLiteNearby]
+    limit: int
+    next_cursor: Optional[str] = None
+
+class BookingLitePage(BaseModel):
+    items: List[BookingLite]
+    limit: int
+    next_cursor: Optional[str] = None
+
+class MatchRunOut(BaseModel):
+    requests: int # Pending requests in the window
+    rides: int # Candidate rides with free seats
+    matched: int
+    seats_filled: int
+    unmatched: int
+    match_ms: float # Scoring and assignment, before the writes
+
+# --- Live Seat Stream Token ---
+class LiveTokenOut(BaseModel):
+    token: str
+    expires_in: int # Seconds; connect to /api/live/seats before then
@@ -0,0 +1,71 @@
+# backend/search_cache.py
+
+import os
+from collections import defaultdict
+from datetime import date
+
+from .cache import TTLCache
+
+
+class SearchCache:
+    """search_rides pages keyed by (origin_key, destination_key, ride_date, ...rest).
+
+    Searches match prefixes of the normalized route keys, or substrings when
+    no prefix matches, so a change to a ride on route (o, d) and day D affects
+    the cached searches for D whose origin and destination occur in o and d.
+    Entries are indexed by day to keep that scan to one day's searches.
+
+    `epoch` advances on every invalidation. A search reads it before querying
+    and passes it to set(), so a page computed while a write was committing is
+    not cached over the invalidation that write just made.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize, ttl, on_evict=self._forget)
+        self._by_day = defaultdict(set)
+        self.invalidations = 0
+        self.epoch = 0
+
+    def get(self, key: tuple):
+        return self._entries.get(key)
+
+    def set(self, key: tuple, value, epoch: int = None):
+        if epoch is not None and epoch != self.epoch:
+            return
+        self._entries.set(key, value)
+        self._by_day[key[2]].add(key)
+
+    def invalidate(self, origin_key: str, destination_key: str, day: date):
+        self.epoch += 1
+        for key in list(self._by_day.get(day, ())):
+            if key[0] in origin_key and key[1] in destination_key:
+                self._entries.pop(key)
+                self._forget(key)
+                self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._by_day.clear()
+
+    def _forget(self, key: tuple):
+        keys = self._by_day.get(key[2])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_day[key[2]]
+
+    def stats(self) -> dict:
+        return {**self._entries.stats(), "invalidations": self.invalidations}
+
+
+# The TTL only bounds staleness caused by writes handled in *other* workers (or
+# lagging replica reads); writes in this process invalidate immediately.
+search_cache = SearchCache(
+    maxsize=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2048")),
+    ttl=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "30"))
+)
+
+
+def invalidate_ride_searches(ride):
+    """Drop cached searches that could contain `ride` (anything with origin_key/destination_key/date_time)."""
+    search_cache.invalidate(ride.origin_key, ride.destination_key, ride.date_time.date())
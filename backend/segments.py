@@ -0,0 +1,52 @@
+# backend/segments.py
+
+from typing import Optional, Sequence
+
+
+class SegmentTree:
+    """Range-minimum over a ride's per-segment seat counts.
+
+    min(lo, hi) is the number of seats bookable from stop lo to stop hi, i.e.
+    the tightest of segments lo .. hi - 1. Built once from the segment rows in
+    O(n), each query is O(log n), so a ride with many stops can answer every
+    overlapping short trip without rescanning its segments.
+    """
+
+    def __init__(self, values: Sequence[int]):
+        self.size = len(values)
+        self._tree = [0] * self.size + list(values)
+        for i in range(self.size - 1, 0, -1):
+            self._tree[i] = min(self._tree[2 * i], self._tree[2 * i + 1])
+
+    def min(self, lo: int, hi: int) -> int:
+        """Minimum of values[lo:hi]; needs lo < hi."""
+        if not 0 <= lo < hi <= self.size:
+            raise IndexError(f"invalid segment range [{lo}, {hi})")
+        result = None
+        lo += self.size
+        hi += self.size
+        while lo < hi:
+            if lo & 1:
+                result = self._tree[lo] if result is None else min(result, self._tree[lo])
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                result = self._tree[hi] if result is None else min(result, self._tree[hi])
+            lo //= 2
+            hi //= 2
+        return result
+
+    def reachable_to(self, start: int, seats: int) -> Optional[int]:
+        """Farthest stop reachable from stop `start` with `seats` seats, or None."""
+        if start >= self.size or self.min(start, start + 1) < seats:
+            return None
+        # min(start, hi) only shrinks as hi grows, so binary search the last hi that fits
+        lo, hi = start + 1, self.size
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.min(start, mid) >= seats:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
+
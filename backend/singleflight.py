@@ -0,0 +1,58 @@
+# backend/singleflight.py
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs `fn`; callers arriving while it
+    is in flight await the leader's outcome instead of running their own, and
+    all of them get the same result or the same exception. Nothing is kept once
+    the call finishes, so this deduplicates work without caching it.
+
+    If the leader is cancelled (e.g. its client disconnected) the waiters are
+    not failed with it: one of them takes over as the new leader.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        while True:
+            future = self._calls.get(key)
+            if future is None:
+                break
+            try:
+                # shield: a waiter being cancelled must not cancel the leader's call
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise # We were cancelled ourselves
+                continue # The leader was cancelled; retry, possibly as leader
+            self.shared += 1
+            return result
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.leaders += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception() # Mark retrieved so a waiter-less failure isn't logged twice
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._calls), "leaders": self.leaders, "shared": self.shared}
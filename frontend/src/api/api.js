@@ -2,7 +2,8 @@ import axios from 'axios';
 
 // 1. Create the base Axios instance
 const api = axios.create({
-  baseURL: "http://127.0.0.1:8000/api" // Your backend API URL
+  baseURL: "http://127.0.0.1:8000/api", // Your backend API URL
+  withCredentials: true // Sends back the last_write cookie that keeps our reads on the primary
 });
 
 // 2. Add a request interceptor
@@ -50,4 +51,65 @@ api.interceptors.response.use(
   }
 );
 
+// 4. Live seat counts (Server-Sent Events)
+// EventSource can't set headers, so each connection opens with a short-lived
+// stream token from POST /live/token instead of the login token. An open stream
+// outlives that token; when the stream drops for good, a fresh token is fetched
+// and the caller's onResync runs, since events may have been missed meanwhile.
+// onSeats gets { ride_id, delta, seats_available, from_stop?, to_stop? }.
+export const subscribeSeats = ({ rideIds = [], origin, destination, rideDate }, onSeats, onResync) => {
+  let source = null;
+  let closed = false;
+
+  const connect = async () => {
+    let token;
+    try {
+      token = (await api.post("/live/token")).data.token;
+    } catch (err) {
+      if (!closed) setTimeout(connect, 5000);
+      return;
+    }
+    if (closed) return;
+    const params = new URLSearchParams({ token });
+    rideIds.forEach((id) => params.append("ride_id", id));
+    if (origin && destination && rideDate) {
+      params.append("origin", origin);
+      params.append("destination", destination);
+      params.append("ride_date", rideDate);
+    }
+    source = new EventSource(`${api.defaults.baseURL}/live/seats?${params}`);
+    source.addEventListener("seats", (event) => onSeats(JSON.parse(event.data)));
+    if (onResync) {
+      source.addEventListener("resync", onResync);
+    }
+    // EventSource retries a dropped stream with the same URL; once the token has
+    // expired that fails and it gives up (CLOSED), so reconnect with a new one
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED && !closed) {
+        setTimeout(() => {
+          if (closed) return;
+          if (onResync) onResync();
+          connect();
+        }, 3000);
+      }
+    };
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    if (source) source.close();
+  };
+};
+
+// Apply a seat event to a ride held in state. Events for a stop range carry the
+// ride's new seats_available (its tightest segment); their delta only applies
+// to the booked stretch, so it never adjusts the ride's count.
+export const applySeatChange = (ride, change) => {
+  if (ride.ride_id !== change.ride_id) return ride;
+  if (change.seats_available != null) return { ...ride, seats_available: change.seats_available };
+  if (change.from_stop != null) return ride;
+  return { ...ride, seats_available: ride.seats_available + change.delta };
+};
+
 export default api;
\ No newline at end of file
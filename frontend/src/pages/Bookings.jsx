@@ -43,8 +43,8 @@ const Bookings = () => {
     setLoading(true); // Ensure loading is true at the start
     try {
       // Use the correct backend endpoint
-      const response = await api.get("/bookings/my-bookings");
-      setBookings(response.data);
+      const response = await api.get("/bookings/my-bookings", { params: { view: "lite" } });
+      setBookings(response.data.items);
     } catch (error) {
       toast.error("Failed to fetch your bookings. Please try refreshing.");
       console.error("Fetch bookings error:", error);
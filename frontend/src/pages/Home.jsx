@@ -1,6 +1,6 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
-import api from '../api/api'; 
+import api, { subscribeSeats, applySeatChange } from '../api/api'; 
 // Using react-icons
 import { FaMapMarkerAlt, FaFlagCheckered, FaCalendarAlt, FaUsers, FaSearch, FaCarAlt } from 'react-icons/fa';
 import { FiArrowRight } from "react-icons/fi"; 
@@ -65,6 +65,17 @@ const Home = () => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
 
+  // Keep the listed rides' seat counts live; re-run the search if events were missed
+  const rideIds = rides.map((ride) => ride.ride_id).join(",");
+  useEffect(() => {
+    if (!rideIds) return undefined;
+    return subscribeSeats(
+      { rideIds: rideIds.split(",") },
+      (change) => setRides((prev) => prev.map((ride) => applySeatChange(ride, change))),
+      () => api.get("/rides/", { params: { ...formData, view: "lite" } }).then((response) => setRides(response.data.items))
+    );
+  }, [rideIds]); // eslint-disable-line react-hooks/exhaustive-deps
+
   const handleChange = (e) => {
     setFormData({ ...formData, [e.target.name]: e.target.value });
   };
@@ -76,9 +87,9 @@ const Home = () => {
     setRides([]);
 
     try {
-      const response = await api.get("/rides/", { params: formData });
-      setRides(response.data);
-      if (response.data.length === 0) {
+      const response = await api.get("/rides/", { params: { ...formData, view: "lite" } });
+      setRides(response.data.items);
+      if (response.data.items.length === 0) {
         setError("No rides found for this route. Be the first to post one!");
       }
     } catch (err) {
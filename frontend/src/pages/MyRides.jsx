@@ -11,23 +11,41 @@ import { MapPin, Calendar, Clock, Users, Eye, Car } from "lucide-react";
 const MyRides = () => {
   const navigate = useNavigate();
   const [rides, setRides] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchMyRides();
   }, []);
 
-  const fetchMyRides = async () => {
+  // The manifest is paged by departure; each page carries the cursor for the next one
+  const fetchMyRides = async (cursor = null) => {
     try {
-      const response = await api.get("/rides/driver/my-rides");
-      setRides(response.data);
+      const response = await api.get("/rides/driver/my-rides", { params: cursor ? { cursor } : {} });
+      setRides((previous) => (cursor ? [...previous, ...response.data.items] : response.data.items));
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       toast.error("Failed to fetch your rides");
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
+  const loadMore = () => {
+    setLoadingMore(true);
+    fetchMyRides(nextCursor);
+  };
+
+  const formatDateTime = (isoString) => {
+    const date = new Date(isoString);
+    return {
+      date: date.toLocaleDateString('en-US', { dateStyle: 'medium' }),
+      time: date.toLocaleTimeString('en-US', { timeStyle: 'short' }),
+    };
+  };
+
   const viewBookings = (rideId) => {
     navigate(`/rides/${rideId}`);
   };
@@ -68,64 +86,71 @@ const MyRides = () => {
         ) : (
           <div className="grid gap-6" data-testid="my-rides-list">
             {rides.map((ride) => (
-              <Card key={ride.id} className="hover:shadow-lg transition-shadow border-l-4 border-l-blue-500" data-testid={`my-ride-${ride.id}`}>
+              <Card key={ride.ride_id} className="hover:shadow-lg transition-shadow border-l-4 border-l-blue-500" data-testid={`my-ride-${ride.ride_id}`}>
                 <CardContent className="p-6">
                   <div className="flex justify-between items-start mb-4">
                     <div className="flex-1">
                       <div className="flex items-center space-x-2 mb-2">
                         <MapPin className="w-5 h-5 text-green-600" />
-                        <span className="font-semibold text-lg" data-testid="my-ride-start">{ride.start_location}</span>
+                        <span className="font-semibold text-lg" data-testid="my-ride-start">{ride.origin}</span>
                         <span className="text-gray-400">→</span>
                         <MapPin className="w-5 h-5 text-red-600" />
-                        <span className="font-semibold text-lg" data-testid="my-ride-end">{ride.end_location}</span>
+                        <span className="font-semibold text-lg" data-testid="my-ride-end">{ride.destination}</span>
                       </div>
                     </div>
                     <Badge
-                      className={ride.status === "active" ? "bg-green-100 text-green-800" : "bg-gray-100 text-gray-800"}
-                      data-testid="my-ride-status"
+                      className={ride.seats_available > 0 ? "bg-green-100 text-green-800" : "bg-gray-100 text-gray-800"}
+                      data-testid="my-ride-occupancy"
                     >
-                      {ride.status}
+                      {Math.round(ride.occupancy * 100)}% full
                     </Badge>
                   </div>
 
                   <div className="grid grid-cols-2 md:grid-cols-4 gap-4 mb-4">
                     <div className="flex items-center space-x-2 text-gray-600">
                       <Calendar className="w-4 h-4" />
-                      <span className="text-sm" data-testid="my-ride-date">{ride.date}</span>
+                      <span className="text-sm" data-testid="my-ride-date">{formatDateTime(ride.date_time).date}</span>
                     </div>
                     <div className="flex items-center space-x-2 text-gray-600">
                       <Clock className="w-4 h-4" />
-                      <span className="text-sm" data-testid="my-ride-time">{ride.time}</span>
+                      <span className="text-sm" data-testid="my-ride-time">{formatDateTime(ride.date_time).time}</span>
                     </div>
                     <div className="flex items-center space-x-2 text-gray-600">
                       <Users className="w-4 h-4" />
                       <span className="text-sm" data-testid="my-ride-seats">
-                        {ride.seats_available} / {ride.seats_total} seats
+                        {ride.seats_booked} / {ride.seats_offered} seats booked
                       </span>
                     </div>
                     <div className="text-blue-600 font-semibold" data-testid="my-ride-price">
-                      ₹{ride.price_per_seat} / seat
+                      ₹{ride.price} / seat
                     </div>
                   </div>
 
                   <div className="flex items-center space-x-2 text-gray-600 mb-4">
                     <Car className="w-4 h-4" />
-                    <span className="text-sm" data-testid="my-ride-vehicle">{ride.vehicle}</span>
+                    <span className="text-sm" data-testid="my-ride-vehicle">
+                      {ride.vehicle.model} ({ride.vehicle.license_plate})
+                    </span>
                   </div>
 
-                  {ride.notes && (
-                    <div className="mb-4 text-sm text-gray-600 bg-gray-50 p-3 rounded" data-testid="my-ride-notes">
-                      {ride.notes}
-                    </div>
+                  {ride.bookings.length > 0 && (
+                    <ul className="mb-4 text-sm text-gray-600 bg-gray-50 p-3 rounded space-y-1" data-testid="my-ride-bookings">
+                      {ride.bookings.map((booking) => (
+                        <li key={booking.booking_id} className="flex justify-between">
+                          <span>{booking.passenger.name} · {booking.passenger.phone}</span>
+                          <span>{booking.seats_booked} seat{booking.seats_booked > 1 ? "s" : ""}</span>
+                        </li>
+                      ))}
+                    </ul>
                   )}
 
                   <div className="flex space-x-3 pt-4 border-t">
                     <Button
-                      onClick={() => viewBookings(ride.id)}
+                      onClick={() => viewBookings(ride.ride_id)}
                       variant="outline"
                       size="sm"
                       className="flex-1"
-                      data-testid={`view-bookings-${ride.id}`}
+                      data-testid={`view-bookings-${ride.ride_id}`}
                     >
                       <Eye className="w-4 h-4 mr-2" />
                       View Details
@@ -134,6 +159,16 @@ const MyRides = () => {
                 </CardContent>
               </Card>
             ))}
+            {nextCursor && (
+              <Button
+                onClick={loadMore}
+                variant="outline"
+                disabled={loadingMore}
+                data-testid="load-more-rides-btn"
+              >
+                {loadingMore ? "Loading..." : "Load more rides"}
+              </Button>
+            )}
           </div>
         )}
       </div>
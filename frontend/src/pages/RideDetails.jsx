@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import api from '../api/api'; // Your Axios instance
+import api, { subscribeSeats, applySeatChange } from '../api/api'; // Your Axios instance
 import { useAuth } from '../context/AuthContext'; // To check login status
 import { FaMapMarkerAlt, FaFlagCheckered, FaCalendarAlt, FaUsers, FaCarAlt, FaUserCircle, FaMoneyBillWave } from 'react-icons/fa';
 
@@ -15,6 +15,7 @@ const RideDetails = () => {
   const [bookingError, setBookingError] = useState(null);
   const [bookingSuccess, setBookingSuccess] = useState(null);
   const [seatsToBook, setSeatsToBook] = useState(1);
+  const [waitlistMessage, setWaitlistMessage] = useState(null);
 
   useEffect(() => {
     const fetchRideDetails = async () => {
@@ -32,6 +33,13 @@ const RideDetails = () => {
     };
 
     fetchRideDetails();
+
+    // Live seat count instead of re-fetching
+    return subscribeSeats(
+      { rideIds: [rideId] },
+      (change) => setRide(prevRide => prevRide && applySeatChange(prevRide, change)),
+      fetchRideDetails
+    );
   }, [rideId]);
 
   const handleBooking = async () => {
@@ -78,6 +86,16 @@ const RideDetails = () => {
     }
   };
 
+  // Full ride: queue for the next cancellation instead of retrying
+  const handleJoinWaitlist = async () => {
+    try {
+      const response = await api.post('/bookings/waitlist', { ride_id: parseInt(rideId, 10), seats_requested: 1 });
+      setWaitlistMessage(`You're #${response.data.position} on the waitlist. We'll book your seat automatically if one frees up.`);
+    } catch (err) {
+      setWaitlistMessage(err.response?.data?.detail || "Couldn't join the waitlist. Please try again.");
+    }
+  };
+
   const formatDateTime = (dateTimeString) => {
     const date = new Date(dateTimeString);
     return date.toLocaleString('en-US', { dateStyle: 'full', timeStyle: 'short' });
@@ -192,7 +210,18 @@ const RideDetails = () => {
 
          {/* Message if no seats available */}
          {ride.seats_available <= 0 && (
-             <div className="p-6 text-center text-red-400 border-t border-gray-700">This ride is fully booked.</div>
+             <div className="p-6 text-center text-red-400 border-t border-gray-700">
+               This ride is fully booked.
+               {user && user.role && user.role.toLowerCase() === 'passenger' && (
+                 <div className="mt-3 text-gray-300">
+                   {waitlistMessage || (
+                     <button onClick={handleJoinWaitlist} className="text-cyan-400 hover:text-cyan-300 font-semibold">
+                       Join the waitlist
+                     </button>
+                   )}
+                 </div>
+               )}
+             </div>
          )}
 
         {/* Prompt to login if not logged in */}
@@ -0,0 +1,188 @@
+"""End-to-end API benchmark: the main passenger flows against the in-process app.
+
+Seeds drivers, rides and passengers into a throwaway SQLite database, then runs
+each flow as its own phase at --concurrency:
+
+    register, token login, search, ride details, create booking,
+    my-bookings, cancel booking
+
+and reports throughput and p50/p95/p99 per endpoint. Any non-2xx response,
+or any request that runs more SQL than its harness.QUERY_BUDGETS entry (an N+1 in
+the nested RideOut/BookingOut serialization, say), fails the run.
+
+Baselines are machine specific, so record one on the machine that will run
+the checks (e.g. the CI runner) and compare later runs against it:
+
+    python -m tests.bench.api_suite --save-baseline
+    python -m tests.bench.api_suite --check              # exit 1 on regression
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+ORIGINS = ["Banashankari", "Whitefield", "Electronic City", "Jayanagar", "Hebbal"]
+
+
+async def run_phase(harness, name, count, concurrency, request):
+    """Call `request(i)` for i in range(count), at most `concurrency` at a time."""
+    recorder = harness.Recorder()
+    slots = asyncio.Semaphore(concurrency)
+    failures = []
+
+    async def one(i):
+        async with slots:
+            response = await recorder.timed(name, request(i))
+            if response.status_code >= 300:
+                failures.append(f"{name}: {response.status_code} {response.text[:200]}")
+            elif (error := harness.budget_error(name, response)) is not None:
+                failures.append(error)
+            return response
+
+    responses = await asyncio.gather(*(one(i) for i in range(count)))
+    recorder.stop()
+    if not responses:
+        failures.append(f"{name}: nothing to run (an earlier phase failed)")
+        return None, responses, failures
+    return recorder.summary()[name], responses, failures
+
+
+async def run(args) -> dict:
+    from tests.bench import harness
+
+    await harness.reset_schema()
+    drivers = await harness.seed_users("driver", len(ORIGINS), "driver")
+    passengers = await harness.seed_users("rider", args.passengers, "passenger")
+    ride_ids = []
+    for driver, origin in zip(drivers, ORIGINS):
+        ride_ids += await harness.seed_rides(driver, args.rides_per_route, seats=4, origin=origin)
+    ride_date = (datetime.now() + timedelta(days=1)).date().isoformat()
+
+    rng = random.Random(args.seed)
+    results, failures = {}, []
+
+    async with harness.client() as http:
+        def record(name, phase):
+            summary, responses, errors = phase
+            if summary is not None:
+                results[name] = summary
+            failures.extend(errors)
+            return responses
+
+        record("POST /auth/register", await run_phase(
+            harness, "POST /auth/register", args.logins, args.concurrency,
+            lambda i: http.post("/api/auth/register", json={
+                "name": f"New Rider {i}", "email": f"new{i}@pes.edu", "password": harness.PASSWORD,
+                "phone": f"8{i:09d}", "srn": f"NEW{i:06d}", "role": "passenger", "user_type": "student",
+            }),
+        ))
+
+        responses = record("POST /auth/token", await run_phase(
+            harness, "POST /auth/token", args.logins, args.concurrency,
+            lambda i: http.post("/api/auth/token", data={
+                "username": passengers[i % len(passengers)], "password": harness.PASSWORD,
+            }),
+        ))
+        tokens = [r.json()["access_token"] for r in responses if r.status_code == 200]
+        if not tokens:
+            raise SystemExit("login phase produced no tokens")
+        # Every passenger needs a token for the booking phases; logins beyond the timed ones are untimed
+        headers = [await harness.login(http, email) for email in passengers]
+
+        record("GET /rides/", await run_phase(
+            harness, "GET /rides/", args.requests, args.concurrency,
+            lambda i: http.get("/api/rides/", headers=headers[i % len(headers)], params={
+                "origin": rng.choice(ORIGINS)[:4], "destination": "PES", "ride_date": ride_date,
+            }),
+        ))
+
+        record("GET /rides/{id}", await run_phase(
+            harness, "GET /rides/{id}", args.requests, args.concurrency,
+            lambda i: http.get(f"/api/rides/{rng.choice(ride_ids)}", headers=headers[i % len(headers)]),
+        ))
+
+        # One single-seat booking per passenger, spread over the rides
+        responses = record("POST /bookings/", await run_phase(
+            harness, "POST /bookings/", len(headers), args.concurrency,
+            lambda i: http.post("/api/bookings/", headers=headers[i], json={
+                "ride_id": ride_ids[i % len(ride_ids)], "seats_booked": 1,
+            }),
+        ))
+        bookings = [(i, r.json()["booking_id"]) for i, r in enumerate(responses) if r.status_code == 201]
+
+        record("GET /bookings/my-bookings", await run_phase(
+            harness, "GET /bookings/my-bookings", args.requests, args.concurrency,
+            lambda i: http.get("/api/bookings/my-bookings", headers=headers[i % len(headers)]),
+        ))
+
+        record("POST /bookings/{id}/cancel", await run_phase(
+            harness, "POST /bookings/{id}/cancel", len(bookings), args.concurrency,
+            lambda i: http.post(f"/api/bookings/{bookings[i][1]}/cancel", headers=headers[bookings[i][0]]),
+        ))
+
+    harness.print_summary(results)
+    for failure in failures[:20]:
+        print("ERROR", failure)
+    if len(failures) > 20:
+        print(f"ERROR ... and {len(failures) - 20} more")
+    return {"results": results, "failures": failures}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Endpoints whose p95 grew or throughput shrank by more than `tolerance` versus the baseline."""
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if current is None:
+            regressions.append(f"{name}: missing from this run")
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95_ms']:.2f}ms vs baseline {base['p95_ms']:.2f}ms")
+        if current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {current['throughput_rps']:.1f}/s vs baseline {base['throughput_rps']:.1f}/s"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--passengers", type=int, default=100)
+    parser.add_argument("--rides-per-route", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=500, help="requests per read endpoint")
+    parser.add_argument("--logins", type=int, default=20, help="registrations and logins (bcrypt bound)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run's numbers to --baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 if this run regresses against --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed fractional regression")
+    parser.add_argument("--output", type=Path, help="also write the results as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    exit_code = 1 if report["failures"] else 0
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report["results"], indent=2, sort_keys=True))
+        print(f"baseline written to {args.baseline}")
+    if args.check:
+        regressions = compare(report["results"], json.loads(args.baseline.read_text()), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            exit_code = 1
+        else:
+            print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Booking contention: N passengers race for the seats of one ride.
+
+Every passenger logs in first (outside the timed window), then all of them
+POST /api/bookings/ for the same ride at once. Afterwards the ride row and the
+confirmed bookings are checked against each other; any overbooking makes the
+run exit non-zero.
+
+    python -m tests.bench.booking_contention --passengers 200 --seats 20
+"""
+
+import argparse
+import asyncio
+import sys
+from collections import Counter
+
+
+async def run(args) -> bool:
+    from sqlalchemy import func, select
+
+    from tests.bench import harness
+    from backend import models
+    from backend.database import pool_stats
+
+    await harness.reset_schema()
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    passengers = await harness.seed_users("rider", args.passengers, "passenger")
+    (ride_id,) = await harness.seed_rides(driver, 1, args.seats)
+
+    recorder = harness.Recorder()
+    outcomes = Counter()
+
+    async with harness.client() as http:
+        headers = await asyncio.gather(*(harness.login(http, email) for email in passengers))
+
+        async def book(h):
+            response = await recorder.timed(
+                "POST /bookings/",
+                http.post("/api/bookings/", json={"ride_id": ride_id, "seats_booked": args.seats_per_booking}, headers=h),
+            )
+            outcomes[response.status_code] += 1
+
+        recorder = harness.Recorder()  # Start the clock after the logins
+        await asyncio.gather(*(book(h) for h in headers))
+        recorder.stop()
+
+    async with harness.AsyncSessionLocal() as session:
+        seats_left = (await session.execute(
+            select(models.Ride.seats_available).where(models.Ride.ride_id == ride_id)
+        )).scalar_one()
+        seats_booked = (await session.execute(
+            select(func.coalesce(func.sum(models.Booking.seats_booked), 0)).where(
+                models.Booking.ride_id == ride_id, models.Booking.status == "confirmed"
+            )
+        )).scalar_one()
+
+    harness.print_summary(recorder.summary())
+    print(f"outcomes: {dict(outcomes)}")
+    print(f"seats: offered={args.seats} booked={seats_booked} left={seats_left}")
+    print(f"pool: {pool_stats()}")
+
+    consistent = seats_left >= 0 and seats_booked + seats_left == args.seats and seats_booked <= args.seats
+    expected_confirmed = min(args.passengers, args.seats // args.seats_per_booking)
+    if not consistent:
+        print("FAIL: seat counts do not add up (overbooking or lost update)")
+    elif outcomes[201] != expected_confirmed:
+        print(f"FAIL: expected {expected_confirmed} confirmed bookings, got {outcomes[201]}")
+        consistent = False
+    else:
+        print("OK: no overbooking")
+    return consistent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--passengers", type=int, default=200)
+    parser.add_argument("--seats", type=int, default=20)
+    parser.add_argument("--seats-per-booking", type=int, default=1)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
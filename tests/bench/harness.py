@@ -0,0 +1,173 @@
+"""Shared plumbing for the in-process benchmarks.
+
+Importing this module points DATABASE_URL at a throwaway SQLite file (unless
+one is already set) *before* the backend is imported, so a benchmark never
+touches a real database. Requests go through httpx's ASGI transport, i.e. the
+real FastAPI app on the current event loop with no network in between.
+"""
+
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_bench_dir = tempfile.mkdtemp(prefix="carpool-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(_bench_dir, 'bench.db')}")
+os.environ.setdefault("JWT_SECRET", "bench-secret")
+os.environ.setdefault("APP_ENV", "test")  # No SQL echo; it would dominate the timings
+
+import httpx  # noqa: E402
+
+from backend import auth, models  # noqa: E402
+from backend.database import AsyncSessionLocal, Base, engine  # noqa: E402
+from backend.main import app  # noqa: E402
+
+PASSWORD = "bench-pass"
+
+# Max SQL statements per request, including the users lookup on a principal cache miss.
+# Enforced by the API suite and by the query_budget fixture in tests/conftest.py.
+QUERY_BUDGETS = {
+    "POST /auth/register": 3,
+    "POST /auth/token": 1,
+    "GET /rides/": 4,
+    "GET /rides/?view=lite": 2,
+    "GET /rides/{id}": 4,
+    "POST /bookings/": 4,
+    "GET /bookings/my-bookings": 2,
+    "GET /bookings/my-bookings?view=lite": 2,
+    "POST /bookings/{id}/cancel": 4,
+}
+
+
+async def reset_schema():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def seed_users(prefix: str, count: int, role: str) -> list:
+    """Insert `count` users sharing one precomputed hash; returns their emails."""
+    hashed = auth.get_password_hash(PASSWORD)
+    emails = [f"{prefix}{i}@pes.edu" for i in range(count)]
+    async with AsyncSessionLocal() as session:
+        session.add_all([
+            models.User(
+                name=f"{prefix} {i}",
+                email=email,
+                password=hashed,
+                phone=f"9{i:09d}",
+                srn=f"{prefix.upper()}{i:06d}",
+                role=role,
+                user_type="student",
+            )
+            for i, email in enumerate(emails)
+        ])
+        await session.commit()
+    return emails
+
+
+async def seed_rides(driver_email: str, count: int, seats: int, origin: str = "Banashankari", destination: str = "PES University") -> list:
+    """Give the driver one vehicle and `count` rides departing tomorrow; returns the ride ids."""
+    departure = (datetime.now() + timedelta(days=1)).replace(hour=7, minute=0, second=0, microsecond=0)
+    async with AsyncSessionLocal() as session:
+        driver = (await session.execute(
+            models.User.__table__.select().where(models.User.email == driver_email)
+        )).first()
+        vehicle = models.Vehicle(
+            user_id=driver.user_id,
+            model="Bench Car",
+            seat_capacity=max(seats, 4),
+            license_plate=f"BENCH-{driver.user_id}",
+        )
+        session.add(vehicle)
+        await session.flush()
+        rides = [
+            models.Ride(
+                driver_id=driver.user_id,
+                vehicle_id=vehicle.vehicle_id,
+                origin=origin,
+                destination=destination,
+                date_time=departure + timedelta(minutes=i),
+                seats_available=seats,
+                seats_total=seats,
+                price=50,
+            )
+            for i in range(count)
+        ]
+        session.add_all(rides)
+        await session.commit()
+        return [ride.ride_id for ride in rides]
+
+
+def client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+
+async def login(http: httpx.AsyncClient, email: str) -> dict:
+    response = await http.post("/api/auth/token", data={"username": email, "password": PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def query_count(response: httpx.Response) -> int:
+    """SQL statements the request ran, as reported by QueryStatsMiddleware."""
+    return int(response.headers["x-db-query-count"])
+
+
+def budget_error(name: str, response: httpx.Response):
+    """None if the request stayed within QUERY_BUDGETS[name], else a message saying by how much it didn't."""
+    ran = query_count(response)
+    if ran > QUERY_BUDGETS[name]:
+        return f"{name}: ran {ran} queries, budget is {QUERY_BUDGETS[name]}"
+    return None
+
+
+def percentile(samples: list, pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class Recorder:
+    """Collects per-name latency samples and the wall time they were taken over."""
+
+    def __init__(self):
+        self.samples = {}
+        self.started = time.perf_counter()
+        self.stopped = None
+
+    async def timed(self, name: str, coro):
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self.samples.setdefault(name, []).append(time.perf_counter() - start)
+
+    def stop(self):
+        self.stopped = time.perf_counter()
+
+    def summary(self) -> dict:
+        elapsed = (self.stopped or time.perf_counter()) - self.started
+        return {
+            name: {
+                "count": len(values),
+                "throughput_rps": len(values) / elapsed if elapsed else 0.0,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": max(values) * 1000,
+            }
+            for name, values in self.samples.items()
+        }
+
+
+def print_summary(summary: dict):
+    print(f"{'endpoint':<30}{'count':>7}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, row in summary.items():
+        print(
+            f"{name:<30}{row['count']:>7}{row['throughput_rps']:>10.1f}"
+            f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}"
+        )
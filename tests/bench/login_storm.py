@@ -0,0 +1,65 @@
+"""Login storm: bcrypt-heavy logins racing a cheap endpoint.
+
+Fires --logins token requests at --concurrency while a probe keeps hitting
+GET /api. With hashing on the event loop (--workers 0) the probe's p99 tracks
+the cost of a bcrypt call; with the worker pool it should stay near its idle
+latency.
+
+    python -m tests.bench.login_storm --workers 0
+    python -m tests.bench.login_storm --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+
+
+async def run(args):
+    from tests.bench import harness
+    from backend.auth import password_hasher
+
+    await harness.reset_schema()
+    emails = await harness.seed_users("storm", args.users, "passenger")
+    recorder = harness.Recorder()
+    storm_done = asyncio.Event()
+
+    async with harness.client() as http:
+        slots = asyncio.Semaphore(args.concurrency)
+
+        async def one_login(i):
+            async with slots:
+                await recorder.timed("POST /auth/token", harness.login(http, emails[i % len(emails)]))
+
+        async def probe():
+            while not storm_done.is_set():
+                await recorder.timed("GET /api (probe)", http.get("/api"))
+                await asyncio.sleep(args.probe_interval / 1000)
+
+        probe_task = asyncio.create_task(probe())
+        await asyncio.gather(*(one_login(i) for i in range(args.logins)))
+        storm_done.set()
+        await probe_task
+        recorder.stop()
+
+    print(f"password hash workers: {password_hasher.workers}, logins: {args.logins}, concurrency: {args.concurrency}")
+    harness.print_summary(recorder.summary())
+    print("hasher:", password_hasher.stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=None, help="overrides PASSWORD_HASH_WORKERS")
+    parser.add_argument("--probe-interval", type=float, default=5.0, help="milliseconds between probe requests")
+    args = parser.parse_args()
+
+    # Must be set before backend.auth is imported, since the pool is built at import time
+    if args.workers is not None:
+        os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
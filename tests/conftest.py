@@ -0,0 +1,53 @@
+"""Fixtures for the API tests.
+
+The tests reuse the benchmark harness: importing it points DATABASE_URL at a
+throwaway SQLite file before the backend is imported, and its client talks to
+the real app through httpx's ASGI transport. Every test starts from an empty
+schema and empty in-process caches.
+"""
+
+import pytest
+
+from tests.bench import harness
+from backend import auth
+from backend.database import engine, read_engine
+from backend.geo import KM_PER_DEGREE_LAT, RideGrid, geo_index
+from backend.search_cache import search_cache
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _reset_process_state():
+    search_cache.clear()
+    auth.principal_cache.clear()
+    geo_index.grid = RideGrid(geo_index.grid.cell_deg * KM_PER_DEGREE_LAT)
+    geo_index._max_ride_id = 0
+    geo_index._refreshed_at = None
+
+
+@pytest.fixture
+async def http():
+    """An httpx client on the app, over a freshly created schema."""
+    await harness.reset_schema()
+    _reset_process_state()
+    async with harness.client() as client:
+        yield client
+    # Pooled aiosqlite connections belong to this test's event loop
+    await engine.dispose()
+    await read_engine.dispose()
+
+
+@pytest.fixture
+def query_budget():
+    """Assert a response ran no more SQL than its harness.QUERY_BUDGETS entry.
+
+        query_budget("GET /rides/{id}", response)
+    """
+    def check(name: str, response):
+        assert response.status_code < 300, response.text
+        error = harness.budget_error(name, response)
+        assert error is None, error
+    return check
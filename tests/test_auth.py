@@ -0,0 +1,83 @@
+"""Registration roles, the admin gate, and principal cache invalidation."""
+
+import pytest
+from sqlalchemy.future import select
+
+from tests.bench import harness
+from backend import auth, models
+from backend.database import AsyncSessionLocal
+
+pytestmark = pytest.mark.anyio
+
+
+def registration(role: str) -> dict:
+    return {
+        "name": "New User", "email": "new@pes.edu", "password": harness.PASSWORD,
+        "phone": "8000000000", "srn": "NEW000000", "role": role, "user_type": "student",
+    }
+
+
+@pytest.mark.parametrize("role", ["admin", "Admin", "superuser"])
+async def test_register_rejects_roles_other_than_driver_and_passenger(http, role):
+    response = await http.post("/api/auth/register", json=registration(role))
+    assert response.status_code == 422
+    response = await http.post("/api/auth/token", data={"username": "new@pes.edu", "password": harness.PASSWORD})
+    assert response.status_code == 401
+
+
+async def test_admin_endpoints_need_a_database_granted_admin(http):
+    response = await http.post("/api/auth/register", json=registration("passenger"))
+    assert response.status_code == 200
+    headers = await harness.login(http, "new@pes.edu")
+    assert (await http.get("/api/admin/metrics", headers=headers)).status_code == 403
+
+    (admin,) = await harness.seed_users("admin", 1, "admin")
+    headers = await harness.login(http, admin)
+    assert (await http.get("/api/admin/metrics", headers=headers)).status_code == 200
+
+
+async def user_and_principal(http, role: str = "passenger"):
+    (email,) = await harness.seed_users("user", 1, role)
+    headers = await harness.login(http, email)
+    # Any authenticated request leaves the principal cached
+    assert (await http.get("/api/bookings/my-bookings", headers=headers)).status_code == 200
+    async with AsyncSessionLocal() as db:
+        user = (await db.execute(select(models.User).where(models.User.email == email))).scalars().one()
+    assert auth.principal_cache.get(user.user_id) is not None
+    return user.user_id, headers
+
+
+async def test_a_role_change_drops_the_cached_principal_even_if_re_cached_before_commit(http):
+    user_id, headers = await user_and_principal(http)
+    stale = auth.principal_cache.get(user_id)
+    async with AsyncSessionLocal() as db:
+        user = await db.get(models.User, user_id)
+        user.role = "admin"
+        await db.flush()
+        assert auth.principal_cache.get(user_id) is None
+        # A request reading the user before the commit still sees the old row
+        auth.principal_cache.set(user_id, stale)
+        await db.commit()
+    assert auth.principal_cache.get(user_id) is None
+    assert (await http.get("/api/admin/metrics", headers=headers)).status_code == 200
+
+
+async def test_a_rolled_back_role_change_leaves_the_old_principal(http):
+    user_id, headers = await user_and_principal(http)
+    async with AsyncSessionLocal() as db:
+        user = await db.get(models.User, user_id)
+        user.role = "admin"
+        await db.flush()
+        await db.rollback()
+        assert "changed_principals" not in db.info
+    assert (await http.get("/api/admin/metrics", headers=headers)).status_code == 403
+    assert auth.principal_cache.get(user_id).role == "passenger"
+
+
+async def test_deleting_a_user_drops_the_cached_principal(http):
+    user_id, headers = await user_and_principal(http)
+    async with AsyncSessionLocal() as db:
+        await db.delete(await db.get(models.User, user_id))
+        await db.commit()
+    assert auth.principal_cache.get(user_id) is None
+    assert (await http.get("/api/bookings/my-bookings", headers=headers)).status_code == 401
@@ -0,0 +1,27 @@
+"""Conditional ride reads: ETags from the ride version, 304 until the seats change."""
+
+import pytest
+
+from tests.bench import harness
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_ride_details_revalidate_until_the_seats_change(http):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    (ride_id,) = await harness.seed_rides(driver, 1, seats=4)
+    (rider,) = await harness.seed_users("rider", 1, "passenger")
+    headers = await harness.login(http, rider)
+
+    first = await http.get(f"/api/rides/{ride_id}", headers=headers)
+    etag = first.headers["etag"]
+    response = await http.get(f"/api/rides/{ride_id}", headers={**headers, "If-None-Match": etag})
+    assert (response.status_code, response.content, response.headers["etag"]) == (304, b"", etag)
+    response = await http.get(f"/api/rides/{ride_id}", headers={**headers, "If-None-Match": '"other", ' + etag})
+    assert response.status_code == 304
+
+    await http.post("/api/bookings/", headers=headers, json={"ride_id": ride_id, "seats_booked": 1})
+    response = await http.get(f"/api/rides/{ride_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["seats_available"] == 3
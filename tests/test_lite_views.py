@@ -0,0 +1,55 @@
+"""view=lite: a projection of the full items, read in one joined query."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.bench import harness
+
+pytestmark = pytest.mark.anyio
+
+RIDE_DATE = (datetime.now() + timedelta(days=1)).date().isoformat()
+
+
+def assert_projection(lite: dict, full: dict, path: str = ""):
+    """Every field of `lite` is in `full` with the same value, nested objects included."""
+    for key, value in lite.items():
+        assert key in full, f"{path}{key} is not in the full view"
+        if isinstance(value, dict):
+            assert_projection(value, full[key], f"{path}{key}.")
+        else:
+            assert value == full[key], f"{path}{key}: {value!r} != {full[key]!r}"
+
+
+async def test_lite_views_project_the_full_items_in_one_query(http, query_budget):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    ride_ids = await harness.seed_rides(driver, 3, seats=4)
+    (rider,) = await harness.seed_users("rider", 1, "passenger")
+    headers = await harness.login(http, rider)
+    for ride_id in ride_ids[:2]:
+        await http.post("/api/bookings/", headers=headers, json={"ride_id": ride_id, "seats_booked": 1})
+    search = {"origin": "bana", "destination": "pes", "ride_date": RIDE_DATE}
+
+    # Full views first; they also leave the caller's principal cached
+    full_rides = (await http.get("/api/rides/", headers=headers, params=search)).json()["items"]
+    full_bookings = (await http.get("/api/bookings/my-bookings", headers=headers)).json()["items"]
+
+    response = await http.get("/api/rides/", headers=headers, params={**search, "view": "lite"})
+    query_budget("GET /rides/?view=lite", response)
+    assert harness.query_count(response) == 1
+    lite_rides = response.json()["items"]
+    assert set(lite_rides[0]) == {
+        "ride_id", "origin", "destination", "date_time", "seats_available", "price", "driver", "vehicle",
+    }
+    assert [ride["ride_id"] for ride in lite_rides] == [ride["ride_id"] for ride in full_rides] == ride_ids
+    for lite, full in zip(lite_rides, full_rides):
+        assert_projection(lite, full)
+
+    response = await http.get("/api/bookings/my-bookings", headers=headers, params={"view": "lite"})
+    query_budget("GET /bookings/my-bookings?view=lite", response)
+    assert harness.query_count(response) == 1
+    lite_bookings = response.json()["items"]
+    assert set(lite_bookings[0]) == {"booking_id", "ride_id", "seats_booked", "status", "ride"}
+    assert len(lite_bookings) == len(full_bookings) == 2
+    for lite, full in zip(lite_bookings, full_bookings):
+        assert_projection(lite, full)
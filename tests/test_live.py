@@ -0,0 +1,83 @@
+"""Live seat streams: single-purpose stream tokens, prefix route topics, and segment events."""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+from tests.bench import harness
+from backend.auth import Principal, create_scoped_token
+from backend.live import LIVE_TOKEN_SCOPE, publish_seat_change, ride_topic, route_topic, seat_broker
+from tests.test_segments import post_ride
+
+pytestmark = pytest.mark.anyio
+
+DAY = (datetime.now() + timedelta(days=1)).date()
+
+
+def drain(subscriber) -> list:
+    events = []
+    while not subscriber.queue.empty():
+        frame = subscriber.queue.get_nowait()
+        events.append(orjson.loads(frame.split(b"data: ", 1)[1]))
+    return events
+
+
+def ride_on(ride_id: int, origin_key: str, destination_key: str):
+    return SimpleNamespace(
+        ride_id=ride_id, origin_key=origin_key, destination_key=destination_key,
+        date_time=datetime.combine(DAY, datetime.min.time()),
+    )
+
+
+async def test_the_stream_accepts_only_unexpired_stream_tokens(http):
+    (rider,) = await harness.seed_users("rider", 1, "passenger")
+    headers = await harness.login(http, rider)
+    login_token = headers["Authorization"].split()[1]
+
+    response = await http.post("/api/live/token", headers=headers)
+    assert response.status_code == 200
+    stream_token = response.json()["token"]
+
+    # Valid token, no topics: rejected after authentication, before streaming
+    response = await http.get("/api/live/seats", params={"token": stream_token})
+    assert response.status_code == 400
+
+    principal = Principal(user_id=1, name="", email=rider, phone="", srn="", role="passenger", user_type="")
+    for token in (login_token, "garbage", create_scoped_token(principal, LIVE_TOKEN_SCOPE, -1)):
+        response = await http.get("/api/live/seats", params={"token": token, "ride_id": 1})
+        assert response.status_code == 401
+
+    # A stream token opens the stream and nothing else
+    response = await http.get("/api/auth/me", headers={"Authorization": f"Bearer {stream_token}"})
+    assert response.status_code == 401
+
+
+async def test_route_topics_match_rides_by_prefix_like_search():
+    subscriber = seat_broker.subscribe([route_topic("bana", "pes", DAY)])
+    try:
+        publish_seat_change(ride_on(1, "banashankari", "pes university"), -1)
+        publish_seat_change(ride_on(2, "jayanagar", "pes university"), -1)
+        publish_seat_change(ride_on(3, "banashankari", "majestic"), -1)
+        assert [event["ride_id"] for event in drain(subscriber)] == [1]
+    finally:
+        seat_broker.unsubscribe(subscriber)
+    assert seat_broker.route_topics("banashankari", "pes university", DAY) == []
+
+
+async def test_segment_events_carry_the_rides_seat_count(http):
+    _, ride = await post_ride(http)
+    (rider,) = await harness.seed_users("rider", 1, "passenger")
+    headers = await harness.login(http, rider)
+
+    subscriber = seat_broker.subscribe([ride_topic(ride["ride_id"])])
+    try:
+        booking = (await http.post("/api/bookings/", headers=headers, json={
+            "ride_id": ride["ride_id"], "seats_booked": 2, "from_stop": 1, "to_stop": 2,
+        })).json()
+        await http.post(f"/api/bookings/{booking['booking_id']}/cancel", headers=headers)
+        events = drain(subscriber)
+    finally:
+        seat_broker.unsubscribe(subscriber)
+    assert [(e["delta"], e["seats_available"], e["from_stop"]) for e in events] == [(-2, 1, 1), (2, 3, 1)]
@@ -0,0 +1,77 @@
+"""Commute matching: who is left out of a run, and which rides it may fill."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.bench import harness
+
+pytestmark = pytest.mark.anyio
+
+# harness.seed_rides departs tomorrow from 07:00, one minute apart
+TOMORROW = (datetime.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def at(hhmm: str) -> str:
+    return TOMORROW.replace(hour=int(hhmm[:2]), minute=int(hhmm[3:])).isoformat()
+
+
+async def file_request(http, headers, earliest: str = "06:30", latest: str = "07:30", seats: int = 1) -> int:
+    response = await http.post("/api/bookings/trip-requests", headers=headers, json={
+        "origin": "Banashankari", "destination": "PES University",
+        "earliest_departure": at(earliest), "latest_departure": at(latest), "seats_requested": seats,
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["trip_request_id"]
+
+
+async def run_matching(http) -> dict:
+    (admin,) = await harness.seed_users("admin", 1, "admin")
+    response = await http.post("/api/admin/matching/run", headers=await harness.login(http, admin), params={
+        "start": at("06:00"), "end": at("09:00"),
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def statuses(http, headers) -> list:
+    requests = (await http.get("/api/bookings/trip-requests/my-requests", headers=headers)).json()
+    return [r["status"] for r in sorted(requests, key=lambda r: r["trip_request_id"])]
+
+
+async def test_matching_skips_passengers_already_travelling_in_the_window(http):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    ride_ids = await harness.seed_rides(driver, 2, seats=4)
+    booked, free, twice = [await harness.login(http, email) for email in await harness.seed_users("rider", 3, "passenger")]
+
+    response = await http.post("/api/bookings/", headers=booked, json={"ride_id": ride_ids[0], "seats_booked": 1})
+    assert response.status_code == 201
+    await file_request(http, booked)
+    await file_request(http, free)
+    await file_request(http, twice)
+    await file_request(http, twice, earliest="07:00", latest="08:00")
+
+    result = await run_matching(http)
+    assert (result["requests"], result["matched"]) == (4, 2)
+    assert await statuses(http, booked) == ["pending"]
+    assert await statuses(http, free) == ["matched"]
+    assert await statuses(http, twice) == ["matched", "pending"]
+    history = (await http.get("/api/bookings/my-bookings", headers=booked)).json()["items"]
+    assert len(history) == 1
+
+
+async def test_matching_leaves_seats_on_waitlisted_rides_to_the_waitlist(http):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    (ride_id,) = await harness.seed_rides(driver, 1, seats=3)
+    booked, waiting, requester = [await harness.login(http, email) for email in await harness.seed_users("rider", 3, "passenger")]
+
+    await http.post("/api/bookings/", headers=booked, json={"ride_id": ride_id, "seats_booked": 2})
+    response = await http.post("/api/bookings/waitlist", headers=waiting, json={"ride_id": ride_id, "seats_requested": 2})
+    assert response.status_code == 201
+    await file_request(http, requester)
+
+    result = await run_matching(http)
+    assert (result["rides"], result["matched"]) == (0, 0)
+    assert await statuses(http, requester) == ["pending"]
+    ride = (await http.get(f"/api/rides/{ride_id}", headers=requester)).json()
+    assert ride["seats_available"] == 1
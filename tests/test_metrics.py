@@ -0,0 +1,53 @@
+"""/metrics: request counters, latency histograms and pool gauges, labelled by route template."""
+
+import pytest
+
+from tests.bench import harness
+
+pytestmark = pytest.mark.anyio
+
+RIDE_ROUTE = 'method="GET",route="/api/rides/{ride_id}"'
+
+
+async def scrape(http) -> dict:
+    """Sample lines of /metrics as {'name{labels}': value}."""
+    response = await http.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in response.text.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            samples[name] = float(value)
+    return samples
+
+
+async def test_requests_are_counted_and_timed_per_route_template(http):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    ride_ids = await harness.seed_rides(driver, 2, seats=4)
+    headers = await harness.login(http, driver)
+    before = await scrape(http)
+
+    for ride_id in ride_ids:
+        assert (await http.get(f"/api/rides/{ride_id}", headers=headers)).status_code == 200
+    assert (await http.get("/api/no-such-thing")).status_code == 404
+    after = await scrape(http)
+
+    counter = f'http_requests_total{{{RIDE_ROUTE},status="200"}}'
+    assert after[counter] - before.get(counter, 0) == 2
+    latency = f"http_request_duration_seconds_count{{{RIDE_ROUTE}}}"
+    assert after[latency] - before.get(latency, 0) == 2
+    assert after[f'http_request_duration_seconds_bucket{{{RIDE_ROUTE},le="+Inf"}}'] == after[latency]
+    assert f"http_request_db_queries_count{{{RIDE_ROUTE}}}" in after
+    unmatched = 'http_requests_total{method="GET",route="unmatched",status="404"}'
+    assert after[unmatched] - before.get(unmatched, 0) == 1
+
+    # Route templates only: no label carries a raw path
+    for ride_id in ride_ids:
+        assert not [name for name in after if f"/api/rides/{ride_id}" in name]
+    assert not [name for name in after if "no-such-thing" in name]
+
+    for engine in ("primary", "read"):
+        for metric in ("db_pool_checked_out", "db_pool_overflow", "db_pool_checkouts"):
+            assert f'{metric}{{engine="{engine}"}}' in after
+    assert after['http_requests_in_flight{method="GET"}'] == 1  # The scrape itself
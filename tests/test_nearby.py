@@ -0,0 +1,127 @@
+"""Radius search: the grid finds rides within radius_km of both ends, nearest first, paged by rank."""
+
+import math
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from tests.bench import harness
+from tests.test_rides import driver_with_vehicle, offer
+from backend.geo import KM_PER_DEGREE_LAT, GeoRide, RideGrid
+
+pytestmark = pytest.mark.anyio
+
+DEPARTURE = (datetime.now() + timedelta(days=1)).replace(hour=6, minute=0, second=0, microsecond=0)
+PICKUP = (12.9350, 77.5350)
+DROP = (12.9716, 77.5946)
+
+
+def north_of(point, km: float):
+    return (point[0] + km / KM_PER_DEGREE_LAT, point[1])
+
+
+async def post_rides(http, pickups: list, drops: list = None) -> list:
+    """Bulk post one ride per pickup (to DROP unless given), a minute apart; returns the ride ids."""
+    headers, vehicle_id = await driver_with_vehicle(http)
+    drops = drops or [DROP] * len(pickups)
+    rides = [
+        offer(vehicle_id, DEPARTURE + timedelta(minutes=i), origin_lat=pickup[0], origin_lng=pickup[1],
+              destination_lat=drop[0], destination_lng=drop[1])
+        for i, (pickup, drop) in enumerate(zip(pickups, drops))
+    ]
+    response = await http.post("/api/rides/bulk", headers=headers, json={"rides": rides})
+    assert response.json()["failed"] == 0, response.text
+    return [item["ride_id"] for item in response.json()["results"]]
+
+
+async def search(http, headers, radius_km: float = 3, **params) -> dict:
+    response = await http.get("/api/rides/", headers=headers, params={
+        "ride_date": DEPARTURE.date().isoformat(),
+        "origin_lat": PICKUP[0], "origin_lng": PICKUP[1], "destination_lat": DROP[0], "destination_lng": DROP[1],
+        "radius_km": radius_km, **params,
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+async def rider(http) -> dict:
+    (email,) = await harness.seed_users("rider", 1, "passenger")
+    return await harness.login(http, email)
+
+
+async def test_only_rides_within_the_radius_of_both_ends_come_back_nearest_first(http):
+    near, far, mid, edge, far_drop = await post_rides(
+        http,
+        [north_of(PICKUP, 0.5), north_of(PICKUP, 3.5), north_of(PICKUP, 1.5), north_of(PICKUP, 2.9), PICKUP],
+        [DROP, DROP, north_of(DROP, 1), DROP, north_of(DROP, 4)],
+    )
+    items = (await search(http, await rider(http)))["items"]
+    assert [item["ride_id"] for item in items] == [near, mid, edge]
+    scores = [item["pickup_distance_km"] + item["drop_distance_km"] for item in items]
+    assert scores == sorted(scores)
+    assert items[0]["pickup_distance_km"] == pytest.approx(0.5, abs=0.01)
+    assert items[1]["drop_distance_km"] == pytest.approx(1.0, abs=0.01)
+    assert far not in [item["ride_id"] for item in items] and far_drop not in [item["ride_id"] for item in items]
+
+
+async def test_cursors_page_through_the_ranking_without_gaps_or_repeats(http):
+    # Pairs at equal distances, so ties are broken by ride_id across page boundaries
+    pickups = [north_of(PICKUP, km) for km in (0.2, 0.2, 0.8, 1.1, 1.1, 1.1, 2.0)]
+    ride_ids = await post_rides(http, pickups)
+    headers = await rider(http)
+    expected = [item["ride_id"] for item in (await search(http, headers))["items"]]
+    assert sorted(expected) == sorted(ride_ids)
+
+    seen, cursor = [], None
+    while True:
+        page = await search(http, headers, limit=2, **({"cursor": cursor} if cursor else {}))
+        seen += [item["ride_id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == expected
+
+
+async def test_the_lite_view_returns_the_same_rides_with_distances(http):
+    await post_rides(http, [north_of(PICKUP, km) for km in (1.0, 0.3, 2.0)])
+    headers = await rider(http)
+    full = (await search(http, headers))["items"]
+    lite = (await search(http, headers, view="lite"))["items"]
+    assert [item["ride_id"] for item in lite] == [item["ride_id"] for item in full]
+    assert set(lite[0]) == {
+        "ride_id", "origin", "destination", "date_time", "seats_available", "price",
+        "driver", "vehicle", "pickup_distance_km", "drop_distance_km",
+    }
+    assert [item["pickup_distance_km"] for item in lite] == [item["pickup_distance_km"] for item in full]
+
+
+def grid_ride(ride_id: int, lat: float, lng: float) -> GeoRide:
+    return GeoRide(ride_id, date(2030, 1, 1), lat, lng, 0.0, 0.0)
+
+
+def test_rides_in_neighbouring_cells_and_on_cell_edges_are_found():
+    grid = RideGrid(cell_km=2)
+    edge = grid.cell_deg * 6418  # Exactly on a cell boundary, near 12.9 N
+    grid.add(grid_ride(1, edge, 77.5))
+    grid.add(grid_ride(2, edge - 1e-9, 77.5))  # Last point of the cell below
+    grid.add(grid_ride(3, edge + 2.5 / KM_PER_DEGREE_LAT, 77.5))  # Two cells up
+    grid.add(grid_ride(4, edge + 3.5 / KM_PER_DEGREE_LAT, 77.5))  # Outside the radius
+
+    found = grid.search(date(2030, 1, 1), (edge, 77.5), (0.0, 0.0), radius_km=3)
+    assert [match.ride_id for match in found] == [1, 2, 3]
+    # The same spot on another day is another bucket
+    grid.add(GeoRide(5, date(2030, 1, 2), edge, 77.5, 0.0, 0.0))
+    found = grid.search(date(2030, 1, 1), (edge, 77.5), (0.0, 0.0), radius_km=3)
+    assert [match.ride_id for match in found] == [1, 2, 3]
+
+
+def test_a_search_straddling_the_equator_and_the_prime_meridian_finds_every_side():
+    # Cells are floored, so negative coordinates must not shift the bounding box
+    grid = RideGrid(cell_km=2)
+    corners = [(0.005, 0.005), (-0.005, 0.005), (0.005, -0.005), (-0.005, -0.005)]
+    for ride_id, (lat, lng) in enumerate(corners, start=1):
+        grid.add(GeoRide(ride_id, date(2030, 1, 1), lat, lng, lat, lng))
+    found = grid.search(date(2030, 1, 1), (0.0, 0.0), (0.0, 0.0), radius_km=1)
+    assert sorted(match.ride_id for match in found) == [1, 2, 3, 4]
+    expected = math.hypot(0.005 * KM_PER_DEGREE_LAT, 0.005 * KM_PER_DEGREE_LAT)
+    assert all(match.pickup_km == pytest.approx(expected, rel=1e-3) for match in found)
@@ -0,0 +1,70 @@
+"""Keyset pagination: pages chain through next_cursor, and bad cursors are a 400."""
+
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.bench import harness
+
+pytestmark = pytest.mark.anyio
+
+RIDE_DATE = (datetime.now() + timedelta(days=1)).date().isoformat()
+
+
+def forged(*values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode()).decode().rstrip("=")
+
+
+BAD_TIME_CURSORS = [
+    "not-base64!", forged(1, 2), forged("garbage", 1), forged(None, 1),
+    forged("2026-10-18T07:00:00", "1"), forged("2026-10-18T07:00:00", True), forged("2026-10-18T07:00:00"),
+]
+
+
+async def test_search_pages_chain_in_departure_order(http):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    (rider,) = await harness.seed_users("rider", 1, "passenger")
+    ride_ids = await harness.seed_rides(driver, 5, seats=2)
+    headers = await harness.login(http, rider)
+
+    seen, cursor = [], None
+    while True:
+        params = {"origin": "bana", "destination": "pes", "ride_date": RIDE_DATE, "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = (await http.get("/api/rides/", headers=headers, params=params)).json()
+        seen += [ride["ride_id"] for ride in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ride_ids
+
+
+@pytest.mark.parametrize("cursor", BAD_TIME_CURSORS + [forged("2026-10-18T07:00:00", 1, "fuzzy")])
+async def test_search_rejects_malformed_cursors(http, cursor):
+    (rider,) = await harness.seed_users("rider", 1, "passenger")
+    headers = await harness.login(http, rider)
+    response = await http.get("/api/rides/", headers=headers, params={
+        "origin": "bana", "destination": "pes", "ride_date": RIDE_DATE, "cursor": cursor,
+    })
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid pagination cursor"
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", forged("1"), forged(None), forged(True), forged(1, 2)])
+async def test_booking_history_rejects_malformed_cursors(http, cursor):
+    (rider,) = await harness.seed_users("rider", 1, "passenger")
+    headers = await harness.login(http, rider)
+    response = await http.get("/api/bookings/my-bookings", headers=headers, params={"cursor": cursor})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", BAD_TIME_CURSORS)
+async def test_driver_manifest_rejects_malformed_cursors(http, cursor):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    headers = await harness.login(http, driver)
+    response = await http.get("/api/rides/driver/my-rides", headers=headers, params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid pagination cursor"
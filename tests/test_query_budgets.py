@@ -0,0 +1,45 @@
+"""Every budgeted endpoint, once, against harness.QUERY_BUDGETS."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.bench import harness
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_passenger_flow_stays_within_query_budgets(http, query_budget):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    (rider,) = await harness.seed_users("rider", 1, "passenger")
+    ride_ids = await harness.seed_rides(driver, 3, seats=4)
+    ride_date = (datetime.now() + timedelta(days=1)).date().isoformat()
+
+    response = await http.post("/api/auth/register", json={
+        "name": "New Rider", "email": "new@pes.edu", "password": harness.PASSWORD,
+        "phone": "8000000000", "srn": "NEW000000", "role": "passenger", "user_type": "student",
+    })
+    query_budget("POST /auth/register", response)
+
+    response = await http.post("/api/auth/token", data={"username": rider, "password": harness.PASSWORD})
+    query_budget("POST /auth/token", response)
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = await http.get("/api/rides/", headers=headers, params={
+        "origin": "bana", "destination": "pes", "ride_date": ride_date,
+    })
+    query_budget("GET /rides/", response)
+    assert [ride["ride_id"] for ride in response.json()["items"]] == ride_ids
+
+    response = await http.get(f"/api/rides/{ride_ids[0]}", headers=headers)
+    query_budget("GET /rides/{id}", response)
+
+    response = await http.post("/api/bookings/", headers=headers, json={"ride_id": ride_ids[0], "seats_booked": 2})
+    query_budget("POST /bookings/", response)
+    booking_id = response.json()["booking_id"]
+
+    response = await http.get("/api/bookings/my-bookings", headers=headers)
+    query_budget("GET /bookings/my-bookings", response)
+
+    response = await http.post(f"/api/bookings/{booking_id}/cancel", headers=headers)
+    query_budget("POST /bookings/{id}/cancel", response)
@@ -0,0 +1,75 @@
+"""Read routing: replica by default, the primary inside a read-your-writes window or when the replica is down."""
+
+import os
+import tempfile
+
+import pytest
+
+from tests.bench import harness
+from backend import database
+from backend.database import Base, build_engine, engine_settings, pool_stats
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def replica(monkeypatch):
+    """A second SQLite file with the schema but none of the primary's rows: a replica lagging far behind."""
+    path = os.path.join(tempfile.mkdtemp(prefix="carpool-replica-"), "replica.db")
+    replica_engine = build_engine(f"sqlite+aiosqlite:///{path}", engine_settings(), isolation_level="AUTOCOMMIT")
+    async with replica_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    monkeypatch.setattr(database, "replica_engine", replica_engine)
+    monkeypatch.setattr(database, "_replica_down_until", 0.0)
+    yield replica_engine
+    await replica_engine.dispose()
+
+
+async def test_a_write_sends_the_writers_next_reads_to_the_primary(http, replica):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    (ride_id,) = await harness.seed_rides(driver, 1, seats=4)
+    (rider,) = await harness.seed_users("rider", 1, "passenger")
+    headers = await harness.login(http, rider)
+
+    # The replica hasn't seen the ride yet
+    assert (await http.get(f"/api/rides/{ride_id}", headers=headers)).status_code == 404
+
+    response = await http.post("/api/bookings/", headers=headers, json={"ride_id": ride_id, "seats_booked": 1})
+    assert response.status_code == 201
+    assert database.READ_YOUR_WRITES_COOKIE in response.cookies
+    assert (await http.get(f"/api/rides/{ride_id}", headers=headers)).status_code == 200
+    assert len((await http.get("/api/bookings/my-bookings", headers=headers)).json()["items"]) == 1
+
+    # Without the cookie the same user is back on the replica
+    http.cookies.clear()
+    assert (await http.get(f"/api/rides/{ride_id}", headers=headers)).status_code == 404
+
+
+async def test_a_write_with_a_cached_principal_never_checks_out_a_replica_connection(http, replica):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    ride_ids = await harness.seed_rides(driver, 2, seats=4)
+    (rider,) = await harness.seed_users("rider", 1, "passenger")
+    headers = await harness.login(http, rider)
+    await http.post("/api/bookings/", headers=headers, json={"ride_id": ride_ids[0], "seats_booked": 1})
+    http.cookies.clear()
+
+    checkouts = pool_stats(replica)["checkouts"]
+    response = await http.post("/api/bookings/", headers=headers, json={"ride_id": ride_ids[1], "seats_booked": 1})
+    assert response.status_code == 201
+    assert pool_stats(replica)["checkouts"] == checkouts
+
+
+async def test_an_unreachable_replica_falls_back_to_the_primary(http, monkeypatch):
+    missing = os.path.join(tempfile.mkdtemp(prefix="carpool-replica-"), "gone", "replica.db")
+    unreachable = build_engine(f"sqlite+aiosqlite:///{missing}", engine_settings(), isolation_level="AUTOCOMMIT")
+    monkeypatch.setattr(database, "replica_engine", unreachable)
+    monkeypatch.setattr(database, "_replica_down_until", 0.0)
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    (ride_id,) = await harness.seed_rides(driver, 1, seats=4)
+    (rider,) = await harness.seed_users("rider", 1, "passenger")
+    headers = await harness.login(http, rider)
+
+    response = await http.get(f"/api/rides/{ride_id}", headers=headers)
+    assert response.status_code == 200
+    assert not database.replica_available()
+    await unreachable.dispose()
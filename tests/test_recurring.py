@@ -0,0 +1,63 @@
+"""Recurring templates: rides generated on creation and by the top-up job."""
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+
+from tests.bench import harness
+from backend import models, recurring
+from backend.database import AsyncSessionLocal
+
+pytestmark = pytest.mark.anyio
+
+
+async def post_template(http, prefix: str) -> dict:
+    (driver,) = await harness.seed_users(prefix, 1, "driver")
+    headers = await harness.login(http, driver)
+    vehicle = (await http.post("/api/rides/vehicles", headers=headers, json={
+        "model": "Swift", "seat_capacity": 4, "license_plate": f"KA-{prefix}",
+    })).json()
+    response = await http.post("/api/rides/templates", headers=headers, json={
+        "vehicle_id": vehicle["vehicle_id"], "origin": "Banashankari", "destination": "PES University",
+        "weekdays": list(range(7)), "departure_time": "23:59:00", "seats_available": 3, "price": 50,
+    })
+    assert response.status_code == 201, response.text
+    return response.json()
+
+
+async def template_rides() -> dict:
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(
+            select(models.Ride.template_id, func.count(models.Ride.ride_id)).group_by(models.Ride.template_id)
+        )
+        return dict(rows.all())
+
+
+async def test_a_template_generates_its_window_right_away(http):
+    template = await post_template(http, "driver")
+    # Daily at 23:59: the RECURRING_WINDOW_DAYS after today, and today unless that has passed
+    assert template["rides_created"] in (recurring.RECURRING_WINDOW_DAYS, recurring.RECURRING_WINDOW_DAYS + 1)
+    assert await template_rides() == {template["template_id"]: template["rides_created"]}
+
+
+async def test_one_failing_template_does_not_stop_the_top_up(http, monkeypatch):
+    broken, healthy = await post_template(http, "broken"), await post_template(http, "healthy")
+    before = await template_rides()
+    generate = recurring.generate_template_rides
+
+    async def fail_after_inserting(db, template_id, today=None):
+        created = await generate(db, template_id, today)
+        if template_id == broken["template_id"]:
+            raise IntegrityError("INSERT INTO rides", {}, Exception("duplicate entry"))
+        return created
+
+    monkeypatch.setattr(recurring, "generate_template_rides", fail_after_inserting)
+    created, failed = await recurring.top_up_all(AsyncSessionLocal, today=date.today() + timedelta(days=7))
+    assert (created, failed) == (7, 1)
+
+    after = await template_rides()
+    assert after[broken["template_id"]] == before[broken["template_id"]]
+    assert after[healthy["template_id"]] == before[healthy["template_id"]] + 7
@@ -0,0 +1,118 @@
+"""Ride posting: one-off rides, bulk posts and the one-ride-per-departure rule."""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from tests.bench import harness
+from backend import models
+from backend.database import AsyncSessionLocal
+
+pytestmark = pytest.mark.anyio
+
+DEPARTURE = (datetime.now() + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
+
+
+async def driver_with_vehicle(http, prefix: str = "driver"):
+    (driver,) = await harness.seed_users(prefix, 1, "driver")
+    headers = await harness.login(http, driver)
+    vehicle = (await http.post("/api/rides/vehicles", headers=headers, json={
+        "model": "Swift", "seat_capacity": 4, "license_plate": f"KA-{prefix}",
+    })).json()
+    return headers, vehicle["vehicle_id"]
+
+
+def offer(vehicle_id: int, departure: datetime, **extra) -> dict:
+    return {
+        "vehicle_id": vehicle_id, "origin": "Banashankari", "destination": "PES University",
+        "date_time": departure.isoformat(), "seats_available": 3, "price": 50, **extra,
+    }
+
+
+async def ride_count() -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(func.count(models.Ride.ride_id)))).scalar()
+
+
+async def test_a_driver_cannot_post_two_rides_at_the_same_time(http):
+    headers, vehicle_id = await driver_with_vehicle(http)
+    response = await http.post("/api/rides", headers=headers, json=offer(vehicle_id, DEPARTURE))
+    assert response.status_code == 201
+    # Sub-second differences are the same departure once stored
+    response = await http.post("/api/rides", headers=headers, json=offer(vehicle_id, DEPARTURE.replace(microsecond=5)))
+    assert response.status_code == 409
+    assert await ride_count() == 1
+
+
+async def test_bulk_reports_clashes_and_returns_the_inserted_ids(http):
+    headers, vehicle_id = await driver_with_vehicle(http)
+    await http.post("/api/rides", headers=headers, json=offer(vehicle_id, DEPARTURE))
+
+    rides = [offer(vehicle_id, DEPARTURE + timedelta(days=i), price=50 + i) for i in range(4)]
+    rides.append(offer(vehicle_id, DEPARTURE + timedelta(days=1)))  # Same time as rides[1]
+    rides.append(offer(vehicle_id + 99, DEPARTURE + timedelta(days=9)))  # Not this driver's vehicle
+    response = await http.post("/api/rides/bulk", headers=headers, json={"rides": rides})
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["created"], result["failed"]) == (3, 3)
+    errors = [item["error"] for item in result["results"]]
+    assert errors[0] == errors[4] == "Driver already has a ride departing at this time"
+    assert errors[5].startswith("Vehicle not found")
+
+    for index in (1, 2, 3):
+        ride = (await http.get(f"/api/rides/{result['results'][index]['ride_id']}", headers=headers)).json()
+        assert ride["price"] == 50 + index
+        assert ride["date_time"] == rides[index]["date_time"]
+
+    async with AsyncSessionLocal() as db:
+        offered = (await db.execute(select(func.sum(models.DailyRouteRollup.rides_offered)))).scalar()
+    assert offered == 4
+
+
+async def test_concurrent_bulk_posts_create_each_departure_once(http):
+    headers, vehicle_id = await driver_with_vehicle(http)
+    rides = [offer(vehicle_id, DEPARTURE + timedelta(days=i)) for i in range(5)]
+    responses = await asyncio.gather(*(
+        http.post("/api/rides/bulk", headers=headers, json={"rides": rides}) for _ in range(3)
+    ))
+    created = [r.json()["created"] for r in responses if r.status_code == 200]
+    assert all(r.status_code in (200, 409) for r in responses)
+    assert sum(created) == 5
+    assert await ride_count() == 5
+
+
+async def test_admins_bulk_post_for_the_owner_of_each_vehicle(http):
+    _, vehicle_id = await driver_with_vehicle(http, "owner")
+    other_headers, other_vehicle_id = await driver_with_vehicle(http, "other")
+    async with AsyncSessionLocal() as db:
+        owner_id, other_id = [(await db.get(models.Vehicle, vid)).user_id for vid in (vehicle_id, other_vehicle_id)]
+    (admin,) = await harness.seed_users("admin", 1, "admin")
+    headers = await harness.login(http, admin)
+
+    response = await http.post("/api/rides/bulk", headers=headers, json={"rides": [
+        offer(vehicle_id, DEPARTURE, driver_id=owner_id),
+        offer(vehicle_id, DEPARTURE + timedelta(days=1), driver_id=other_id),  # Not other's vehicle
+        offer(vehicle_id, DEPARTURE + timedelta(days=2)),  # No driver named
+        offer(other_vehicle_id, DEPARTURE, driver_id=other_id),
+    ]})
+    result = response.json()
+    assert (result["created"], result["failed"]) == (2, 2)
+    errors = [item["error"] for item in result["results"]]
+    assert errors[1].startswith("Vehicle not found")
+    assert errors[2] == "driver_id must name a driver"
+    async with AsyncSessionLocal() as db:
+        rides = (await db.execute(select(models.Ride.driver_id, models.Ride.vehicle_id).order_by(models.Ride.ride_id))).all()
+    assert [tuple(ride) for ride in rides] == [(owner_id, vehicle_id), (other_id, other_vehicle_id)]
+
+    # A driver posts only as themselves, and only with their own vehicles
+    response = await http.post("/api/rides/bulk", headers=other_headers, json={"rides": [
+        offer(vehicle_id, DEPARTURE + timedelta(days=3)),
+        offer(vehicle_id, DEPARTURE + timedelta(days=4), driver_id=owner_id),
+    ]})
+    errors = [item["error"] for item in response.json()["results"]]
+    assert errors[0].startswith("Vehicle not found")
+    assert errors[1] == "Only admins can post rides for another driver"
+    assert await ride_count() == 2
@@ -0,0 +1,70 @@
+"""Daily route rollups: updated in the writer's transaction, sharded per route, equal to a rebuild."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from tests.bench import harness
+from backend import models, rollups
+from backend.database import AsyncSessionLocal
+from backend.rollups import rebuild_rollups
+
+pytestmark = pytest.mark.anyio
+
+
+async def rollup_rows() -> dict:
+    """Each day/route's counters, summed over its shards."""
+    rollup = models.DailyRouteRollup
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(select(
+            rollup.day, rollup.origin_key, rollup.destination_key,
+            *[func.sum(getattr(rollup, name)) for name in rollups.COUNTER_COLUMNS]
+        ).group_by(rollup.day, rollup.origin_key, rollup.destination_key))
+        return {(day, origin, destination): (*counters[:-1], float(counters[-1])) for day, origin, destination, *counters in rows}
+
+
+async def test_bookings_update_the_rollups_as_they_commit_and_match_a_rebuild(http, monkeypatch):
+    # Every transaction in its own shard, so the sums have several rows to add up
+    shards = iter(range(100))
+    monkeypatch.setattr(rollups.random, "randrange", lambda n: next(shards))
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    riders = await harness.seed_users("rider", 2, "passenger")
+    driver_headers = await harness.login(http, driver)
+    vehicle = (await http.post("/api/rides/vehicles", headers=driver_headers, json={
+        "model": "Swift", "seat_capacity": 4, "license_plate": "KA01",
+    })).json()
+    departure = (datetime.now() + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
+    ride = (await http.post("/api/rides", headers=driver_headers, json={
+        "vehicle_id": vehicle["vehicle_id"], "origin": "Banashankari", "destination": "PES University",
+        "date_time": departure.isoformat(), "seats_available": 4, "price": 50, "distance_km": 12.5,
+    })).json()
+    key = (departure.date(), "banashankari", "pes university")
+    assert await rollup_rows() == {key: (1, 4, 0, 0, 0.0)}
+
+    headers = [await harness.login(http, rider) for rider in riders]
+    booking = (await http.post("/api/bookings/", headers=headers[0], json={"ride_id": ride["ride_id"], "seats_booked": 2})).json()
+    assert await rollup_rows() == {key: (1, 4, 1, 2, 25.0)}
+    await http.post("/api/bookings/", headers=headers[1], json={"ride_id": ride["ride_id"], "seats_booked": 1})
+    await http.post(f"/api/bookings/{booking['booking_id']}/cancel", headers=headers[0])
+    # Rejected: nothing of it may be counted
+    response = await http.post("/api/bookings/", headers=headers[0], json={"ride_id": ride["ride_id"], "seats_booked": 9})
+    assert response.status_code == 400
+    assert await rollup_rows() == {key: (1, 4, 1, 1, 12.5)}
+
+    async with AsyncSessionLocal() as db:
+        assert (await db.execute(select(func.count()).select_from(models.DailyRouteRollup))).scalar() == 4
+        await rebuild_rollups(db)
+        await db.commit()
+    assert await rollup_rows() == {key: (1, 4, 1, 1, 12.5)}
+
+
+async def test_a_rolled_back_booking_leaves_the_rollups_alone(http):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    (ride_id,) = await harness.seed_rides(driver, 1, seats=4)
+    async with AsyncSessionLocal() as db:
+        ride = await db.get(models.Ride, ride_id)
+        await rollups.rollup_booking(db, ride, 2)
+        await db.rollback()
+    assert await rollup_rows() == {}
@@ -0,0 +1,66 @@
+"""Ride search: the substring fallback, and pages served from memory until a booking on a matching route and day."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.bench import harness
+from backend.search_cache import search_cache
+
+pytestmark = pytest.mark.anyio
+
+RIDE_DATE = (datetime.now() + timedelta(days=1)).date().isoformat()
+
+
+async def test_a_booking_drops_only_the_cached_searches_it_affects(http):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    (ride_id,) = await harness.seed_rides(driver, 1, seats=4)
+    await harness.seed_rides(*(await harness.seed_users("other", 1, "driver")), 1, seats=4, origin="Jayanagar")
+    (rider,) = await harness.seed_users("rider", 1, "passenger")
+    headers = await harness.login(http, rider)
+
+    async def search(origin: str) -> list:
+        response = await http.get("/api/rides/", headers=headers, params={
+            "origin": origin, "destination": "pes", "ride_date": RIDE_DATE,
+        })
+        return [ride["seats_available"] for ride in response.json()["items"]]
+
+    assert await search("bana") == [4]
+    assert await search("jaya") == [4]
+    hits = search_cache.stats()["hits"]
+    assert await search("bana") == [4]
+    assert search_cache.stats()["hits"] == hits + 1
+
+    invalidations = search_cache.stats()["invalidations"]
+    await http.post("/api/bookings/", headers=headers, json={"ride_id": ride_id, "seats_booked": 1})
+    assert search_cache.stats()["invalidations"] == invalidations + 1
+    assert await search("bana") == [3]
+    # The Jayanagar search is still served from the cache
+    hits = search_cache.stats()["hits"]
+    assert await search("jaya") == [4]
+    assert search_cache.stats()["hits"] == hits + 1
+
+
+async def test_a_search_with_no_prefix_match_falls_back_to_substrings(http):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    ride_ids = await harness.seed_rides(driver, 3, seats=4)
+    await harness.seed_rides(*(await harness.seed_users("other", 1, "driver")), 1, seats=4, destination="Jayanagar")
+    (rider,) = await harness.seed_users("rider", 1, "passenger")
+    headers = await harness.login(http, rider)
+
+    seen, cursor = [], None
+    while True:
+        params = {"origin": "shankari", "destination": "University", "ride_date": RIDE_DATE, "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = (await http.get("/api/rides/", headers=headers, params=params)).json()
+        seen += [ride["ride_id"] for ride in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ride_ids
+
+    # Cached like any other search, and dropped by a booking on the ride's route
+    invalidations = search_cache.stats()["invalidations"]
+    await http.post("/api/bookings/", headers=headers, json={"ride_id": ride_ids[0], "seats_booked": 1})
+    assert search_cache.stats()["invalidations"] == invalidations + 2
@@ -0,0 +1,65 @@
+"""Seat reservation: concurrent bookings never oversell, and cancels give the seats back once."""
+
+import asyncio
+
+import pytest
+from sqlalchemy import func
+from sqlalchemy.future import select
+
+from tests.bench import harness
+from backend import models
+from backend.database import AsyncSessionLocal
+
+pytestmark = pytest.mark.anyio
+
+
+async def seats_left(ride_id: int) -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(models.Ride.seats_available).where(models.Ride.ride_id == ride_id))).scalar()
+
+
+async def confirmed_seats(ride_id: int) -> int:
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(func.coalesce(func.sum(models.Booking.seats_booked), 0)).where(
+            models.Booking.ride_id == ride_id, models.Booking.status == "confirmed"
+        ))).scalar()
+
+
+async def test_concurrent_bookings_never_oversell(http):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    (ride_id,) = await harness.seed_rides(driver, 1, seats=3)
+    riders = [await harness.login(http, email) for email in await harness.seed_users("rider", 6, "passenger")]
+
+    responses = await asyncio.gather(*(
+        http.post("/api/bookings/", headers=headers, json={"ride_id": ride_id, "seats_booked": 1}) for headers in riders
+    ))
+    assert sorted(r.status_code for r in responses) == [201] * 3 + [400] * 3
+    assert await seats_left(ride_id) == 0
+    assert await confirmed_seats(ride_id) == 3
+
+
+async def test_a_rejected_booking_explains_itself_and_takes_nothing(http):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    (ride_id,) = await harness.seed_rides(driver, 1, seats=2)
+    (rider,) = await harness.seed_users("rider", 1, "passenger")
+    headers = await harness.login(http, rider)
+
+    response = await http.post("/api/bookings/", headers=headers, json={"ride_id": ride_id, "seats_booked": 3})
+    assert (response.status_code, response.json()["detail"]) == (400, "Not enough seats. Only 2 available.")
+    response = await http.post("/api/bookings/", headers=headers, json={"ride_id": ride_id + 1, "seats_booked": 1})
+    assert response.status_code == 404
+    assert await seats_left(ride_id) == 2
+
+
+async def test_cancelling_twice_returns_the_seats_once(http):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    (ride_id,) = await harness.seed_rides(driver, 1, seats=3)
+    (rider,) = await harness.seed_users("rider", 1, "passenger")
+    headers = await harness.login(http, rider)
+    booking = (await http.post("/api/bookings/", headers=headers, json={"ride_id": ride_id, "seats_booked": 2})).json()
+
+    responses = await asyncio.gather(*(
+        http.post(f"/api/bookings/{booking['booking_id']}/cancel", headers=headers) for _ in range(3)
+    ))
+    assert sorted(r.status_code for r in responses) == [200, 400, 400]
+    assert await seats_left(ride_id) == 3
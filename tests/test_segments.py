@@ -0,0 +1,104 @@
+"""Rides with waypoints: per-segment seats, all-or-nothing reservations and seat-km between stops."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.future import select
+
+from tests.bench import harness
+from tests.test_rollups import rollup_rows
+from backend import models
+from backend.bookings import reserve_segment_seats
+from backend.database import AsyncSessionLocal
+from backend.rollups import rebuild_rollups
+
+pytestmark = pytest.mark.anyio
+
+DEPARTURE = (datetime.now() + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
+
+
+async def offer_ride(http, seats: int = 3, **extra):
+    """Post Banashankari -> Jayanagar -> BTM -> PES University, 20 km, as a new driver; returns (headers, response)."""
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    headers = await harness.login(http, driver)
+    vehicle = (await http.post("/api/rides/vehicles", headers=headers, json={
+        "model": "Swift", "seat_capacity": 4, "license_plate": "KA01",
+    })).json()
+    response = await http.post("/api/rides", headers=headers, json={
+        "vehicle_id": vehicle["vehicle_id"], "origin": "Banashankari", "destination": "PES University",
+        "date_time": DEPARTURE.isoformat(), "seats_available": seats, "price": 50, "distance_km": 20,
+        "waypoints": ["Jayanagar", "BTM"], **extra,
+    })
+    return headers, response
+
+
+async def post_ride(http, **extra):
+    headers, response = await offer_ride(http, **extra)
+    assert response.status_code == 201, response.text
+    return headers, response.json()
+
+
+async def segment_seats(ride_id: int) -> list:
+    async with AsyncSessionLocal() as db:
+        return list((await db.execute(
+            select(models.RideSegment.seats_available).where(
+                models.RideSegment.ride_id == ride_id
+            ).order_by(models.RideSegment.segment_index)
+        )).scalars().all())
+
+
+async def test_a_short_segment_reservation_changes_nothing(http):
+    _, ride = await post_ride(http)
+    async with AsyncSessionLocal() as db:
+        assert await reserve_segment_seats(db, ride["ride_id"], 1, 2, 2)
+        # Segments 0 and 2 have the seats, segment 1 has one left: none may move
+        assert not await reserve_segment_seats(db, ride["ride_id"], 0, 3, 2)
+        await db.commit()
+    assert await segment_seats(ride["ride_id"]) == [3, 1, 3]
+
+
+async def test_seat_km_covers_only_the_stops_travelled(http):
+    driver_headers, ride = await post_ride(http, waypoint_km=[5, 12])
+    riders = await harness.seed_users("rider", 2, "passenger")
+    headers = [await harness.login(http, rider) for rider in riders]
+
+    response = await http.post("/api/bookings/", headers=headers[0], json={
+        "ride_id": ride["ride_id"], "seats_booked": 2, "from_stop": 1, "to_stop": 2,
+    })
+    assert response.status_code == 201
+    response = await http.post("/api/bookings/", headers=headers[1], json={
+        "ride_id": ride["ride_id"], "seats_booked": 1, "from_stop": 2,
+    })
+    assert response.status_code == 201
+    assert await segment_seats(ride["ride_id"]) == [3, 1, 2]
+
+    # 2 seats x 7 km + 1 seat x 8 km; three seats offered, however the legs are booked
+    (totals,) = (await rollup_rows()).values()
+    assert (totals[1], totals[3], totals[4]) == (3, 3, 22.0)
+    async with AsyncSessionLocal() as db:
+        await rebuild_rollups(db)
+        await db.commit()
+    assert list((await rollup_rows()).values()) == [totals]
+
+    (admin,) = await harness.seed_users("admin", 1, "admin")
+    metrics = (await http.get("/api/admin/metrics", headers=await harness.login(http, admin))).json()
+    assert metrics["total_seats_offered"] == 3
+    manifest = (await http.get("/api/rides/driver/my-rides", headers=driver_headers)).json()
+    assert manifest["items"][0]["seats_offered"] == 3
+
+
+async def test_waypoints_are_spaced_evenly_without_waypoint_km(http):
+    _, ride = await post_ride(http)
+    async with AsyncSessionLocal() as db:
+        km = (await db.execute(
+            select(models.RideStop.km_from_origin).where(
+                models.RideStop.ride_id == ride["ride_id"]
+            ).order_by(models.RideStop.stop_index)
+        )).scalars().all()
+    assert [float(value) for value in km] == [0, 6.67, 13.33, 20]
+
+
+@pytest.mark.parametrize("waypoint_km", [[5], [12, 5], [5, 20]])
+async def test_rejects_waypoint_km_that_does_not_fit_the_route(http, waypoint_km):
+    _, response = await offer_ride(http, waypoint_km=waypoint_km)
+    assert response.status_code == 400
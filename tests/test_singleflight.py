@@ -0,0 +1,97 @@
+"""SingleFlight: concurrent calls on one key share one execution, its result and its failure."""
+
+import asyncio
+
+import pytest
+
+from backend.singleflight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_callers_share_one_execution_and_its_result():
+    flight = SingleFlight()
+    release = asyncio.Event()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await release.wait()
+        return {"rides": [1, 2]}
+
+    tasks = [asyncio.create_task(flight.do("key", load)) for _ in range(5)]
+    other = asyncio.create_task(flight.do("other", load))
+    await asyncio.sleep(0)
+    assert flight.stats()["in_flight"] == 2
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert len(calls) == 2  # One per key
+    assert all(result is results[0] for result in results)
+    assert await other == {"rides": [1, 2]}
+    assert flight.stats() == {"in_flight": 0, "leaders": 2, "shared": 4}
+
+
+async def test_an_exception_reaches_every_waiter_and_frees_the_key():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fail():
+        await release.wait()
+        raise LookupError("ride store unavailable")
+
+    tasks = [asyncio.create_task(flight.do("key", fail)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert [type(result) for result in results] == [LookupError] * 3
+    assert flight.stats()["in_flight"] == 0
+
+    # Nothing was cached: the next call runs again
+    async def load():
+        return "fresh"
+    assert await flight.do("key", load) == "fresh"
+
+
+async def test_a_cancelled_leader_hands_off_to_a_waiter():
+    flight = SingleFlight()
+    started, release = asyncio.Event(), asyncio.Event()
+    runs = []
+
+    async def load():
+        runs.append(1)
+        started.set()
+        await release.wait()
+        return len(runs)
+
+    leader = asyncio.create_task(flight.do("key", load))
+    await started.wait()
+    waiters = [asyncio.create_task(flight.do("key", load)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    started.clear()
+    leader.cancel()
+    await started.wait()  # A waiter has taken over and is running load() itself
+    release.set()
+    assert await asyncio.wait_for(asyncio.gather(*waiters), timeout=1) == [2, 2]
+    assert leader.cancelled()
+    assert flight.stats() == {"in_flight": 0, "leaders": 2, "shared": 1}
+
+
+async def test_a_cancelled_waiter_leaves_the_leader_running():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def load():
+        await release.wait()
+        return "done"
+
+    leader = asyncio.create_task(flight.do("key", load))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(flight.do("key", load))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    release.set()
+    assert await leader == "done"
+    assert waiter.cancelled()
+    assert flight.stats()["in_flight"] == 0
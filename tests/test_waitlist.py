@@ -0,0 +1,78 @@
+"""Waitlist: joining a full ride, and promotion in queue order when seats free up."""
+
+import pytest
+from sqlalchemy.future import select
+
+from tests.bench import harness
+from tests.test_segments import post_ride
+from backend import bookings, models
+from backend.database import AsyncSessionLocal
+
+pytestmark = pytest.mark.anyio
+
+
+async def entry_statuses(ride_id: int) -> list:
+    async with AsyncSessionLocal() as db:
+        return list((await db.execute(
+            select(models.WaitlistEntry.status).where(
+                models.WaitlistEntry.ride_id == ride_id
+            ).order_by(models.WaitlistEntry.entry_id)
+        )).scalars().all())
+
+
+async def riders(http, count: int) -> list:
+    emails = await harness.seed_users("rider", count, "passenger")
+    return [await harness.login(http, email) for email in emails]
+
+
+async def book(http, headers, ride_id: int, seats: int, **stops) -> int:
+    response = await http.post("/api/bookings/", headers=headers, json={"ride_id": ride_id, "seats_booked": seats, **stops})
+    assert response.status_code == 201, response.text
+    return response.json()["booking_id"]
+
+
+async def join(http, headers, ride_id: int, seats: int, **stops):
+    return await http.post("/api/bookings/waitlist", headers=headers, json={"ride_id": ride_id, "seats_requested": seats, **stops})
+
+
+async def test_promotion_passes_over_entries_that_do_not_fit(http, monkeypatch):
+    monkeypatch.setattr(bookings, "WAITLIST_PROMOTE_BATCH", 1)
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    (ride_id,) = await harness.seed_rides(driver, 1, seats=3)
+    a, b, *waiting = await riders(http, 6)
+    booking_a = await book(http, a, ride_id, 2)
+    booking_b = await book(http, b, ride_id, 1)
+    for headers, seats in zip(waiting, (3, 3, 1, 1)):
+        assert (await join(http, headers, ride_id, seats)).status_code == 201
+
+    # One seat back: the two requests for three are passed over, the first single is promoted
+    await http.post(f"/api/bookings/{booking_b}/cancel", headers=b)
+    assert await entry_statuses(ride_id) == ["waiting", "waiting", "promoted", "waiting"]
+    await http.post(f"/api/bookings/{booking_a}/cancel", headers=a)
+    assert await entry_statuses(ride_id) == ["waiting", "waiting", "promoted", "promoted"]
+    ride = (await http.get(f"/api/rides/{ride_id}", headers=a)).json()
+    assert ride["seats_available"] == 1
+
+
+async def test_segment_promotion_scans_past_a_batch_of_unfit_entries(http, monkeypatch):
+    monkeypatch.setattr(bookings, "WAITLIST_PROMOTE_BATCH", 1)
+    _, ride = await post_ride(http)
+    a, c, w1, w2 = await riders(http, 4)
+    booking_a = await book(http, a, ride["ride_id"], 3, from_stop=0, to_stop=1)
+    await book(http, c, ride["ride_id"], 2, from_stop=1, to_stop=2)
+    assert (await join(http, w1, ride["ride_id"], 2, from_stop=0, to_stop=2)).status_code == 201
+    assert (await join(http, w2, ride["ride_id"], 1, from_stop=0, to_stop=1)).status_code == 201
+
+    # Segment 1 still has only one seat, so w1 stays queued and w2, behind it, is promoted
+    await http.post(f"/api/bookings/{booking_a}/cancel", headers=a)
+    assert await entry_statuses(ride["ride_id"]) == ["waiting", "promoted"]
+
+
+async def test_join_rejects_more_seats_than_the_ride_offers(http):
+    (driver,) = await harness.seed_users("driver", 1, "driver")
+    (ride_id,) = await harness.seed_rides(driver, 1, seats=2)
+    a, b = await riders(http, 2)
+    await book(http, a, ride_id, 2)
+    response = await join(http, b, ride_id, 3)
+    assert response.status_code == 400
+    assert await entry_statuses(ride_id) == []